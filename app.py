@@ -23,6 +23,15 @@ if 'data_initialized' not in st.session_state:
     # Create database tables if they don't exist
     create_tables()
     initialize_data()
+    # Pick up document text extraction interrupted by a restart
+    from utils.text_extraction import resume_pending_extractions
+    resume_pending_extractions()
+    # Record daily progress history in the background
+    from utils.progress_history import start_snapshotter
+    start_snapshotter()
+    # Send queued notifications in the background
+    from utils.notifications import start_dispatcher
+    start_dispatcher()
     st.session_state.data_initialized = True
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -9,7 +9,8 @@ import datetime
 from sqlalchemy import delete
 from utils.database import (
     get_db_session, create_tables, User, Project, Task,
-    TeamMember, Document, Subtask, Meeting
+    TeamMember, Document, DocumentVersion, Subtask, Meeting, ActionItem, CostEntry,
+    ProgressSnapshot, WBSNode, WBSClosure, ScheduleBaseline, Notification, rebuild_progress_rollups, sync_wbs_nodes
 )
 
 DATA_DIR = "data"
@@ -32,9 +33,17 @@ def clear_database():
     db = get_db_session()
     try:
         # Delete in order to respect foreign keys
+        db.query(WBSClosure).delete()
+        db.query(WBSNode).delete()
         db.query(Subtask).delete()
+        db.query(ActionItem).delete()
         db.query(Meeting).delete()
+        db.query(DocumentVersion).delete()
         db.query(Document).delete()
+        db.query(CostEntry).delete()
+        db.query(ProgressSnapshot).delete()
+        db.query(ScheduleBaseline).delete()
+        db.query(Notification).delete()
         db.query(Task).delete()
         db.query(TeamMember).delete()
         db.query(Project).delete()
@@ -269,6 +278,12 @@ if __name__ == "__main__":
     
     # Populate database with JSON data
     populate_database()
+    rebuild_progress_rollups()
+    sync_wbs_nodes()
+    
+    # Move meeting action items into their own table
+    from migrate_db import migrate_action_items
+    migrate_action_items()
     
     # Remove JSON files to ensure app uses only database
     remove_json_files()
@@ -5,7 +5,7 @@ Script to initialize sample data in the database for demonstration purposes.
 import datetime
 from utils.database import (
     get_db_session, create_tables, User, Project, Task,
-    TeamMember, Document, Subtask, Meeting
+    TeamMember, Document, Subtask, Meeting, rebuild_progress_rollups, sync_wbs_nodes
 )
 
 def create_sample_data():
@@ -510,5 +510,11 @@ if __name__ == "__main__":
     
     # Create sample data
     create_sample_data()
+    rebuild_progress_rollups()
+    sync_wbs_nodes()
+    
+    # Move sample meeting action items into their own table
+    from migrate_db import migrate_action_items
+    migrate_action_items()
     
     print("Sample data initialization completed!")
\ No newline at end of file
@@ -2,7 +2,17 @@
 Script to run database migrations for schema updates
 """
 
-from utils.database import create_tables
+from utils.database import create_tables, migrate_legacy_action_items
+
+def migrate_action_items():
+    """
+    Copy action items from the legacy Meeting.action_items JSON column
+    into the action_items table, see migrate_legacy_action_items.
+    """
+    try:
+        migrate_legacy_action_items()
+    except Exception as e:
+        print(f"Error migrating action items: {e}")
 
 def run_migrations():
     """
@@ -10,13 +20,12 @@ def run_migrations():
     """
     print("Running database migrations...")
     
-    # Create any missing tables (including change_requests)
+    # Create any missing tables (including change_requests), add new columns
+    # and indexes to tables that already exist, and move meeting action items
+    # into their own table
     create_tables()
     
-    # Add new columns to existing tables if necessary
-    # (create_tables handles this already in newer SQLAlchemy versions)
-    
     print("Database migration completed")
 
 if __name__ == "__main__":
-    run_migrations()
\ No newline at end of file
+    run_migrations()
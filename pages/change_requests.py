@@ -6,13 +6,15 @@ import streamlit as st
 import datetime
 from utils.change_request import (
     create_change_request, get_change_requests, get_change_request,
-    approve_change_request, reject_change_request, get_user_change_requests
+    approve_change_request, reject_change_request, get_user_change_requests,
+    approve_change_requests, reject_change_requests, get_change_request_views
 )
 from utils.database import (
     get_task, get_subtask, get_project, get_user_by_id,
     get_team_member, model_to_dict
 )
 from utils.data_management import can_access_project, can_access_task
+from utils.change_impact import get_change_request_impact
 
 def show_change_requests():
     """Display change request management interface"""
@@ -48,28 +50,11 @@ def show_my_change_requests():
     
     # Display change requests in an expander per request
     for request in change_requests:
-        # Determine if this is a task or subtask request
-        if request["task_id"]:
-            item_type = "Task"
-            item_id = request["task_id"]
-            item = get_task(item_id)
-            if not item:
-                continue
-            project = get_project(item["project_id"])
-        else:
-            item_type = "Subtask"
-            item_id = request["subtask_id"]
-            item = get_subtask(item_id)
-            if not item:
-                continue
-            parent_task = get_task(item["parent_task_id"])
-            if not parent_task:
-                continue
-            project = get_project(parent_task["project_id"])
-        
-        # Get requester info
-        requester = get_user_by_id(request["requested_by"])
-        requester_name = requester["name"] if requester else "Unknown"
+        # Skip requests whose task, subtask or project no longer exists
+        if not request["item_name"] or not request["project_name"]:
+            continue
+        item_type = request["item_type"]
+        requester_name = request["requester_name"] or "Unknown"
         
         # Format status with color
         status = request["status"]
@@ -81,21 +66,19 @@ def show_my_change_requests():
             status_html = f"<span style='color:red;'>{status}</span>"
         
         # Display expander for each change request
-        with st.expander(f"{item_type}: {item['name']} - Status: {request['status']}"):
+        with st.expander(f"{item_type}: {request['item_name']} - Status: {request['status']}"):
             col1, col2 = st.columns(2)
             
             with col1:
-                st.markdown(f"**Project:** {project['name']}")
-                st.markdown(f"**{item_type}:** {item['name']}")
+                st.markdown(f"**Project:** {request['project_name']}")
+                st.markdown(f"**{item_type}:** {request['item_name']}")
                 st.markdown(f"**Requested by:** {requester_name}")
                 st.markdown(f"**Requested at:** {request['requested_at']}")
                 st.markdown(f"**Status:** {status_html}", unsafe_allow_html=True)
 
             with col2:
                 if request["review_date"]:
-                    reviewer = get_user_by_id(request["reviewed_by"])
-                    reviewer_name = reviewer["name"] if reviewer else "Unknown"
-                    st.markdown(f"**Reviewed by:** {reviewer_name}")
+                    st.markdown(f"**Reviewed by:** {request['reviewer_name'] or 'Unknown'}")
                     st.markdown(f"**Review date:** {request['review_date']}")
                 
                 if request["requires_meeting"]:
@@ -197,9 +180,9 @@ def show_pending_approvals():
         st.info("There are no pending change requests that you can approve.")
         return
     
-    # Display approvable requests
+    # Get item details
+    entries = []
     for request in approvable_requests:
-        # Get item details
         if request["task_id"]:
             item_type = "Task"
             item_id = request["task_id"]
@@ -211,7 +194,47 @@ def show_pending_approvals():
             item = get_subtask(item_id)
             parent_task = get_task(item["parent_task_id"])
             project = get_project(parent_task["project_id"])
+        entries.append((request, item_type, item, project))
+    
+    # Review several requests at once
+    with st.form("batch_review_form"):
+        st.subheader("Batch Review")
+        labels = {
+            request["id"]: f"#{request['id']} {item_type}: {item['name']} ({project['name']})"
+            for request, item_type, item, project in entries
+        }
+        selected_ids = st.multiselect("Change Requests", options=list(labels.keys()), format_func=labels.get)
+        batch_comments = st.text_area("Comments", key="batch_review_comments")
         
+        col1, col2 = st.columns(2)
+        with col1:
+            approve_selected = st.form_submit_button("Approve Selected")
+        with col2:
+            reject_selected = st.form_submit_button("Reject Selected")
+        
+        if approve_selected or reject_selected:
+            if not selected_ids:
+                st.error("Select at least one change request.")
+            else:
+                review = approve_change_requests if approve_selected else reject_change_requests
+                try:
+                    result = review(selected_ids, user_id, batch_comments)
+                except Exception:
+                    st.error("Failed to review the selected change requests. No changes were made.")
+                else:
+                    cyclic = result.get("cycles", {})
+                    if cyclic:
+                        st.warning(f"{len(cyclic)} request(s) were left pending because their dependencies would form "
+                                   "a cycle: " + ", ".join(f"#{request_id}" for request_id in cyclic))
+                    if len(result["skipped"]) > len(cyclic):
+                        st.warning(f"{len(result['skipped']) - len(cyclic)} request(s) were skipped because they are "
+                                   "no longer pending or their item no longer exists.")
+                    decision = "approved" if approve_selected else "rejected"
+                    st.success(f"{len(result['reviewed'])} change request(s) {decision}!")
+                    st.rerun()
+    
+    # Display approvable requests
+    for request, item_type, item, project in entries:
         # Get requester info
         requester = get_user_by_id(request["requested_by"])
         requester_name = requester["name"] if requester else "Unknown"
@@ -234,6 +257,8 @@ def show_pending_approvals():
                 st.subheader("Impact Analysis")
                 st.markdown(request["impact_analysis"])
             
+            show_computed_impact(request, project["id"])
+            
             # Show proposed changes
             st.subheader("Proposed Changes")
             
@@ -252,6 +277,16 @@ def show_pending_approvals():
             else:
                 st.info("No changes specified.")
             
+            if st.checkbox("Show full item before and after", key=f"full_view_{request['id']}"):
+                before, after = get_change_request_views(request)
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("**Before**")
+                    st.json(before)
+                with col2:
+                    st.markdown("**After**")
+                    st.json(after)
+            
             # Add approval/rejection form
             st.subheader("Review")
             
@@ -282,6 +317,51 @@ def show_pending_approvals():
                     else:
                         st.error("Failed to reject change request. Please try again.")
 
+def show_computed_impact(request, project_id):
+    """Display the stored schedule and resource impact of a change request"""
+    st.subheader("Computed Impact")
+    impact, current = get_change_request_impact(request, project_id)
+    
+    if impact is None:
+        st.info("The impact of this change is being computed. Refresh the page in a moment.")
+        return
+    if not current:
+        st.warning(f"The project schedule changed after this impact was computed ({impact['computed_at']}). "
+                   "An updated analysis is being computed.")
+    
+    schedule = impact["schedule"]
+    if "error" in schedule:
+        st.error(f"Schedule impact cannot be computed: {schedule['error']}")
+    else:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Project Finish", schedule["project_finish_after"] or "N/A",
+                      delta=f"{schedule['finish_shift_days']} days" if schedule["finish_shift_days"] else None,
+                      delta_color="inverse")
+        with col2:
+            st.metric("Tasks Moved", len(schedule["moved_tasks"]))
+        with col3:
+            st.metric("Newly Critical Tasks", len(schedule["newly_critical"]))
+        
+        if schedule["moved_tasks"]:
+            st.table([{
+                "Task": entry["task_name"],
+                "New Start": entry["early_start"],
+                "New Finish": entry["early_finish"],
+                "Finish Shift (days)": entry["finish_shift_days"],
+                "Float (days)": entry["total_float"]
+            } for entry in schedule["moved_tasks"]])
+    
+    if impact["resources"]:
+        st.markdown("**Team workload changes:**")
+        st.table([{
+            "Member": entry["member_name"],
+            "Days Over-allocated": f"{entry['days_over_before']} → {entry['days_over_after']}",
+            "Peak Load": f"{entry['peak_load_before']:g} → {entry['peak_load_after']:g}"
+        } for entry in impact["resources"]])
+    else:
+        st.caption("No team member's over-allocation changes.")
+
 def show_create_change_request():
     """Interface for creating a new change request"""
     st.header("Create Change Request")
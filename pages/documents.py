@@ -1,8 +1,27 @@
 import streamlit as st
 import datetime
-import base64
 import pandas as pd
-from utils.data_management import get_project, get_project_documents, add_document
+from utils.data_management import (
+    get_project, get_project_documents, add_document,
+    search_project_documents, get_document_text_preview
+)
+from utils.document_store import (
+    PREVIEW_BYTES, store_document_stream, document_content_exists,
+    open_document_content, get_text_preview
+)
+from utils.text_extraction import submit_text_extraction
+from utils.document_versions import (
+    add_document_version, get_document_history, get_document_version_content
+)
+
+def format_file_size(size):
+    """Format a file size in bytes for display"""
+    if size < 1024:
+        return f"{size} bytes"
+    for unit in ["KB", "MB", "GB"]:
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
 
 def show_documents():
     st.title("📄 Document Management")
@@ -37,7 +56,7 @@ def show_documents():
         
         if documents:
             # Document categories for filtering
-            categories = sorted(list(set(doc.get('category', 'Uncategorized') for doc in documents)))
+            categories = sorted(list(set(doc.get('category') or 'Uncategorized' for doc in documents)))
             selected_category = st.selectbox(
                 "Filter by Category",
                 ["All Categories"] + categories
@@ -46,51 +65,76 @@ def show_documents():
             # Filter documents by category
             filtered_docs = documents
             if selected_category != "All Categories":
-                filtered_docs = [doc for doc in documents if doc.get('category', 'Uncategorized') == selected_category]
+                filtered_docs = [doc for doc in documents if (doc.get('category') or 'Uncategorized') == selected_category]
             
             # Create search box
             search_query = st.text_input("Search Documents", "")
             
-            # Apply search filter if query exists
+            # Apply search filter if query exists (also searches extracted file text)
             if search_query:
-                search_query = search_query.lower()
-                filtered_docs = [
-                    doc for doc in filtered_docs 
-                    if search_query in doc['name'].lower() or 
-                    search_query in doc.get('description', '').lower()
-                ]
+                matching_ids = set(search_project_documents(project_id, search_query))
+                filtered_docs = [doc for doc in filtered_docs if doc['id'] in matching_ids]
             
             # Display documents
             if filtered_docs:
                 # Sort by upload date (newest first)
                 sorted_docs = sorted(
                     filtered_docs,
-                    key=lambda x: x.get('uploaded_at', ''),
+                    key=lambda x: x.get('upload_date') or '',
                     reverse=True
                 )
                 
                 # Display as cards
+                # Expander bodies run even when collapsed, so file content is
+                # only read once the user asks for a download or preview
                 for doc in sorted_docs:
-                    with st.expander(f"{doc['name']} ({doc.get('category', 'Uncategorized')})"):
-                        st.write(f"**Description:** {doc.get('description', 'N/A')}")
-                        st.write(f"**Uploaded:** {doc.get('uploaded_at', 'N/A')}")
+                    with st.expander(f"{doc['name']} ({doc.get('category') or 'Uncategorized'})"):
+                        st.write(f"**Description:** {doc.get('description') or 'N/A'}")
+                        st.write(f"**Uploaded:** {doc.get('upload_date') or 'N/A'}")
+                        if doc.get('file_size') is not None:
+                            st.write(f"**Size:** {format_file_size(doc['file_size'])}")
+                        if doc.get('text_status') == 'Pending':
+                            st.caption("Text extraction in progress...")
                         
                         # Display document content if available
-                        if 'file_content' in doc and doc['file_content']:
-                            # Create download link
-                            file_content = base64.b64decode(doc['file_content'])
-                            b64_content = base64.b64encode(file_content).decode()
+                        if document_content_exists(doc.get('content_hash')):
+                            col1, col2 = st.columns(2)
+                            
+                            with col1:
+                                if st.toggle("Prepare download", key=f"download_{doc['id']}"):
+                                    with open_document_content(doc['content_hash']) as file_handle:
+                                        st.download_button(
+                                            label="Download File",
+                                            data=file_handle,
+                                            file_name=doc.get('file_path') or doc['name'],
+                                            mime="application/octet-stream",
+                                            key=f"download_button_{doc['id']}"
+                                        )
                             
-                            download_link = f'<a href="data:application/octet-stream;base64,{b64_content}" download="{doc["name"]}">Download File</a>'
-                            st.markdown(download_link, unsafe_allow_html=True)
+                            with col2:
+                                show_preview = st.toggle("Preview content", key=f"preview_{doc['id']}")
                             
                             # Preview for text files
-                            try:
-                                text_content = file_content.decode('utf-8')
-                                with st.expander("Preview Content"):
-                                    st.text(text_content)
-                            except UnicodeDecodeError:
-                                st.write("Binary file (preview not available)")
+                            if show_preview:
+                                preview = get_text_preview(doc['content_hash'])
+                                if preview is None and doc.get('text_status') == 'Extracted':
+                                    # Fall back to the text extracted from PDF and Word files
+                                    preview_text = get_document_text_preview(doc['id'], PREVIEW_BYTES)
+                                    preview = (preview_text or '', False)
+                                
+                                if preview is None:
+                                    st.write("Binary file (preview not available)")
+                                else:
+                                    preview_text, truncated = preview
+                                    st.text(preview_text)
+                                    if truncated:
+                                        st.caption(f"Showing the first {PREVIEW_BYTES // 1024} KB of the file.")
+                            
+                            # Version history (older versions are rebuilt only when downloaded)
+                            if doc.get('current_version') and st.toggle("Version history", key=f"history_{doc['id']}"):
+                                show_version_history(doc)
+                        else:
+                            st.write("No file stored for this document.")
             else:
                 st.info("No documents found with the current filter/search criteria.")
         else:
@@ -100,59 +144,147 @@ def show_documents():
         # Document upload form
         st.subheader("Upload New Document")
         
-        doc_name = st.text_input("Document Name", "")
-        doc_description = st.text_area("Document Description", "")
-        
-        # Document categories
-        doc_categories = [
-            "Requirements",
-            "Design",
-            "Plans",
-            "Specifications",
-            "Contracts",
-            "Reports",
-            "Meeting Minutes",
-            "Change Requests",
-            "Correspondence",
-            "Tests & Quality",
-            "User Documentation",
-            "Other"
-        ]
+        # Revised files are added as a new version of the existing document
+        upload_options = {None: "New document"}
+        upload_options.update({doc['id']: f"New version of: {doc['name']}" for doc in documents})
+        version_of = st.selectbox(
+            "Upload As",
+            options=list(upload_options.keys()),
+            format_func=lambda x: upload_options[x]
+        )
         
-        doc_category = st.selectbox("Document Category", doc_categories)
-        
-        # File upload
-        uploaded_file = st.file_uploader("Upload File", type=["txt", "pdf", "doc", "docx", "xls", "xlsx", "csv"])
+        if version_of:
+            show_version_upload(version_of)
+        else:
+            show_document_upload(project_id)
+    
+    show_document_guidelines()
+
+def show_document_upload(project_id):
+    """Form for uploading a new document"""
+    doc_name = st.text_input("Document Name", "")
+    doc_description = st.text_area("Document Description", "")
+    
+    # Document categories
+    doc_categories = [
+        "Requirements",
+        "Design",
+        "Plans",
+        "Specifications",
+        "Contracts",
+        "Reports",
+        "Meeting Minutes",
+        "Change Requests",
+        "Correspondence",
+        "Tests & Quality",
+        "User Documentation",
+        "Other"
+    ]
+    
+    doc_category = st.selectbox("Document Category", doc_categories)
+    
+    # File upload
+    uploaded_file = st.file_uploader("Upload File", type=["txt", "pdf", "doc", "docx", "xls", "xlsx", "csv"])
+    
+    if st.button("Submit Document"):
+        if not doc_name:
+            st.error("Document name is required!")
+        elif not uploaded_file:
+            st.error("Please upload a file!")
+        else:
+            # Spool the file to disk in chunks, keeping only a reference in the database
+            uploaded_file.seek(0)
+            stored_file = store_document_stream(uploaded_file)
+            file_type = uploaded_file.name.rsplit('.', 1)[-1].lower()
+            
+            document_data = {
+                'project_id': project_id,
+                'name': doc_name,
+                'description': doc_description,
+                'category': doc_category,
+                'file_type': file_type,
+                'file_path': uploaded_file.name,
+                'content_hash': stored_file['content_hash'],
+                'file_size': stored_file['file_size'],
+                'uploaded_by': st.session_state.get('user_id'),
+                'text_status': 'Pending'
+            }
+            
+            doc_id = add_document(document_data)
+            if doc_id:
+                # Extract searchable text without blocking the page
+                submit_text_extraction(doc_id, stored_file['content_hash'], file_type)
+                st.success(f"Document uploaded successfully with ID: {doc_id}")
+                # Clear form
+                st.rerun()
+            else:
+                st.error("Failed to upload document!")
+
+def show_version_history(doc):
+    """Display the versions of a document with on-demand downloads"""
+    versions = get_document_history(doc['id'])
+    
+    history_df = pd.DataFrame([
+        {
+            'Version': version['version_number'],
+            'File': version['file_path'],
+            'Uploaded': version['upload_date'],
+            'Size': format_file_size(version['file_size'] or 0),
+            'Stored As': f"{version['storage_kind']} ({format_file_size(version['stored_size'] or 0)})",
+            'Note': version.get('change_note') or ''
+        }
+        for version in reversed(versions)
+    ])
+    st.dataframe(history_df, use_container_width=True, hide_index=True)
+    
+    older_versions = [v for v in versions if v['version_number'] != doc['current_version']]
+    if older_versions:
+        selected_version = st.selectbox(
+            "Download Older Version",
+            options=[v['version_number'] for v in reversed(older_versions)],
+            format_func=lambda x: f"Version {x}",
+            key=f"version_select_{doc['id']}"
+        )
         
-        if st.button("Submit Document"):
-            if not doc_name:
-                st.error("Document name is required!")
-            elif not uploaded_file:
-                st.error("Please upload a file!")
+        if st.button("Prepare Version Download", key=f"version_prepare_{doc['id']}"):
+            version = next(v for v in older_versions if v['version_number'] == selected_version)
+            st.download_button(
+                label=f"Download Version {selected_version}",
+                data=get_document_version_content(doc['id'], selected_version),
+                file_name=version['file_path'] or doc['name'],
+                mime="application/octet-stream",
+                key=f"version_download_{doc['id']}"
+            )
+
+def show_version_upload(document_id):
+    """Form for uploading a new version of an existing document"""
+    change_note = st.text_area("What Changed", "")
+    uploaded_file = st.file_uploader(
+        "Upload Revised File",
+        type=["txt", "pdf", "doc", "docx", "xls", "xlsx", "csv"],
+        key="version_file"
+    )
+    
+    if st.button("Submit Version"):
+        if not uploaded_file:
+            st.error("Please upload a file!")
+        else:
+            uploaded_file.seek(0)
+            version = add_document_version(
+                document_id,
+                uploaded_file,
+                uploaded_file.name,
+                uploaded_by=st.session_state.get('user_id'),
+                change_note=change_note
+            )
+            if version:
+                st.success(f"Version {version['version_number']} uploaded successfully!")
+                st.rerun()
             else:
-                # Read file content
-                file_content = uploaded_file.getvalue()
-                # Convert to base64 for storage
-                encoded_content = base64.b64encode(file_content).decode()
-                
-                document_data = {
-                    'project_id': project_id,
-                    'name': doc_name,
-                    'description': doc_description,
-                    'category': doc_category,
-                    'file_path': uploaded_file.name,
-                    'file_content': encoded_content
-                }
-                
-                doc_id = add_document(document_data)
-                if doc_id:
-                    st.success(f"Document uploaded successfully with ID: {doc_id}")
-                    # Clear form
-                    st.rerun()
-                else:
-                    st.error("Failed to upload document!")
-    
-    # Document management best practices
+                st.warning("The uploaded file is identical to the current version.")
+
+def show_document_guidelines():
+    """Display document management best practices"""
     with st.expander("Document Management Best Practices"):
         st.markdown("""
         ### Document Management Guidelines
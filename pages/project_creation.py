@@ -2,6 +2,7 @@ import streamlit as st
 import datetime
 import pandas as pd
 from utils.data_management import add_project, update_project, get_project, delete_project, load_data
+from utils.work_calendar import DEFAULT_WORK_DAYS, WEEKDAY_NAMES
 
 def show_project_creation():
     st.title("📝 Project Creation & Management")
@@ -85,6 +86,21 @@ def show_project_creation():
             help="Select the planned end date"
         )
     
+    # Working calendar
+    current_work_days = project_data.get('work_days') or DEFAULT_WORK_DAYS
+    work_day_names = st.multiselect(
+        "Working Days",
+        list(WEEKDAY_NAMES),
+        default=[day for day, flag in zip(WEEKDAY_NAMES, current_work_days) if flag == '1'],
+        help="Days of the week on which project work is done"
+    )
+    
+    holidays_text = st.text_area(
+        "Holidays",
+        value="\n".join(project_data.get('holidays') or []),
+        help="Non-working dates, one per line as YYYY-MM-DD"
+    )
+    
     # Project Status (only shown when editing)
     status = "Planning"  # Default for new projects
     if editing:
@@ -101,10 +117,22 @@ def show_project_creation():
     
     with col1:
         if st.button("Save Project"):
+            holidays = [line.strip() for line in holidays_text.splitlines() if line.strip()]
+            invalid_holidays = []
+            for holiday in holidays:
+                try:
+                    datetime.datetime.strptime(holiday, '%Y-%m-%d')
+                except ValueError:
+                    invalid_holidays.append(holiday)
+            
             if not name:
                 st.error("Project name is required!")
             elif start_date >= end_date:
                 st.error("End date must be after start date!")
+            elif not work_day_names:
+                st.error("Select at least one working day!")
+            elif invalid_holidays:
+                st.error(f"Invalid holiday dates: {', '.join(invalid_holidays)}. Use YYYY-MM-DD.")
             else:
                 project_data = {
                     'name': name,
@@ -113,6 +141,8 @@ def show_project_creation():
                     'budget': budget,
                     'start_date': start_date.strftime('%Y-%m-%d'),
                     'end_date': end_date.strftime('%Y-%m-%d'),
+                    'work_days': ''.join('1' if day in work_day_names else '0' for day in WEEKDAY_NAMES),
+                    'holidays': sorted(set(holidays)),
                     'status': status
                 }
                 
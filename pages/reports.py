@@ -2,8 +2,13 @@ import streamlit as st
 import datetime
 import pandas as pd
 import io
-from utils.data_management import get_project, get_project_tasks, get_project_team, get_project_documents
-from utils.visualization import create_project_progress_chart
+from utils.data_management import (
+    get_project, get_project_tasks, get_project_team, get_project_documents,
+    get_project_earned_value, get_project_cost_entries, add_cost_entry, get_project_completion
+)
+from utils.visualization import create_project_progress_chart, downsample_series
+from utils.scheduling import get_project_schedule, DependencyCycleError
+from utils.risk_simulation import get_project_risk, DISTRIBUTIONS
 from utils.pdf_generator import generate_project_report, generate_timeline_report, generate_team_report
 
 def show_reports():
@@ -33,7 +38,7 @@ def show_reports():
     st.subheader(f"Reports for: {project['name']}")
     
     # Create tabs for different report types
-    tab1, tab2, tab3, tab4 = st.tabs(["Project Overview", "Timeline Analysis", "Team Analysis", "Export Reports"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Project Overview", "Timeline Analysis", "Team Analysis", "Earned Value", "Export Reports"])
     
     with tab1:
         # Project overview
@@ -61,6 +66,7 @@ def show_reports():
                 completed_tasks = sum(1 for task in tasks if task['status'] == 'Completed')
                 completion_percentage = round((completed_tasks / len(tasks)) * 100)
                 st.write(f"**Completion:** {completion_percentage}%")
+                st.write(f"**Average Task Progress:** {get_project_completion(project_id) or 0:.0f}%")
             else:
                 st.write("**Completion:** N/A")
         
@@ -91,7 +97,7 @@ def show_reports():
         # Add document uploads
         for doc in documents:
             activities.append({
-                'date': doc.get('uploaded_at', project['created_at']),
+                'date': doc.get('upload_date') or project['created_at'],
                 'type': 'Document Uploaded',
                 'description': f"Document '{doc['name']}' was uploaded"
             })
@@ -196,26 +202,84 @@ def show_reports():
             fig.update_layout(showlegend=False)
             st.plotly_chart(fig, use_container_width=True)
             
-            # Critical path analysis (simplified)
-            st.subheader("Critical Path Tasks")
+            # Critical path analysis
+            st.subheader("Critical Path")
             
-            # For simplicity, we'll consider tasks with dependencies as critical
-            critical_tasks = [task for task in tasks if task.get('dependencies', [])]
+            try:
+                schedule = get_project_schedule(project_id)
+            except DependencyCycleError as e:
+                schedule = None
+                st.error(f"The critical path cannot be computed: {e}")
             
-            if critical_tasks:
+            if schedule and schedule['critical_path']:
+                task_names = {task['id']: task['name'] for task in tasks}
+                task_statuses = {task['id']: task['status'] for task in tasks}
+                
+                st.caption(f"Scheduled finish: {schedule['project_finish']} "
+                           f"({schedule['duration_days']} days from {schedule['project_start']})")
+                
                 critical_df = pd.DataFrame([
                     {
-                        'Task': task['name'],
-                        'Start': task['start_date'],
-                        'End': task['end_date'],
-                        'Status': task['status']
+                        'Task': task_names[task_id],
+                        'Start': schedule['tasks'][task_id]['early_start'],
+                        'End': schedule['tasks'][task_id]['early_finish'],
+                        'Duration': f"{schedule['tasks'][task_id]['duration_days']} days",
+                        'Status': task_statuses[task_id]
                     }
-                    for task in critical_tasks
+                    for task_id in schedule['critical_path']
                 ])
                 
                 st.dataframe(critical_df, use_container_width=True)
-            else:
-                st.info("No critical path tasks identified (tasks with dependencies).")
+                
+                # Float of the remaining tasks
+                with st.expander("Schedule Float of All Tasks"):
+                    float_df = pd.DataFrame([
+                        {
+                            'Task': task_names[task_id],
+                            'Earliest Start': entry['early_start'],
+                            'Latest Start': entry['late_start'],
+                            'Total Float (days)': entry['total_float'],
+                            'Free Float (days)': entry['free_float'],
+                            'Critical': 'Yes' if entry['is_critical'] else 'No'
+                        }
+                        for task_id, entry in sorted(schedule['tasks'].items(), key=lambda item: item[1]['total_float'])
+                    ])
+                    st.dataframe(float_df, use_container_width=True)
+            elif schedule:
+                st.info("No critical path could be computed for the tasks of this project.")
+            
+            # Monte Carlo completion forecast
+            st.subheader("Schedule Risk")
+            st.write("Completion dates simulated from the optimistic, most likely and pessimistic "
+                     "duration estimates of each task. Tasks without estimates keep their planned duration.")
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                iterations = st.select_slider("Iterations", options=[1000, 5000, 10000, 20000, 50000], value=10000)
+            with col2:
+                distribution = st.selectbox("Distribution", DISTRIBUTIONS, format_func=str.upper)
+            
+            if schedule is not None:
+                risk = get_project_risk(project_id, iterations, distribution, target_date=project['end_date'])
+                if risk:
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("P50 Completion", risk['p50'])
+                    with col2:
+                        st.metric("P80 Completion", risk['p80'])
+                    with col3:
+                        st.metric("P90 Completion", risk['p90'])
+                    with col4:
+                        st.metric("On-time Probability", f"{risk['on_time_probability'] * 100:.0f}%")
+                    
+                    risk_df = pd.DataFrame({
+                        'Completion Date': pd.to_datetime(risk['histogram']['dates']),
+                        'Iterations': risk['histogram']['counts']
+                    })
+                    fig = px.bar(risk_df, x='Completion Date', y='Iterations', title="Simulated Completion Dates")
+                    fig.add_vline(x=pd.Timestamp(project['end_date']).timestamp() * 1000, line_dash="dash", line_color="crimson",
+                                  annotation_text="Planned end")
+                    st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No tasks found. Add tasks to see timeline analysis.")
     
@@ -308,6 +372,108 @@ def show_reports():
             st.info("No team members assigned to this project. Add team members to see team analysis.")
     
     with tab4:
+        # Earned value analysis
+        st.subheader("Earned Value Analysis")
+        
+        if tasks:
+            status_date = st.date_input("Status Date", value=datetime.date.today())
+            evm = get_project_earned_value(project_id, status_date.strftime('%Y-%m-%d'))
+            metrics = evm['project']
+            
+            def format_index(value):
+                return f"{value:.2f}" if value is not None else "N/A"
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Planned Value (PV)", f"${metrics['pv']:,.2f}")
+                st.metric("Budget at Completion (BAC)", f"${metrics['bac']:,.2f}")
+            with col2:
+                st.metric("Earned Value (EV)", f"${metrics['ev']:,.2f}")
+                st.metric("Estimate at Completion (EAC)", f"${metrics['eac']:,.2f}")
+            with col3:
+                st.metric("Actual Cost (AC)", f"${metrics['ac']:,.2f}")
+                st.metric("Estimate to Complete (ETC)", f"${metrics['etc']:,.2f}")
+            with col4:
+                st.metric("SPI", format_index(metrics['spi']), delta=f"SV ${metrics['sv']:,.2f}")
+                st.metric("CPI", format_index(metrics['cpi']), delta=f"CV ${metrics['cv']:,.2f}")
+            
+            if metrics['bac'] == 0:
+                st.info("Neither the tasks nor the project have a budget. Set task budgets on the Timeline page.")
+            
+            # Time-phased planned value and actual cost, with earned value at the status date
+            import plotly.graph_objects as go
+            series_dates, series_pv, series_ac = downsample_series(
+                evm['series']['dates'], evm['series']['pv'], evm['series']['ac']
+            )
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=series_dates, y=series_pv, mode='lines', name='Planned Value'))
+            fig.add_trace(go.Scatter(x=series_dates, y=series_ac, mode='lines', name='Actual Cost'))
+            fig.add_trace(go.Scatter(x=[metrics['status_date']], y=[metrics['ev']], mode='markers',
+                                     marker=dict(size=12, symbol='diamond'), name='Earned Value'))
+            fig.update_layout(title="Earned Value Over Time", xaxis_title="Date", yaxis_title="Cost ($)")
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Per-task breakdown
+            st.markdown("### Task Breakdown")
+            evm_df = pd.DataFrame([
+                {
+                    'Task': entry['name'],
+                    'BAC': entry['bac'],
+                    'PV': entry['pv'],
+                    'EV': entry['ev'],
+                    'AC': entry['ac'],
+                    'SV': entry['sv'],
+                    'CV': entry['cv'],
+                    'SPI': format_index(entry['spi']),
+                    'CPI': format_index(entry['cpi']),
+                    'EAC': entry['eac'],
+                    'ETC': entry['etc']
+                }
+                for entry in evm['tasks'].values()
+            ])
+            st.dataframe(evm_df.round(2), use_container_width=True)
+            
+            # Record actual costs
+            with st.expander("Record Cost"):
+                with st.form("record_cost_form"):
+                    task_options = {0: "Project (no specific task)"}
+                    task_options.update({task['id']: task['name'] for task in tasks})
+                    cost_task_id = st.selectbox("Task", options=list(task_options.keys()), format_func=task_options.get)
+                    cost_amount = st.number_input("Amount ($)", min_value=0.0, step=100.0)
+                    cost_date = st.date_input("Date Incurred", value=datetime.date.today())
+                    cost_description = st.text_input("Description")
+                    
+                    if st.form_submit_button("Record Cost"):
+                        result = add_cost_entry({
+                            'project_id': project_id,
+                            'task_id': cost_task_id or None,
+                            'amount': cost_amount,
+                            'entry_date': cost_date.strftime('%Y-%m-%d'),
+                            'description': cost_description,
+                            'recorded_by': st.session_state.get('user_id')
+                        })
+                        if result['success']:
+                            st.success(result['message'])
+                            st.rerun()
+                        else:
+                            st.error(result['message'])
+                
+                cost_entries = get_project_cost_entries(project_id)
+                if cost_entries:
+                    task_names = {task['id']: task['name'] for task in tasks}
+                    st.dataframe(pd.DataFrame([
+                        {
+                            'Date': entry['entry_date'],
+                            'Task': task_names.get(entry['task_id'], "Project"),
+                            'Amount': entry['amount'],
+                            'Description': entry['description']
+                        }
+                        for entry in cost_entries
+                    ]), use_container_width=True)
+        else:
+            st.info("No tasks found. Add tasks to see earned value analysis.")
+    
+    with tab5:
         # Export reports
         st.subheader("Export Reports")
         
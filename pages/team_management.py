@@ -3,9 +3,11 @@ import datetime
 import pandas as pd
 from utils.data_management import (
     get_project, get_project_team, add_team_member, update_team_member, load_data,
-    get_team_member, get_project_team_leaders, get_team_members_by_leader, assign_member_to_leader
+    get_team_member, get_project_team_leaders, get_team_members_by_leader, assign_member_to_leader,
+    get_workload
 )
-from utils.visualization import create_team_allocation_chart
+from utils.visualization import create_team_allocation_chart, create_workload_heatmap
+from utils.workload import DEFAULT_CAPACITY
 
 def show_team_management():
     st.title("👥 Team Management")
@@ -37,11 +39,11 @@ def show_team_management():
         st.session_state.active_tab = "Team Overview"
     
     # Figure out which tab should be active
-    tabs = ["Team Overview", "Team Hierarchy", "Member Management"]
+    tabs = ["Team Overview", "Team Hierarchy", "Member Management", "Workload"]
     active_tab_index = tabs.index(st.session_state.active_tab)
     
-    tab1, tab2, tab3 = st.tabs(tabs)
-    tabs_list = [tab1, tab2, tab3]
+    tab1, tab2, tab3, tab4 = st.tabs(tabs)
+    tabs_list = [tab1, tab2, tab3, tab4]
     # The active tab will be used
     
     with tab1:
@@ -485,6 +487,9 @@ def show_team_management():
                         else:
                             st.error("Failed to add team member!")
     
+    with tab4:
+        show_workload(project)
+    
     # Team management best practices
     with st.expander("Team Management Best Practices"):
         st.markdown("""
@@ -499,3 +504,65 @@ def show_team_management():
         
         A well-managed team is essential for project success and efficient execution.
         """)
+
+def show_workload(project):
+    """Display the daily workload of team members and who is over-allocated"""
+    st.subheader("Team Workload")
+    st.write("Number of tasks and subtasks each team member is assigned to on each day.")
+    
+    # Administrators can look across all projects
+    scope = "This Project"
+    if st.session_state.get('user_role') == 'admin':
+        scope = st.radio("Scope", ["This Project", "All Projects"], horizontal=True, key="workload_scope")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start_date = st.date_input(
+            "From",
+            value=datetime.datetime.strptime(project['start_date'], '%Y-%m-%d'),
+            key="workload_start"
+        )
+    with col2:
+        end_date = st.date_input(
+            "To",
+            value=datetime.datetime.strptime(project['end_date'], '%Y-%m-%d'),
+            key="workload_end"
+        )
+    with col3:
+        capacity = st.number_input(
+            "Capacity (concurrent assignments)",
+            min_value=0.5, max_value=10.0, value=DEFAULT_CAPACITY, step=0.5,
+            key="workload_capacity"
+        )
+    
+    if start_date > end_date:
+        st.error("The start date must be before the end date.")
+        return
+    
+    project_id = None if scope == "All Projects" else project['id']
+    matrix, members = get_workload(project_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+    
+    if not members:
+        st.info("No team members to show.")
+        return
+    
+    fig = create_workload_heatmap(matrix, members, start_date, end_date, capacity)
+    if fig:
+        st.plotly_chart(fig, use_container_width=True)
+    
+    # Over-allocation summary
+    st.subheader("Over-allocated Members")
+    member_names = {member['id']: member['name'] for member in members}
+    overallocated = matrix.overallocation(capacity, start_date, end_date)
+    if overallocated:
+        overallocated_df = pd.DataFrame([
+            {
+                'Team Member': member_names[item['member_id']],
+                'Days Over Capacity': item['days_over'],
+                'Peak Assignments': int(item['peak_load'])
+            }
+            for item in sorted(overallocated, key=lambda item: item['days_over'], reverse=True)
+        ])
+        st.dataframe(overallocated_df, use_container_width=True)
+    else:
+        st.success("No team member is over capacity.")
@@ -3,7 +3,13 @@ import datetime
 import pandas as pd
 from utils.data_management import (
     get_project, get_task, get_team_member, get_project_tasks, 
-    get_project_team, get_team_members_by_leader, load_data, save_data
+    get_project_team, get_team_members_by_leader,
+    get_project_meetings_by_status, add_meeting, start_meeting, end_meeting,
+    cancel_meeting, save_meeting_minutes, find_meeting_conflicts, find_free_slots,
+    get_open_action_items_by_project,
+    get_completed_action_items_by_project, get_open_action_items_by_assignee,
+    get_action_items_for_meetings,
+    create_action_item, update_action_item_status
 )
 
 def show_team_meetings():
@@ -104,59 +110,93 @@ def show_meeting_scheduler(project_id):
             elif not participant_ids:
                 st.error("Please select at least one participant.")
             else:
-                # Create meeting
-                meetings = load_data('meetings')
-                
-                # Generate new meeting ID
-                new_id = 1
-                if meetings:
-                    new_id = max(m['id'] for m in meetings) + 1
-                
                 # Create meeting datetime
                 meeting_datetime = datetime.datetime.combine(meeting_date, meeting_time)
                 
-                new_meeting = {
-                    'id': new_id,
-                    'project_id': project_id,
-                    'title': meeting_title,
-                    'datetime': meeting_datetime.strftime('%Y-%m-%d %H:%M'),
-                    'duration': meeting_duration,
-                    'location': meeting_location,
-                    'agenda': meeting_agenda,
-                    'participants': participant_ids,
-                    'organized_by': st.session_state.team_member_id,
-                    'status': 'Scheduled',
-                    'minutes': '',
-                    'action_items': []
-                }
-                
-                meetings.append(new_meeting)
-                save_data('meetings', meetings)
-                
-                st.success(f"Meeting '{meeting_title}' scheduled successfully!")
-                st.rerun()
+                # Participants cannot be in two meetings at once
+                conflicts = find_meeting_conflicts(participant_ids, meeting_datetime, meeting_duration)
+                if conflicts:
+                    st.error("Some participants already have a meeting at this time:")
+                    for conflict in conflicts:
+                        member = get_team_member(conflict['member_id'])
+                        member_name = member['name'] if member else f"Member {conflict['member_id']}"
+                        st.write(f"- {member_name}: {conflict['title']} "
+                                 f"({conflict['start'].strftime('%b %d, %I:%M %p')} - "
+                                 f"{conflict['end'].strftime('%I:%M %p')})")
+                    st.info("Use 'Find a Free Slot' below to pick a time that suits everyone.")
+                else:
+                    new_meeting = {
+                        'project_id': project_id,
+                        'title': meeting_title,
+                        'datetime': meeting_datetime.strftime('%Y-%m-%d %H:%M'),
+                        'duration': meeting_duration,
+                        'location': meeting_location,
+                        'agenda': meeting_agenda,
+                        'participants': participant_ids,
+                        'organized_by': st.session_state.team_member_id,
+                        'status': 'Scheduled',
+                        'minutes': ''
+                    }
+                    
+                    add_meeting(new_meeting)
+                    
+                    st.success(f"Meeting '{meeting_title}' scheduled successfully!")
+                    st.rerun()
+    
+    # Suggest times when everyone is available
+    show_free_slot_finder(team_members)
     
     # Display upcoming meetings
     show_upcoming_meetings(project_id)
 
+def show_free_slot_finder(team_members):
+    """Find the next time slots in which the selected team members are all free"""
+    with st.expander("Find a Free Slot"):
+        if not team_members:
+            st.info("This project has no team members yet.")
+            return
+        
+        member_names = {member['id']: member['name'] for member in team_members}
+        default_members = [st.session_state.team_member_id] if st.session_state.team_member_id in member_names else []
+        selected_members = st.multiselect(
+            "Participants",
+            options=list(member_names.keys()),
+            default=default_members,
+            format_func=lambda member_id: member_names[member_id],
+            key="free_slot_members"
+        )
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            duration = st.slider("Duration (minutes)", min_value=15, max_value=180, value=60, step=15, key="free_slot_duration")
+        with col2:
+            earliest_date = st.date_input("Earliest Date", value=datetime.date.today(), key="free_slot_date")
+        with col3:
+            slot_count = st.number_input("Number of Slots", min_value=1, max_value=20, value=5, key="free_slot_count")
+        
+        if st.button("Find Slots", key="find_free_slots"):
+            if not selected_members:
+                st.error("Please select at least one participant.")
+                return
+            
+            earliest = max(datetime.datetime.combine(earliest_date, datetime.time(0, 0)), datetime.datetime.now())
+            slots = find_free_slots(selected_members, duration, earliest=earliest, count=int(slot_count))
+            if slots:
+                st.write("**Everyone is available at:**")
+                for start, end in slots:
+                    st.write(f"- {start.strftime('%a, %b %d, %Y')}: {start.strftime('%I:%M %p')} - {end.strftime('%I:%M %p')}")
+            else:
+                st.info("No common free slot was found in working hours over the coming weeks.")
+
 def show_upcoming_meetings(project_id):
     """Display upcoming meetings for the project"""
     st.subheader("Upcoming Meetings")
     
-    meetings = load_data('meetings')
-    
-    # Filter meetings for this project that are scheduled in the future
-    now = datetime.datetime.now()
-    upcoming_meetings = []
-    
-    for meeting in meetings:
-        if meeting['project_id'] == project_id and meeting['status'] == 'Scheduled':
-            meeting_time = datetime.datetime.strptime(meeting['datetime'], '%Y-%m-%d %H:%M')
-            if meeting_time > now:
-                upcoming_meetings.append(meeting)
+    # Scheduled meetings of this project in the future, soonest first
+    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+    upcoming_meetings = get_project_meetings_by_status(project_id, ['Scheduled'], after=now)
     
     if upcoming_meetings:
-        # Sort by meeting date
         # Add helper function to parse meeting datetime
         def parse_meeting_datetime(meeting_datetime):
             try:
@@ -169,8 +209,6 @@ def show_upcoming_meetings(project_id):
                 except ValueError:
                     # Default fallback
                     return datetime.datetime.now()
-                    
-        upcoming_meetings.sort(key=lambda x: parse_meeting_datetime(x['datetime']))
         
         for meeting in upcoming_meetings:
             # Parse meeting datetime with flexible format
@@ -206,15 +244,19 @@ def show_upcoming_meetings(project_id):
                     col1, col2 = st.columns(2)
                     with col1:
                         if st.button("Start Meeting", key=f"start_{meeting['id']}"):
-                            start_meeting(meeting['id'])
-                            st.success("Meeting started!")
-                            st.rerun()
+                            if start_meeting(meeting['id']):
+                                st.success("Meeting started!")
+                                st.rerun()
+                            else:
+                                st.error("This meeting is no longer scheduled.")
                     
                     with col2:
                         if st.button("Cancel Meeting", key=f"cancel_{meeting['id']}"):
-                            cancel_meeting(meeting['id'])
-                            st.success("Meeting cancelled!")
-                            st.rerun()
+                            if cancel_meeting(meeting['id']):
+                                st.success("Meeting cancelled!")
+                                st.rerun()
+                            else:
+                                st.error("This meeting is no longer scheduled.")
     else:
         st.info("No upcoming meetings scheduled for this project.")
 
@@ -222,11 +264,9 @@ def show_meeting_minutes(project_id):
     """Display and record meeting minutes"""
     st.subheader("Meeting Minutes")
     
-    meetings = load_data('meetings')
-    
-    # Filter active meetings for this project
-    active_meetings = [m for m in meetings if m['project_id'] == project_id and m['status'] == 'In Progress']
-    past_meetings = [m for m in meetings if m['project_id'] == project_id and m['status'] == 'Completed']
+    # Active and past meetings of this project (past meetings most recent first)
+    active_meetings = get_project_meetings_by_status(project_id, ['In Progress'])
+    past_meetings = get_project_meetings_by_status(project_id, ['Completed'], descending=True)
     
     tab1, tab2 = st.tabs(["Active Meetings", "Past Meetings"])
     
@@ -257,29 +297,20 @@ def show_meeting_minutes(project_id):
                     
                     with col2:
                         if st.button("End Meeting", key=f"end_{meeting['id']}"):
-                            end_meeting(meeting['id'])
-                            st.success("Meeting completed!")
-                            st.rerun()
+                            if end_meeting(meeting['id']):
+                                st.success("Meeting completed!")
+                                st.rerun()
+                            else:
+                                st.error("This meeting is no longer in progress.")
         else:
             st.info("No active meetings for this project.")
     
     with tab2:
         if past_meetings:
-            # Sort by date (most recent first)
-            # Fix datetime format parsing - handle different formats
-            def parse_meeting_datetime(meeting_datetime):
-                try:
-                    # Try with seconds
-                    return datetime.datetime.strptime(meeting_datetime, '%Y-%m-%d %H:%M:%S')
-                except ValueError:
-                    try:
-                        # Try without seconds
-                        return datetime.datetime.strptime(meeting_datetime, '%Y-%m-%d %H:%M')
-                    except ValueError:
-                        # Default fallback
-                        return datetime.datetime.now()
-                
-            past_meetings.sort(key=lambda x: parse_meeting_datetime(x['datetime']), reverse=True)
+            # Load the action items of all past meetings in one query
+            past_action_items = {}
+            for item in get_action_items_for_meetings([m['id'] for m in past_meetings]):
+                past_action_items.setdefault(item['meeting_id'], []).append(item)
             
             for meeting in past_meetings:
                 with st.expander(f"{meeting['title']} - {meeting['datetime']}"):
@@ -290,9 +321,9 @@ def show_meeting_minutes(project_id):
                         st.info("No minutes recorded for this meeting.")
                     
                     # Display action items
-                    if meeting.get('action_items'):
+                    if past_action_items.get(meeting['id']):
                         st.subheader("Action Items")
-                        for item in meeting['action_items']:
+                        for item in past_action_items[meeting['id']]:
                             status_color = "green" if item['status'] == "Completed" else "orange"
                             st.markdown(f"- **{item['description']}** (Assigned to: {item['assignee_name']}) "
                                        f"- <span style='color:{status_color}'>{item['status']}</span>", unsafe_allow_html=True)
@@ -303,23 +334,8 @@ def show_action_items(project_id):
     """Display and manage action items from meetings"""
     st.subheader("Meeting Action Items")
     
-    meetings = load_data('meetings')
-    
-    # Get all action items across all meetings for this project
-    all_action_items = []
-    
-    for meeting in meetings:
-        if meeting['project_id'] == project_id and meeting.get('action_items'):
-            for item in meeting['action_items']:
-                # Add meeting info to each action item
-                item_with_context = item.copy()
-                item_with_context['meeting_id'] = meeting['id']
-                item_with_context['meeting_title'] = meeting['title']
-                item_with_context['meeting_date'] = meeting['datetime']
-                all_action_items.append(item_with_context)
-    
     # Create action items from current meeting
-    active_meetings = [m for m in meetings if m['project_id'] == project_id and m['status'] == 'In Progress']
+    active_meetings = get_project_meetings_by_status(project_id, ['In Progress'])
     
     if active_meetings:
         st.subheader("Create New Action Item")
@@ -352,43 +368,25 @@ def show_action_items(project_id):
                 if not action_description:
                     st.error("Please enter a description for the action item.")
                 else:
-                    # Get the assignee name
-                    assignee = get_team_member(assignee_id)
-                    assignee_name = assignee['name'] if assignee else "Unknown"
-                    
-                    # Create new action item
-                    new_action_item = {
-                        'id': len(all_action_items) + 1,
+                    create_action_item({
+                        'meeting_id': selected_meeting_id,
+                        'project_id': project_id,
                         'description': action_description,
                         'assignee_id': assignee_id,
-                        'assignee_name': assignee_name,
                         'due_date': due_date.strftime('%Y-%m-%d'),
                         'status': 'In Progress',
                         'created_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
-                    }
-                    
-                    # Add action item to the meeting
-                    for meeting in meetings:
-                        if meeting['id'] == selected_meeting_id:
-                            if 'action_items' not in meeting:
-                                meeting['action_items'] = []
-                            
-                            meeting['action_items'].append(new_action_item)
-                            break
-                    
-                    save_data('meetings', meetings)
+                    })
                     st.success("Action item created successfully!")
                     st.rerun()
     
     # Display all action items
-    tab1, tab2 = st.tabs(["Open Action Items", "Completed Action Items"])
+    tab1, tab2, tab3 = st.tabs(["Open Action Items", "Completed Action Items", "My Action Items"])
     
     with tab1:
-        open_items = [item for item in all_action_items if item['status'] != 'Completed']
+        # Sorted by due date in the query
+        open_items = get_open_action_items_by_project(project_id)
         if open_items:
-            # Sort by due date
-            open_items.sort(key=lambda x: datetime.datetime.strptime(x['due_date'], '%Y-%m-%d'))
-            
             for item in open_items:
                 with st.expander(f"{item['description']} (Due: {item['due_date']})"):
                     st.write(f"**From Meeting:** {item['meeting_title']} on {item['meeting_date']}")
@@ -397,19 +395,17 @@ def show_action_items(project_id):
                     
                     # Allow updating status if assigned to current user
                     if st.session_state.team_member_id and st.session_state.team_member_id == item['assignee_id']:
-                        if st.button("Mark as Completed", key=f"complete_{item['id']}_{item['meeting_id']}"):
-                            update_action_item_status(item['meeting_id'], item['id'], 'Completed')
+                        if st.button("Mark as Completed", key=f"complete_{item['id']}"):
+                            update_action_item_status(item['id'], 'Completed')
                             st.success("Action item marked as completed!")
                             st.rerun()
         else:
             st.info("No open action items for this project.")
     
     with tab2:
-        completed_items = [item for item in all_action_items if item['status'] == 'Completed']
+        # Sorted by due date in the query
+        completed_items = get_completed_action_items_by_project(project_id)
         if completed_items:
-            # Sort by due date
-            completed_items.sort(key=lambda x: datetime.datetime.strptime(x['due_date'], '%Y-%m-%d'))
-            
             for item in completed_items:
                 with st.expander(f"{item['description']} (Completed)"):
                     st.write(f"**From Meeting:** {item['meeting_title']} on {item['meeting_date']}")
@@ -417,63 +413,16 @@ def show_action_items(project_id):
                     st.write(f"**Due Date:** {item['due_date']}")
         else:
             st.info("No completed action items for this project.")
-
-def start_meeting(meeting_id):
-    """Mark a meeting as started (in progress)"""
-    meetings = load_data('meetings')
-    
-    for meeting in meetings:
-        if meeting['id'] == meeting_id:
-            meeting['status'] = 'In Progress'
-            meeting['start_time'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
-            break
     
-    save_data('meetings', meetings)
-
-def end_meeting(meeting_id):
-    """Mark a meeting as completed"""
-    meetings = load_data('meetings')
-    
-    for meeting in meetings:
-        if meeting['id'] == meeting_id:
-            meeting['status'] = 'Completed'
-            meeting['end_time'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
-            break
-    
-    save_data('meetings', meetings)
-
-def cancel_meeting(meeting_id):
-    """Cancel a scheduled meeting"""
-    meetings = load_data('meetings')
-    
-    for meeting in meetings:
-        if meeting['id'] == meeting_id:
-            meeting['status'] = 'Cancelled'
-            break
-    
-    save_data('meetings', meetings)
-
-def save_meeting_minutes(meeting_id, minutes):
-    """Save minutes for a meeting"""
-    meetings = load_data('meetings')
-    
-    for meeting in meetings:
-        if meeting['id'] == meeting_id:
-            meeting['minutes'] = minutes
-            break
-    
-    save_data('meetings', meetings)
-
-def update_action_item_status(meeting_id, action_item_id, status):
-    """Update the status of an action item"""
-    meetings = load_data('meetings')
-    
-    for meeting in meetings:
-        if meeting['id'] == meeting_id and meeting.get('action_items'):
-            for item in meeting['action_items']:
-                if item['id'] == action_item_id:
-                    item['status'] = status
-                    item['completed_at'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M') if status == 'Completed' else None
-                    break
-    
-    save_data('meetings', meetings)
\ No newline at end of file
+    with tab3:
+        # Open items assigned to the current user across all projects
+        if st.session_state.team_member_id:
+            my_items = get_open_action_items_by_assignee(st.session_state.team_member_id)
+            if my_items:
+                for item in my_items:
+                    st.write(f"- **{item['description']}** (Due: {item['due_date']}) - "
+                             f"from {item['meeting_title']} on {item['meeting_date']}")
+            else:
+                st.info("You have no open action items.")
+        else:
+            st.info("Your account is not linked to a team member.")
@@ -3,12 +3,21 @@ import datetime
 import pandas as pd
 import numpy as np
 from utils.data_management import (
-    get_project, get_project_tasks, add_task, update_task, get_project_team, 
+    get_project, get_project_tasks, add_task, edit_task, get_project_team, 
     get_team_member, get_project_team_leaders, get_team_members_by_leader,
     assign_task_to_team, get_tasks_awaiting_approval, approve_task, reject_task,
-    get_dependent_tasks, analyze_schedule_impact
+    get_dependent_tasks,
+    get_wbs_outline, add_work_package, move_wbs_node, delete_wbs_node,
+    get_project_baselines, set_current_baseline
 )
-from utils.visualization import create_gantt_chart, create_burndown_chart
+from utils.visualization import (
+    create_gantt_chart, create_burndown_chart, create_burnup_chart,
+    create_progress_history_chart, create_velocity_chart, create_baseline_chart
+)
+from utils.baselines import capture_baseline, get_baseline_variance
+from utils.progress_history import get_burndown_history, get_velocity
+from utils.scheduling import DependencyCycleError
+from utils.scenarios import Scenario, StaleScenarioError, get_project_snapshot, compare_scenarios, promote_scenario
 
 def show_timeline():
     st.title("📅 Project Timeline Management")
@@ -45,13 +54,35 @@ def show_timeline():
             fig = create_gantt_chart(project_id, tasks)
             st.plotly_chart(fig, use_container_width=True)
             
-            # Burndown chart
+            # Burndown or burnup chart
             st.subheader("Burndown Chart")
-            burndown_fig = create_burndown_chart(project_id, tasks)
-            if burndown_fig:
-                st.plotly_chart(burndown_fig, use_container_width=True)
+            chart_type = st.radio("Chart Type", ["Burndown", "Burnup", "Recorded History"], horizontal=True, key="burn_chart_type")
+            if chart_type == "Recorded History":
+                burndown = get_burndown_history(project_id)
+                if burndown is not None:
+                    st.plotly_chart(create_progress_history_chart(burndown), use_container_width=True)
+                    period = st.radio("Velocity Period", ["Weekly", "Monthly"], horizontal=True, key="velocity_period")
+                    period_starts, completed = get_velocity(burndown, 'W' if period == "Weekly" else 'M')
+                    st.plotly_chart(create_velocity_chart(period_starts, completed), use_container_width=True)
+                else:
+                    st.info("No progress history has been recorded for this project yet. Snapshots are taken daily.")
             else:
-                st.info("Burndown chart will be available when tasks are added with start and end dates.")
+                if chart_type == "Burndown":
+                    burndown_fig = create_burndown_chart(project_id, tasks)
+                else:
+                    burndown_fig = create_burnup_chart(project_id, tasks)
+                if burndown_fig:
+                    st.plotly_chart(burndown_fig, use_container_width=True)
+                else:
+                    st.info("Burndown chart will be available when tasks are added with start and end dates.")
+            
+            # Work breakdown structure
+            st.subheader("Work Breakdown Structure")
+            show_work_breakdown(project_id)
+            
+            # Baseline comparison
+            st.subheader("Baseline vs Actual")
+            show_baseline_comparison(project_id, tasks)
         else:
             st.info("No tasks found. Add tasks in the Task Management tab to see the timeline.")
     
@@ -236,6 +267,8 @@ def show_timeline():
                 min_value=0, 
                 max_value=100, 
                 value=current_task.get('progress', 0),
+                disabled=bool(current_task.get('subtask_count')),
+                help="Tasks with subtasks take the average progress of their subtasks." if current_task.get('subtask_count') else None,
                 key="task_progress"
             )
             
@@ -253,6 +286,36 @@ def show_timeline():
                 key="requires_approval"
             )
             
+            # Budget at completion used by earned value analysis
+            task_budget = st.number_input(
+                "Budget ($)",
+                min_value=0.0,
+                value=current_task.get('budget'),
+                step=100.0,
+                help="Leave empty to share the project budget across tasks by duration",
+                key="task_budget"
+            )
+            
+            # Three-point duration estimates used by the schedule risk simulation
+            with st.expander("Duration Estimates (for Schedule Risk)"):
+                st.caption("Leave empty to use the planned duration.")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    optimistic_days = st.number_input(
+                        "Optimistic (days)", min_value=0.0, value=current_task.get('optimistic_days'), key="optimistic_days"
+                    )
+                with col2:
+                    most_likely_days = st.number_input(
+                        "Most Likely (days)", min_value=0.0, value=current_task.get('most_likely_days'), key="most_likely_days"
+                    )
+                with col3:
+                    pessimistic_days = st.number_input(
+                        "Pessimistic (days)", min_value=0.0, value=current_task.get('pessimistic_days'), key="pessimistic_days"
+                    )
+            
+            estimates = [e for e in (optimistic_days, most_likely_days, pessimistic_days) if e is not None]
+            estimates_valid = estimates == sorted(estimates)
+            
             # Dependencies (only show if there are other tasks)
             dependencies = []
             if tasks and not (editing_task and len(tasks) == 1):
@@ -356,6 +419,8 @@ def show_timeline():
                             st.error("Task name is required!")
                         elif task_start > task_end:
                             st.error("End date must be after start date!")
+                        elif not estimates_valid:
+                            st.error("Duration estimates must be ordered: optimistic ≤ most likely ≤ pessimistic.")
                         else:
                             task_data = {
                                 'name': task_name,
@@ -367,16 +432,26 @@ def show_timeline():
                                 'dependencies': dependencies,
                                 'is_milestone': is_milestone,
                                 'requires_approval': requires_approval,
+                                'optimistic_days': optimistic_days,
+                                'most_likely_days': most_likely_days,
+                                'pessimistic_days': pessimistic_days,
+                                'budget': task_budget,
                                 'assigned_members': assigned_members
                             }
                             
-                            success = update_task(st.session_state.editing_task_id, task_data)
-                            if success:
-                                st.success("Task updated successfully!")
+                            result = edit_task(st.session_state.editing_task_id, task_data)
+                            if result['success']:
+                                st.success(result['message'])
                                 st.session_state.editing_task_id = None
                                 st.rerun()
+                            elif result.get('cycle'):
+                                # Show the chain of tasks that would wait on each other
+                                task_names = {t['id']: t['name'] for t in tasks}
+                                chain = " → ".join(task_names.get(t_id, f"Task #{t_id}") for t_id in result['cycle'])
+                                st.error(f"{result['message']} Each task below would have to wait for the one before it:")
+                                st.write(chain)
                             else:
-                                st.error("Failed to update task!")
+                                st.error(result['message'])
                 
                 with col2:
                     if st.button("Cancel Editing"):
@@ -388,6 +463,8 @@ def show_timeline():
                         st.error("Task name is required!")
                     elif task_start > task_end:
                         st.error("End date must be after start date!")
+                    elif not estimates_valid:
+                        st.error("Duration estimates must be ordered: optimistic ≤ most likely ≤ pessimistic.")
                     else:
                         task_data = {
                             'project_id': project_id,
@@ -400,6 +477,10 @@ def show_timeline():
                             'dependencies': dependencies,
                             'is_milestone': is_milestone,
                             'requires_approval': requires_approval,
+                            'optimistic_days': optimistic_days,
+                            'most_likely_days': most_likely_days,
+                            'pessimistic_days': pessimistic_days,
+                            'budget': task_budget,
                             'assigned_members': assigned_members
                         }
                         
@@ -474,77 +555,23 @@ def show_timeline():
                 st.info("No tasks are currently awaiting approval.")
         
         with impact_col:
-            st.subheader("Dependency Impact Analysis")
-            st.write("Analyze how changes to a task will impact dependent tasks.")
+            st.subheader("What-If Scenarios")
+            st.write("Try schedule changes in a sandbox and compare their impact before submitting them for approval.")
             
-            # Task selection for impact analysis
             if tasks:
-                selected_task_id = st.selectbox(
-                    "Select a task to analyze potential changes:",
-                    options=[t['id'] for t in tasks],
-                    format_func=lambda x: next((t['name'] for t in tasks if t['id'] == x), "Unknown"),
-                    key="impact_task_id"
-                )
-                
-                # Get the selected task
-                selected_task = next((t for t in tasks if t['id'] == selected_task_id), None)
-                
-                if selected_task:
-                    st.write(f"Current end date: {selected_task['end_date']}")
-                    
-                    # New end date picker
-                    new_end_date = st.date_input(
-                        "Proposed new end date:",
-                        value=datetime.datetime.strptime(selected_task['end_date'], '%Y-%m-%d'),
-                        min_value=datetime.datetime.strptime(project['start_date'], '%Y-%m-%d'),
-                        max_value=datetime.datetime.strptime(project['end_date'], '%Y-%m-%d'),
-                        key="impact_end_date"
-                    )
-                    
-                    # Convert to string format for comparison
-                    new_end_date_str = new_end_date.strftime('%Y-%m-%d')
-                    
-                    if new_end_date_str != selected_task['end_date']:
-                        # Analyze impact
-                        if st.button("Analyze Impact"):
-                            impacts = analyze_schedule_impact(selected_task_id, new_end_date_str)
-                            
-                            if impacts:
-                                st.subheader("Tasks Impacted:")
-                                st.write(f"Proposed change will affect {len(impacts)} dependent task(s).")
-                                
-                                for impact in impacts:
-                                    with st.expander(f"⚠️ {impact['task_name']} will be affected"):
-                                        st.write(f"**Current timeline:** {impact['current_start']} to {impact['current_end']}")
-                                        st.write(f"**Suggested new timeline:** {impact['suggested_start']} to {impact['suggested_end']}")
-                                        st.write(f"**Days shifted:** {impact['impact_days']}")
-                                        
-                                        if impact['impact_days'] > 0:
-                                            st.warning(f"⚠️ This task will be delayed by {impact['impact_days']} days")
-                                        elif impact['impact_days'] < 0:
-                                            st.success(f"✅ This task can start {abs(impact['impact_days'])} days earlier")
-                                        
-                                # Option to apply changes
-                                if st.button("Apply All Changes"):
-                                    st.warning("This would update all dependent tasks. This feature is coming soon.")
-                            else:
-                                st.success("No dependent tasks will be affected by this change.")
-                    else:
-                        st.info("Change the end date to see potential impacts on dependent tasks.")
+                show_what_if_scenarios(project_id, tasks)
             else:
-                st.info("No tasks available for impact analysis.")
+                st.info("No tasks available for what-if scenarios.")
                 
             st.markdown("""
-            ### About Impact Analysis
-            
-            The impact analysis tool helps visualize how changes to one task will affect other dependent tasks in the project timeline.
+            ### About What-If Scenarios
             
-            When a task's timeline changes:
-            - Tasks that depend on it may need to be rescheduled
-            - Project completion dates may be affected
-            - Resource allocation might need adjustments
+            A scenario collects proposed task changes without touching the project. For every scenario:
+            - The full schedule is recalculated, including all downstream dependencies
+            - Project completion dates are compared side by side with the current plan
+            - Nothing is saved until the scenario is submitted as change requests
             
-            Use this tool before approving timeline changes to understand the full impact on your project.
+            Use scenarios before approving timeline changes to understand the full impact on your project.
             """)
 
     # Timeline best practices
@@ -563,3 +590,288 @@ def show_timeline():
         
         Well-managed timelines help keep projects on track and provide clear visibility into project progress.
         """)
+
+def show_work_breakdown(project_id):
+    """Show the WBS outline of a project with a form to add work packages"""
+    outline = get_wbs_outline(project_id)
+    if not outline:
+        st.info("The work breakdown structure will be available once tasks are added.")
+        return
+    
+    wbs_df = pd.DataFrame([
+        {
+            'WBS': entry['code'],
+            'Name': "\u2003" * entry['level'] + (entry['name'] or ''),
+            'Type': entry['kind'],
+            'Start': entry['start_date'],
+            'End': entry['end_date'],
+            'Progress': f"{entry['progress'] or 0}%",
+            'Rolled-up Progress': f"{entry['rolled_up_progress']:.0f}%"
+        }
+        for entry in outline
+    ])
+    st.dataframe(wbs_df, use_container_width=True, hide_index=True)
+    
+    labels = {entry['id']: f"{entry['code']} {entry['name'] or ''}" for entry in outline}
+    labels[None] = "(Top level)"
+    
+    with st.expander("Add Work Package"):
+        with st.form("add_work_package_form"):
+            parent_id = st.selectbox("Parent", options=[None] + [entry['id'] for entry in outline],
+                                     format_func=labels.get,
+                                     help="Top-level work packages can group tasks into larger deliverables.")
+            package_name = st.text_input("Name")
+            package_description = st.text_area("Description")
+            col1, col2 = st.columns(2)
+            with col1:
+                package_start = st.date_input("Start Date", value=None)
+            with col2:
+                package_end = st.date_input("End Date", value=None)
+            package_progress = st.slider("Progress (%)", min_value=0, max_value=100, value=0)
+            
+            if st.form_submit_button("Add Work Package"):
+                if package_start and package_end and package_start > package_end:
+                    st.error("End date must be after start date!")
+                else:
+                    result = add_work_package({
+                        'project_id': project_id,
+                        'parent_id': parent_id,
+                        'name': package_name,
+                        'description': package_description,
+                        'start_date': package_start.strftime('%Y-%m-%d') if package_start else None,
+                        'end_date': package_end.strftime('%Y-%m-%d') if package_end else None,
+                        'progress': package_progress
+                    })
+                    if result['success']:
+                        st.success(result['message'])
+                        st.rerun()
+                    else:
+                        st.error(result['message'])
+    
+    packages = [entry for entry in outline if entry['kind'] == 'Work Package']
+    movable = [entry for entry in outline if entry['kind'] != 'Subtask']
+    with st.expander("Move Task or Work Package"):
+        with st.form("move_wbs_node_form"):
+            node_id = st.selectbox("Item", options=[entry['id'] for entry in movable], format_func=labels.get)
+            new_parent_id = st.selectbox("New Parent", options=[None] + [entry['id'] for entry in packages],
+                                         format_func=labels.get)
+            
+            if st.form_submit_button("Move"):
+                if move_wbs_node(node_id, new_parent_id):
+                    st.success("Moved.")
+                    st.rerun()
+                else:
+                    st.error("This move is not allowed. Tasks can only be placed at the top level or below "
+                             "work packages that are not part of a task, and nothing can move into its own subtree.")
+    
+    if packages:
+        with st.expander("Remove Work Package"):
+            package_id = st.selectbox("Work Package", options=[entry['id'] for entry in packages],
+                                      format_func=labels.get, key="remove_work_package")
+            if st.button("Remove Work Package"):
+                if delete_wbs_node(package_id):
+                    st.success("Work package removed.")
+                    st.rerun()
+                else:
+                    st.error("Work packages containing tasks or subtasks cannot be removed.")
+
+def show_baseline_comparison(project_id, tasks):
+    """Compare the current plan of a project against one of its baselines"""
+    baselines = get_project_baselines(project_id)
+    
+    if baselines:
+        labels = {
+            baseline['id']: f"{baseline['name']} ({baseline['created_at']})" + (" - current" if baseline['is_current'] else "")
+            for baseline in baselines
+        }
+        current_index = next((i for i, baseline in enumerate(baselines) if baseline['is_current']), 0)
+        baseline_id = st.selectbox("Baseline", options=list(labels.keys()), index=current_index,
+                                   format_func=labels.get, key="baseline_id")
+        
+        variance = get_baseline_variance(project_id, baseline_id)
+        summary = variance['summary']
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Baseline Finish", summary['baseline_finish'] or "N/A")
+        with col2:
+            st.metric("Current Finish", summary['current_finish'] or "N/A",
+                      delta=f"{summary['project_finish_variance']} days", delta_color="inverse")
+        with col3:
+            st.metric("Tasks Finishing Late", summary['tasks_late'])
+        with col4:
+            st.metric("Tasks Finishing Early", summary['tasks_early'])
+        
+        task_names = {task['id']: task['name'] for task in tasks}
+        fig = create_baseline_chart(variance, task_names)
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+        
+        if len(variance['added_task_ids']) or len(variance['removed_task_ids']):
+            st.caption(f"{len(variance['added_task_ids'])} task(s) added and "
+                       f"{len(variance['removed_task_ids'])} task(s) removed since this baseline.")
+        
+        with st.expander("Variance by Task"):
+            variance_df = pd.DataFrame({
+                'Task': [task_names.get(int(task_id), f"Task #{task_id}") for task_id in variance['task_id']],
+                'Baseline Start': variance['baseline_start'].astype(str),
+                'Baseline Finish': variance['baseline_finish'].astype(str),
+                'Current Start': variance['current_start'].astype(str),
+                'Current Finish': variance['current_finish'].astype(str),
+                'Start Variance (days)': variance['start_variance'],
+                'Finish Variance (days)': variance['finish_variance'],
+                'Progress Variance (%)': variance['progress_variance']
+            })
+            st.dataframe(variance_df.sort_values('Finish Variance (days)', ascending=False),
+                         use_container_width=True, hide_index=True)
+        
+        if not any(baseline['is_current'] for baseline in baselines if baseline['id'] == baseline_id):
+            if st.button("Use as Current Baseline"):
+                set_current_baseline(baseline_id)
+                st.rerun()
+    else:
+        st.info("No baseline saved yet. Save one to track schedule variance against the approved plan.")
+    
+    with st.expander("Save Baseline"):
+        with st.form("save_baseline_form"):
+            baseline_name = st.text_input("Baseline Name", value=f"Baseline {len(baselines) + 1}")
+            make_current = st.checkbox("Use as current baseline", value=True)
+            if st.form_submit_button("Save Baseline"):
+                if not baseline_name:
+                    st.error("Baseline name is required!")
+                else:
+                    capture_baseline(project_id, baseline_name, st.session_state.get('user_id'), make_current)
+                    st.success("Baseline saved!")
+                    st.rerun()
+
+def show_what_if_scenarios(project_id, tasks):
+    """Create, edit, compare and promote what-if scenarios of a project"""
+    if 'scenarios' not in st.session_state:
+        st.session_state.scenarios = {}
+    scenarios = st.session_state.scenarios.setdefault(project_id, {})
+    
+    with st.form("new_scenario_form", clear_on_submit=True):
+        scenario_name = st.text_input("New Scenario Name", value=f"Scenario {len(scenarios) + 1}")
+        if st.form_submit_button("Create Scenario"):
+            if not scenario_name:
+                st.error("Scenario name is required!")
+            elif scenario_name in scenarios:
+                st.error("A scenario with this name already exists!")
+            else:
+                scenarios[scenario_name] = Scenario(get_project_snapshot(project_id), scenario_name)
+                st.rerun()
+    
+    if not scenarios:
+        st.info("No scenarios yet. Create one to start exploring changes.")
+        return
+    
+    scenario_name = st.selectbox("Scenario", options=list(scenarios.keys()), key="scenario_name")
+    scenario = scenarios[scenario_name]
+    
+    if not scenario.snapshot.is_current():
+        st.warning("The project schedule has changed since this scenario was created.")
+        if st.button("Rebase on Current Plan"):
+            scenarios[scenario_name] = scenario.rebase()
+            st.rerun()
+    
+    task_names = {task_id: task['name'] for task_id, task in scenario.snapshot.tasks.items()}
+    
+    # Edit a task within the scenario
+    with st.expander("Change a Task", expanded=not scenario.changes()):
+        task_id = st.selectbox("Task", options=list(task_names.keys()), format_func=task_names.get,
+                               key="scenario_task_id")
+        task = scenario.get_task(task_id)
+        with st.form("scenario_task_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                start_date = st.date_input("Start Date", value=datetime.date.fromisoformat(task['start_date']))
+            with col2:
+                end_date = st.date_input("End Date", value=datetime.date.fromisoformat(task['end_date']))
+            dependencies = st.multiselect(
+                "Depends On",
+                options=[other_id for other_id in task_names if other_id != task_id],
+                default=[dep_id for dep_id in task['dependencies'] if dep_id in task_names],
+                format_func=task_names.get
+            )
+            if st.form_submit_button("Apply to Scenario"):
+                if start_date > end_date:
+                    st.error("End date must not be before start date!")
+                else:
+                    scenario.update_task(task_id, {
+                        'start_date': start_date.strftime('%Y-%m-%d'),
+                        'end_date': end_date.strftime('%Y-%m-%d'),
+                        'dependencies': dependencies
+                    })
+                    st.rerun()
+    
+    changes = scenario.changes()
+    if changes:
+        st.write(f"**Changes in {scenario.name}:**")
+        for task_id, changed in changes.items():
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                base = scenario.snapshot.tasks[task_id]
+                descriptions = []
+                for field, value in changed.items():
+                    if field == 'dependencies':
+                        value = ", ".join(task_names.get(dep_id, f"#{dep_id}") for dep_id in value) or "none"
+                        descriptions.append(f"depends on {value}")
+                    else:
+                        descriptions.append(f"{field.replace('_', ' ')} {base.get(field)} → {value}")
+                st.write(f"- {task_names[task_id]}: " + "; ".join(descriptions))
+            with col2:
+                if st.button("Revert", key=f"revert_scenario_task_{task_id}"):
+                    scenario.revert_task(task_id)
+                    st.rerun()
+    
+    # Side-by-side comparison of scenarios on the same snapshot
+    comparable = [other for other in scenarios.values() if other.snapshot is scenario.snapshot]
+    compared = st.multiselect("Compare", options=[other.name for other in comparable],
+                              default=[other.name for other in comparable], key="compared_scenarios")
+    try:
+        comparison = compare_scenarios(scenario.snapshot, [other for other in comparable if other.name in compared])
+    except DependencyCycleError as e:
+        st.error(f"Scenarios cannot be compared: {e}")
+        comparison = None
+    
+    if comparison:
+        summary_df = pd.DataFrame(comparison['summary']).rename(columns={
+            'plan': 'Plan',
+            'changed_tasks': 'Changed Tasks',
+            'project_finish': 'Project Finish',
+            'duration_days': 'Duration (days)',
+            'finish_shift_days': 'Finish Shift (days)',
+            'critical_tasks': 'Critical Tasks'
+        })
+        st.dataframe(summary_df, use_container_width=True, hide_index=True)
+        
+        if comparison['tasks']:
+            with st.expander(f"Tasks with Different Finish Dates ({len(comparison['tasks'])})"):
+                tasks_df = pd.DataFrame(comparison['tasks']).drop(columns=['task_id']).rename(columns={'task_name': 'Task'})
+                st.dataframe(tasks_df, use_container_width=True, hide_index=True)
+    
+    # Promote the scenario to change requests, unless its own dependencies form a cycle
+    schedulable = True
+    if changes:
+        try:
+            scenario.schedule()
+        except DependencyCycleError as e:
+            st.error(f"{scenario.name} cannot be submitted: {e}")
+            schedulable = False
+    
+    if changes and schedulable:
+        with st.form("promote_scenario_form"):
+            change_reason = st.text_area("Reason for Change")
+            requires_meeting = st.checkbox("These changes require a team meeting")
+            if st.form_submit_button("Submit as Change Requests"):
+                try:
+                    request_ids = promote_scenario(scenario, st.session_state.get('user_id'), change_reason, requires_meeting)
+                except StaleScenarioError as e:
+                    st.error(f"{e}. Rebase the scenario before submitting it.")
+                except DependencyCycleError as e:
+                    st.error(f"{scenario.name} cannot be submitted: {e}")
+                except Exception:
+                    st.error("The change requests could not be submitted. Nothing was saved; please try again.")
+                else:
+                    del scenarios[scenario_name]
+                    st.success(f"Submitted {len(request_ids)} change request(s) for review.")
@@ -0,0 +1,190 @@
+"""
+Module for schedule baselines and variance against them.
+
+A baseline is a snapshot of a project's task plan: task IDs, planned start
+and finish dates, and progress. Each column is stored as a NumPy array sorted
+by task ID and saved compressed in a single blob, so a baseline of ten
+thousand tasks takes a few kilobytes and loads without per-row work.
+
+Variances line up baseline and current tasks by ID with a sorted intersection
+and subtract the date and progress columns as whole arrays. Decoded baselines
+never change, so they are cached by ID.
+"""
+
+import io
+import datetime
+import threading
+
+import numpy as np
+
+from utils.database import (
+    get_project_task_plan, create_schedule_baseline, get_schedule_baseline, get_project_baselines
+)
+
+# Decoded baselines kept in memory
+MAX_CACHED_BASELINES = 32
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def plan_arrays(plan):
+    """
+    Convert (id, start_date, end_date, progress) rows into columnar arrays sorted by task ID.
+
+    Returns:
+        Dictionary with 'task_id', 'start', 'finish' (datetime64[D], NaT when
+        missing) and 'progress' arrays
+    """
+    plan = sorted(plan, key=lambda row: row[0])
+    return {
+        'task_id': np.array([row[0] for row in plan], dtype=np.int64),
+        'start': np.array([row[1] or 'NaT' for row in plan], dtype='datetime64[D]'),
+        'finish': np.array([row[2] or 'NaT' for row in plan], dtype='datetime64[D]'),
+        'progress': np.array([row[3] or 0 for row in plan], dtype=np.int16)
+    }
+
+def encode_baseline(arrays):
+    """Compress baseline arrays into bytes"""
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+def decode_baseline(data):
+    """Decompress bytes from encode_baseline into arrays"""
+    with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+        return {name: archive[name] for name in archive.files}
+
+def capture_baseline(project_id, name, created_by=None, make_current=True):
+    """
+    Save the current task plan of a project as a baseline.
+
+    Args:
+        project_id: The ID of the project
+        name: Name of the baseline, e.g. 'Approved plan'
+        created_by: Optional ID of the user saving it
+        make_current: Whether variances should be measured against this baseline from now on
+
+    Returns:
+        The created baseline without its data
+    """
+    arrays = plan_arrays(get_project_task_plan(project_id))
+    return create_schedule_baseline({
+        'project_id': project_id,
+        'name': name,
+        'is_current': make_current,
+        'task_count': len(arrays['task_id']),
+        'data': encode_baseline(arrays),
+        'created_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'created_by': created_by
+    })
+
+def load_baseline(baseline_id):
+    """Get the decoded arrays of a baseline, or None if it does not exist"""
+    with _cache_lock:
+        if baseline_id in _cache:
+            return _cache[baseline_id]
+
+    baseline = get_schedule_baseline(baseline_id)
+    if not baseline:
+        return None
+    arrays = decode_baseline(baseline['data'])
+    with _cache_lock:
+        if len(_cache) >= MAX_CACHED_BASELINES:
+            _cache.pop(next(iter(_cache)))
+        _cache[baseline_id] = arrays
+    return arrays
+
+def _day_difference(current, baseline):
+    """Differences in days, with 0 where either date is missing"""
+    missing = np.isnat(current) | np.isnat(baseline)
+    difference = (current - baseline).astype(np.int64)
+    difference[missing] = 0
+    return difference
+
+def compute_variance(baseline, current):
+    """
+    Compare a current plan against a baseline.
+
+    Args:
+        baseline: Arrays from load_baseline or plan_arrays
+        current: Arrays from plan_arrays
+
+    Returns:
+        Dictionary with, for tasks in both plans, their 'task_id', baseline and
+        current 'start'/'finish' dates, 'start_variance', 'finish_variance' and
+        'duration_variance' in days (positive is later or longer) and
+        'progress_variance'; the 'added_task_ids' and 'removed_task_ids'; and
+        a 'summary' of the comparison
+    """
+    task_ids, base_index, current_index = np.intersect1d(
+        baseline['task_id'], current['task_id'], assume_unique=True, return_indices=True
+    )
+
+    base_start, base_finish = baseline['start'][base_index], baseline['finish'][base_index]
+    current_start, current_finish = current['start'][current_index], current['finish'][current_index]
+
+    start_variance = _day_difference(current_start, base_start)
+    finish_variance = _day_difference(current_finish, base_finish)
+    duration_variance = finish_variance - start_variance
+    progress_variance = current['progress'][current_index].astype(np.int64) - baseline['progress'][base_index]
+
+    def latest(dates):
+        dates = dates[~np.isnat(dates)]
+        return dates.max() if dates.size else None
+
+    base_end, current_end = latest(baseline['finish']), latest(current['finish'])
+    summary = {
+        'tasks_compared': int(task_ids.size),
+        'tasks_late': int((finish_variance > 0).sum()),
+        'tasks_early': int((finish_variance < 0).sum()),
+        'average_finish_variance': float(finish_variance.mean()) if task_ids.size else 0.0,
+        'max_finish_variance': int(finish_variance.max()) if task_ids.size else 0,
+        'baseline_finish': str(base_end) if base_end is not None else None,
+        'current_finish': str(current_end) if current_end is not None else None,
+        'project_finish_variance': int((current_end - base_end).astype(np.int64))
+        if base_end is not None and current_end is not None else 0
+    }
+
+    return {
+        'task_id': task_ids,
+        'baseline_start': base_start,
+        'baseline_finish': base_finish,
+        'current_start': current_start,
+        'current_finish': current_finish,
+        'start_variance': start_variance,
+        'finish_variance': finish_variance,
+        'duration_variance': duration_variance,
+        'progress_variance': progress_variance,
+        'added_task_ids': np.setdiff1d(current['task_id'], baseline['task_id'], assume_unique=True),
+        'removed_task_ids': np.setdiff1d(baseline['task_id'], current['task_id'], assume_unique=True),
+        'summary': summary
+    }
+
+def get_current_baseline(project_id):
+    """Get the current baseline of a project without its data, or None"""
+    for baseline in get_project_baselines(project_id):
+        if baseline['is_current']:
+            return baseline
+    return None
+
+def get_baseline_variance(project_id, baseline_id=None):
+    """
+    Compare a project's current plan against a baseline.
+
+    Args:
+        project_id: The ID of the project
+        baseline_id: Optional baseline to compare against (default: the current baseline)
+
+    Returns:
+        The result of compute_variance, or None if there is no baseline
+    """
+    if baseline_id is None:
+        current_baseline = get_current_baseline(project_id)
+        if not current_baseline:
+            return None
+        baseline_id = current_baseline['id']
+
+    baseline = load_baseline(baseline_id)
+    if baseline is None:
+        return None
+    return compute_variance(baseline, plan_arrays(get_project_task_plan(project_id)))
@@ -0,0 +1,219 @@
+"""
+Module for computing the impact of change requests.
+
+When a change request is submitted, a background worker applies its proposed
+changes to a what-if scenario of the project (see utils.scenarios), reruns the
+CPM schedule and compares it with the current plan: which tasks move, by how
+much, what becomes critical and how the project finish shifts. The workload of
+the project team is then updated with the moved assignments to show which
+members become over-allocated.
+
+The result is stored on the change request together with the project schedule
+version it was computed at, so reviewers read it without recomputing. It is
+recomputed only when the schedule has changed since.
+"""
+
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.database import get_task, get_subtask, get_project_schedule_version
+from utils.scheduling import DependencyCycleError
+from utils.scenarios import SCENARIO_FIELDS, Scenario, get_project_snapshot
+from utils.workload import WorkloadMatrix, get_workload
+from utils.change_request import get_change_request, save_change_request_impact
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="change-impact")
+_pending = set()
+_pending_lock = threading.Lock()
+
+def get_request_project_id(request):
+    """The ID of the project a change request belongs to, or None"""
+    if request.get('task_id'):
+        task = get_task(request['task_id'])
+        return task['project_id'] if task else None
+    subtask = get_subtask(request['subtask_id']) if request.get('subtask_id') else None
+    parent_task = get_task(subtask['parent_task_id']) if subtask else None
+    return parent_task['project_id'] if parent_task else None
+
+def _day_shifts(before, after):
+    """Differences in days between two lists of date strings"""
+    return (np.array(after, dtype='datetime64[D]') - np.array(before, dtype='datetime64[D]')).astype(np.int64)
+
+def _schedule_impact(snapshot, scenario):
+    """Moved tasks and project finish shift between a snapshot and a scenario"""
+    before, after = snapshot.schedule(), scenario.schedule()
+    task_ids = [task_id for task_id in snapshot.tasks if task_id in before['tasks'] and task_id in after['tasks']]
+
+    start_shift = _day_shifts([before['tasks'][t]['early_start'] for t in task_ids],
+                              [after['tasks'][t]['early_start'] for t in task_ids])
+    finish_shift = _day_shifts([before['tasks'][t]['early_finish'] for t in task_ids],
+                               [after['tasks'][t]['early_finish'] for t in task_ids])
+
+    moved = []
+    for i in np.flatnonzero((start_shift != 0) | (finish_shift != 0)):
+        task_id = task_ids[i]
+        moved.append({
+            'task_id': task_id,
+            'task_name': snapshot.tasks[task_id].get('name'),
+            'early_start': after['tasks'][task_id]['early_start'],
+            'early_finish': after['tasks'][task_id]['early_finish'],
+            'start_shift_days': int(start_shift[i]),
+            'finish_shift_days': int(finish_shift[i]),
+            'total_float': after['tasks'][task_id]['total_float']
+        })
+
+    finish_before, finish_after = before['project_finish'], after['project_finish']
+    newly_critical = set(after['critical_path']) - set(before['critical_path'])
+    return {
+        'project_finish_before': finish_before,
+        'project_finish_after': finish_after,
+        'finish_shift_days': int(_day_shifts([finish_before], [finish_after])[0]) if finish_before and finish_after else 0,
+        'moved_tasks': moved,
+        'newly_critical': [task_id for task_id in after['critical_path'] if task_id in newly_critical]
+    }, [
+        (after['tasks'][entry['task_id']], snapshot.tasks[entry['task_id']])
+        for entry in moved
+    ]
+
+def _resource_impact(project_id, old_entries, new_entries):
+    """Members whose over-allocation changes when old assignment entries are replaced by new ones"""
+    dates = [date for start_date, end_date, _ in old_entries + new_entries for date in (start_date, end_date)]
+    if not dates:
+        return []
+
+    matrix, members = get_workload(project_id, min(dates), max(dates))
+    changed = WorkloadMatrix(matrix.member_ids, matrix.start, matrix.load.copy())
+    changed.apply(old_entries, -1)
+    changed.apply(new_entries, 1)
+
+    before = {row['member_id']: row for row in matrix.overallocation()}
+    after = {row['member_id']: row for row in changed.overallocation()}
+    names = {member['id']: member['name'] for member in members}
+
+    impact = []
+    for member_id in matrix.member_ids:
+        old, new = before.get(member_id), after.get(member_id)
+        if old == new:
+            continue
+        impact.append({
+            'member_id': member_id,
+            'member_name': names.get(member_id),
+            'days_over_before': old['days_over'] if old else 0,
+            'days_over_after': new['days_over'] if new else 0,
+            'peak_load_before': old['peak_load'] if old else 0.0,
+            'peak_load_after': new['peak_load'] if new else 0.0
+        })
+    return impact
+
+def compute_change_impact(request, project_id):
+    """
+    Compute the schedule and resource impact of a change request.
+
+    Args:
+        request: The change request dictionary
+        project_id: The ID of the project it belongs to
+
+    Returns:
+        Dictionary with the 'schedule' impact (project finish before and
+        after, its shift, the moved tasks and the newly critical task IDs, or
+        an 'error'), the 'resources' impact per affected member and the time
+        it was 'computed_at'
+    """
+    proposed = request.get('proposed_changes') or {}
+    snapshot = get_project_snapshot(project_id)
+    old_entries, new_entries = [], []
+
+    scenario = Scenario(snapshot, f"Change request #{request['id']}")
+    task_changes = {field: value for field, value in proposed.items() if field in SCENARIO_FIELDS}
+    if request.get('task_id') in snapshot.tasks and task_changes:
+        scenario.update_task(request['task_id'], task_changes)
+
+    try:
+        schedule, moved = _schedule_impact(snapshot, scenario)
+    except DependencyCycleError as e:
+        schedule, moved = {'error': str(e)}, []
+
+    # Moved tasks keep their team but take their new earliest dates; the
+    # workload holds them at their stored dates, which may differ from the
+    # current plan's earliest dates
+    for after, task in moved:
+        members = task.get('assigned_members') or []
+        if members and task.get('start_date') and task.get('end_date'):
+            old_entries.append((task['start_date'], task['end_date'], members))
+            new_entries.append((after['early_start'], after['early_finish'], members))
+
+    if request.get('subtask_id') and ('start_date' in proposed or 'end_date' in proposed):
+        subtask = get_subtask(request['subtask_id'])
+        members = (subtask or {}).get('assigned_members') or []
+        if members and subtask.get('start_date') and subtask.get('end_date'):
+            old_entries.append((subtask['start_date'], subtask['end_date'], members))
+            new_entries.append((proposed.get('start_date', subtask['start_date']),
+                                proposed.get('end_date', subtask['end_date']), members))
+
+    return {
+        'project_id': project_id,
+        'schedule': schedule,
+        'resources': _resource_impact(project_id, old_entries, new_entries),
+        'computed_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def analyze_change_request(request_id):
+    """
+    Compute and store the impact of a change request.
+
+    Returns:
+        The stored impact, or None if the request or its project no longer exists
+    """
+    request = get_change_request(request_id)
+    project_id = get_request_project_id(request) if request else None
+    if project_id is None:
+        return None
+
+    # Read the version first, so a schedule change during the computation marks the result stale
+    version = get_project_schedule_version(project_id)
+    impact = compute_change_impact(request, project_id)
+    save_change_request_impact(request_id, impact, version)
+    return impact
+
+def _run_analysis(request_id):
+    try:
+        analyze_change_request(request_id)
+    except Exception as e:
+        print(f"Error analyzing change request {request_id}: {e}")
+    finally:
+        with _pending_lock:
+            _pending.discard(request_id)
+
+def submit_impact_analysis(request_id):
+    """Queue the impact analysis of a change request on the background worker unless it is already queued"""
+    with _pending_lock:
+        if request_id in _pending:
+            return
+        _pending.add(request_id)
+    _executor.submit(_run_analysis, request_id)
+
+def get_change_request_impact(request, project_id=None):
+    """
+    Get the stored impact of a change request, queueing a recomputation if it is missing or stale.
+
+    Args:
+        request: The change request dictionary
+        project_id: Optional ID of the project it belongs to
+
+    Returns:
+        Tuple of (impact or None, whether it matches the current project schedule)
+    """
+    impact = request.get('impact_data')
+    if project_id is None:
+        project_id = impact['project_id'] if impact else get_request_project_id(request)
+    if project_id is None:
+        return impact, False
+
+    current = impact is not None and request.get('impact_schedule_version') == get_project_schedule_version(project_id)
+    # Reviewed requests keep the impact they were decided on
+    if not current and request.get('status') == 'Pending':
+        submit_impact_analysis(request['id'])
+    return impact, current
@@ -4,12 +4,75 @@ Module for handling change requests for tasks and subtasks
 
 import datetime
 import json
-from sqlalchemy import or_
+import hashlib
+from sqlalchemy import or_, func, select
+from sqlalchemy.orm import aliased, defer
 from utils.database import (
     get_db_session, ChangeRequest, 
     get_task, get_subtask, get_team_member, get_user_by_id,
-    update_task, update_subtask, model_to_dict
+    update_task, update_subtask, model_to_dict, add_notifications, report_versions,
+    User, Project, ChangeRequestParticipant, change_request_participants
 )
+from utils.notifications import build_notifications, wake_dispatcher
+from utils.dependency_graph import DependencyGraph
+from utils.earned_value import reset_project_actuals
+
+def _add_change_request(db, item_type, item_id, user_id, proposed_changes, requires_meeting=False, change_reason=None, impact_analysis=None):
+    """
+    Add a change request and its participants and notifications, as part of the caller's transaction.
+    
+    Returns:
+        The flushed ChangeRequest, or None if the task or subtask does not exist
+    """
+    if item_type == 'task':
+        item = db.query(Task).filter_by(id=item_id).first()
+    elif item_type == 'subtask':
+        item = db.query(Subtask).filter_by(id=item_id).first()
+    else:
+        return None
+    if not item:
+        return None
+    
+    # Only the values being changed are kept
+    item_data = model_to_dict(item)
+    current_data = {key: item_data.get(key) for key in proposed_changes}
+    
+    # Get affected team members
+    affected_members = item.assigned_members or []
+    
+    # Mark the item as having pending changes
+    item.has_pending_changes = True
+    
+    # Create change request record
+    change_request = ChangeRequest(
+        task_id=item_id if item_type == 'task' else None,
+        subtask_id=item_id if item_type == 'subtask' else None,
+        requested_by=user_id,
+        requested_at=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        status="Pending",
+        current_data=current_data,
+        proposed_changes=proposed_changes,
+        change_reason=change_reason,
+        impact_analysis=impact_analysis,
+        requires_meeting=requires_meeting,
+        affected_members=affected_members
+    )
+    
+    db.add(change_request)
+    db.flush()
+    db.add_all(change_request_participants(change_request.id, user_id, affected_members))
+    
+    # Notify affected team members
+    if affected_members:
+        notify_affected_members(db, affected_members, change_request.id, item.name)
+    
+    return change_request
+
+def _submit_impact_analyses(request_ids):
+    """Compute the impact of new requests for reviewers without holding up the requester"""
+    from utils.change_impact import submit_impact_analysis
+    for request_id in request_ids:
+        submit_impact_analysis(request_id)
 
 def create_change_request(item_type, item_id, user_id, proposed_changes, requires_meeting=False, change_reason=None, impact_analysis=None):
     """
@@ -30,68 +93,15 @@ def create_change_request(item_type, item_id, user_id, proposed_changes, require
     db = get_db_session()
     
     try:
-        # Get current task or subtask data
-        current_data = {}
-        affected_members = []
-        
-        if item_type == 'task':
-            task = get_task(item_id)
-            if not task:
-                return None
-            
-            current_data = dict(task)
-            
-            # Get affected team members
-            if 'assigned_members' in task and task['assigned_members']:
-                affected_members = task['assigned_members']
-            
-            # Update task to show it has pending changes
-            task_obj = db.query(Task).filter_by(id=item_id).first()
-            if task_obj:
-                task_obj.has_pending_changes = True
-                db.commit()
-        
-        elif item_type == 'subtask':
-            subtask = get_subtask(item_id)
-            if not subtask:
-                return None
-            
-            current_data = dict(subtask)
-            
-            # Get affected team members
-            if 'assigned_members' in subtask and subtask['assigned_members']:
-                affected_members = subtask['assigned_members']
-            
-            # Update subtask to show it has pending changes
-            subtask_obj = db.query(Subtask).filter_by(id=item_id).first()
-            if subtask_obj:
-                subtask_obj.has_pending_changes = True
-                db.commit()
-        
-        else:
-            return None
-        
-        # Create change request record
-        change_request = ChangeRequest(
-            task_id=item_id if item_type == 'task' else None,
-            subtask_id=item_id if item_type == 'subtask' else None,
-            requested_by=user_id,
-            requested_at=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            status="Pending",
-            current_data=current_data,
-            proposed_changes=proposed_changes,
-            change_reason=change_reason,
-            impact_analysis=impact_analysis,
-            requires_meeting=requires_meeting,
-            affected_members=affected_members
+        change_request = _add_change_request(
+            db, item_type, item_id, user_id, proposed_changes, requires_meeting, change_reason, impact_analysis
         )
+        if change_request is None:
+            return None
         
-        db.add(change_request)
         db.commit()
-        
-        # Notify affected team members
-        if affected_members:
-            notify_affected_members(affected_members, change_request.id)
+        wake_dispatcher()
+        _submit_impact_analyses([change_request.id])
         
         return change_request.id
     
@@ -102,6 +112,47 @@ def create_change_request(item_type, item_id, user_id, proposed_changes, require
     finally:
         db.close()
 
+def create_task_change_requests(task_changes, user_id, requires_meeting=False, change_reason=None, impact_analysis=None):
+    """
+    Create change requests for several tasks in one transaction, so either all of them are created or none.
+    
+    Args:
+        task_changes: Dictionary of proposed changes by task ID
+        user_id: The ID of the user creating the requests
+        requires_meeting: Whether the changes require a team meeting
+        change_reason: Reason given for every request
+        impact_analysis: Analysis of impact and risks for every request
+    
+    Returns:
+        List of the IDs of the created change requests, in the order of task_changes
+    
+    Raises:
+        ValueError: If one of the tasks does not exist
+    """
+    db = get_db_session()
+    
+    try:
+        request_ids = []
+        for task_id, proposed_changes in task_changes.items():
+            change_request = _add_change_request(
+                db, 'task', task_id, user_id, proposed_changes, requires_meeting, change_reason, impact_analysis
+            )
+            if change_request is None:
+                raise ValueError(f"Task {task_id} not found")
+            request_ids.append(change_request.id)
+        
+        db.commit()
+    except Exception as e:
+        print(f"Error creating change requests: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    
+    wake_dispatcher()
+    _submit_impact_analyses(request_ids)
+    return request_ids
+
 def get_change_requests(item_type=None, item_id=None, status=None):
     """
     Get change requests with optional filters.
@@ -147,6 +198,30 @@ def get_change_requests(item_type=None, item_id=None, status=None):
     finally:
         db.close()
 
+def get_change_request_views(request):
+    """
+    Reconstruct the full task or subtask of a change request before and after its changes.
+    
+    The request stores only the previous values of the fields it changes;
+    the other fields come from the item as it is now.
+    
+    Args:
+        request: The change request dictionary
+    
+    Returns:
+        Tuple of (before, after) dictionaries
+    """
+    if request.get('task_id'):
+        item = get_task(request['task_id'])
+    else:
+        item = get_subtask(request['subtask_id'])
+    
+    before = dict(item or {})
+    before.update(request.get('current_data') or {})
+    after = dict(before)
+    after.update(request.get('proposed_changes') or {})
+    return before, after
+
 def get_change_request(request_id):
     """Get a specific change request by ID"""
     db = get_db_session()
@@ -163,14 +238,14 @@ def get_change_request(request_id):
     finally:
         db.close()
 
-def approve_change_request(request_id, user_id, comments=None):
+def save_change_request_impact(request_id, impact_data, schedule_version):
     """
-    Approve a change request and apply the changes.
+    Store the computed impact of a change request.
     
     Args:
         request_id: The ID of the change request
-        user_id: The ID of the approving user
-        comments: Optional approval comments
+        impact_data: The impact as returned by utils.change_impact.compute_change_impact
+        schedule_version: The project schedule version the impact was computed at
     
     Returns:
         Boolean indicating success or failure
@@ -178,129 +253,279 @@ def approve_change_request(request_id, user_id, comments=None):
     db = get_db_session()
     
     try:
-        request = db.query(ChangeRequest).filter_by(id=request_id).first()
-        if not request or request.status != "Pending":
-            return False
-        
-        # Update change request status
-        request.status = "Approved"
-        request.reviewed_by = user_id
-        request.review_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        request.review_comments = comments
-        
-        # Apply changes
-        if request.task_id:
-            task = get_task(request.task_id)
-            if not task:
-                return False
-            
-            # Apply changes to task
-            update_task(request.task_id, request.proposed_changes)
-            
-            # Clear the has_pending_changes flag
-            task_obj = db.query(Task).filter_by(id=request.task_id).first()
-            if task_obj:
-                task_obj.has_pending_changes = False
-        
-        elif request.subtask_id:
-            subtask = get_subtask(request.subtask_id)
-            if not subtask:
-                return False
-            
-            # Apply changes to subtask
-            update_subtask(request.subtask_id, request.proposed_changes)
-            
-            # Clear the has_pending_changes flag
-            subtask_obj = db.query(Subtask).filter_by(id=request.subtask_id).first()
-            if subtask_obj:
-                subtask_obj.has_pending_changes = False
-        
+        updated = db.query(ChangeRequest).filter_by(id=request_id).update({
+            ChangeRequest.impact_data: impact_data,
+            ChangeRequest.impact_schedule_version: schedule_version
+        })
         db.commit()
-        
-        # Notify about the approval
-        notify_request_status_change(request_id, "approved")
-        
-        return True
+        return bool(updated)
     
     except Exception as e:
-        print(f"Error approving change request: {e}")
+        print(f"Error saving change request impact: {e}")
         db.rollback()
         return False
     finally:
         db.close()
 
-def reject_change_request(request_id, user_id, comments=None):
+def review_change_requests(request_ids, user_id, decision, comments=None):
     """
-    Reject a change request.
+    Approve or reject several change requests in one transaction.
+    
+    Approved changes are applied to their tasks and subtasks in the order the
+    requests were made. Requests that are no longer pending, or whose task or
+    subtask no longer exists, are skipped. So are approved requests whose
+    dependencies would form a cycle with the project's other tasks, including
+    the dependencies of the requests approved before them in the batch; they
+    stay pending.
     
     Args:
-        request_id: The ID of the change request
-        user_id: The ID of the rejecting user
-        comments: Optional rejection comments
+        request_ids: IDs of the change requests
+        user_id: The ID of the reviewing user
+        decision: Either 'Approved' or 'Rejected'
+        comments: Optional review comments for all of the requests
     
     Returns:
-        Boolean indicating success or failure
+        Dictionary with the IDs of the 'reviewed' and 'skipped' requests, and
+        the dependency cycle of each request skipped for one in 'cycles'
+    
+    Raises:
+        ValueError: If the decision is not 'Approved' or 'Rejected'
     """
+    if decision not in ("Approved", "Rejected"):
+        raise ValueError(f"Unknown review decision: {decision}")
+    
+    request_ids = list(dict.fromkeys(request_ids))
+    if not request_ids:
+        return {"reviewed": [], "skipped": [], "cycles": {}}
+    
     db = get_db_session()
     
     try:
-        request = db.query(ChangeRequest).filter_by(id=request_id).first()
-        if not request or request.status != "Pending":
-            return False
+        requests = db.query(ChangeRequest).filter(
+            ChangeRequest.id.in_(request_ids),
+            ChangeRequest.status == "Pending"
+        ).order_by(ChangeRequest.requested_at, ChangeRequest.id).all()
+        
+        # Load all affected tasks and subtasks at once
+        task_ids = {request.task_id for request in requests if request.task_id}
+        subtask_ids = {request.subtask_id for request in requests if request.subtask_id}
+        tasks = {task.id: task for task in db.query(Task).filter(Task.id.in_(task_ids))} if task_ids else {}
+        subtasks = {subtask.id: subtask for subtask in db.query(Subtask).filter(Subtask.id.in_(subtask_ids))} if subtask_ids else {}
+        
+        reviewed = [
+            request for request in requests
+            if (request.task_id in tasks if request.task_id else request.subtask_id in subtasks)
+        ]
+        cycles = {}
+        if decision == "Approved":
+            cycles = find_batch_dependency_cycles(db, reviewed, tasks)
+            reviewed = [request for request in reviewed if request.id not in cycles]
+        if not reviewed:
+            return {"reviewed": [], "skipped": request_ids, "cycles": cycles}
+        
+        if decision == "Approved":
+            for request in reviewed:
+                if request.task_id:
+                    apply_task_changes(db, tasks[request.task_id], request.proposed_changes or {})
+                else:
+                    apply_subtask_changes(db, subtasks[request.subtask_id], request.proposed_changes or {})
+                # Rollups reload rows, so later changes must see this one
+                db.flush()
         
-        # Update change request status
-        request.status = "Rejected"
-        request.reviewed_by = user_id
-        request.review_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        request.review_comments = comments
+        reviewed_ids = [request.id for request in reviewed]
+        db.query(ChangeRequest).filter(ChangeRequest.id.in_(reviewed_ids)).update({
+            ChangeRequest.status: decision,
+            ChangeRequest.reviewed_by: user_id,
+            ChangeRequest.review_date: datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            ChangeRequest.review_comments: comments
+        }, synchronize_session=False)
         
-        # Clear the has_pending_changes flag
-        if request.task_id:
-            task_obj = db.query(Task).filter_by(id=request.task_id).first()
-            if task_obj:
-                task_obj.has_pending_changes = False
+        # Clear the has_pending_changes flags
+        reviewed_task_ids = [request.task_id for request in reviewed if request.task_id]
+        reviewed_subtask_ids = [request.subtask_id for request in reviewed if request.subtask_id]
+        if reviewed_task_ids:
+            db.query(Task).filter(Task.id.in_(reviewed_task_ids)).update(
+                {Task.has_pending_changes: False}, synchronize_session=False
+            )
+        if reviewed_subtask_ids:
+            db.query(Subtask).filter(Subtask.id.in_(reviewed_subtask_ids)).update(
+                {Subtask.has_pending_changes: False}, synchronize_session=False
+            )
         
-        elif request.subtask_id:
-            subtask_obj = db.query(Subtask).filter_by(id=request.subtask_id).first()
-            if subtask_obj:
-                subtask_obj.has_pending_changes = False
+        # Notify everyone involved once about all of the decisions
+        recipients = [(request.id, request.requested_by, request.affected_members or []) for request in reviewed]
+        notify_requests_status_change(db, recipients, decision.lower())
         
         db.commit()
+        wake_dispatcher()
         
-        # Notify about the rejection
-        notify_request_status_change(request_id, "rejected")
+        # Approved changes bypass the in-place cache updates of data_management
+        versions = {}
+        report_versions(db, versions)
+        for kind, project_id in versions:
+            if kind == 'progress':
+                reset_project_actuals(project_id)
         
-        return True
+        return {
+            "reviewed": reviewed_ids,
+            "skipped": [request_id for request_id in request_ids if request_id not in set(reviewed_ids)],
+            "cycles": cycles
+        }
     
     except Exception as e:
-        print(f"Error rejecting change request: {e}")
+        print(f"Error reviewing change requests: {e}")
         db.rollback()
-        return False
+        raise
     finally:
         db.close()
 
+def find_batch_dependency_cycles(db, requests, tasks):
+    """
+    Find the task change requests whose dependencies would form a cycle when
+    the requests are applied in order, as part of the caller's transaction.
+    
+    Each request is checked against the project's dependencies as left by the
+    acyclic requests before it.
+    
+    Args:
+        db: The reviewing session
+        requests: The ChangeRequest rows, in the order they will be applied
+        tasks: Dictionary of the requests' Task rows by ID
+    
+    Returns:
+        Dictionary of the cycle each cyclic request would form, by request ID
+    """
+    changing = [
+        request for request in requests
+        if request.task_id and 'dependencies' in (request.proposed_changes or {})
+    ]
+    if not changing:
+        return {}
+    
+    project_ids = {tasks[request.task_id].project_id for request in changing}
+    rows = db.query(Task.id, Task.project_id, Task.dependencies).filter(Task.project_id.in_(project_ids)).all()
+    graphs = {
+        project_id: DependencyGraph.from_tasks([
+            {'id': row.id, 'dependencies': row.dependencies} for row in rows if row.project_id == project_id
+        ])
+        for project_id in project_ids
+    }
+    
+    cycles = {}
+    for request in changing:
+        graph = graphs[tasks[request.task_id].project_id]
+        cycle = graph.set_dependencies(request.task_id, request.proposed_changes['dependencies'] or [])
+        if cycle:
+            cycles[request.id] = cycle
+    return cycles
+
+def approve_change_requests(request_ids, user_id, comments=None):
+    """Approve several change requests and apply their changes, see review_change_requests"""
+    return review_change_requests(request_ids, user_id, "Approved", comments)
+
+def reject_change_requests(request_ids, user_id, comments=None):
+    """Reject several change requests, see review_change_requests"""
+    return review_change_requests(request_ids, user_id, "Rejected", comments)
+
+def approve_change_request(request_id, user_id, comments=None):
+    """
+    Approve a change request and apply the changes.
+    
+    Args:
+        request_id: The ID of the change request
+        user_id: The ID of the approving user
+        comments: Optional approval comments
+    
+    Returns:
+        Boolean indicating success or failure
+    """
+    try:
+        return bool(approve_change_requests([request_id], user_id, comments)["reviewed"])
+    except Exception:
+        return False
+
+def reject_change_request(request_id, user_id, comments=None):
+    """
+    Reject a change request.
+    
+    Args:
+        request_id: The ID of the change request
+        user_id: The ID of the rejecting user
+        comments: Optional rejection comments
+    
+    Returns:
+        Boolean indicating success or failure
+    """
+    try:
+        return bool(reject_change_requests([request_id], user_id, comments)["reviewed"])
+    except Exception:
+        return False
+
 def get_user_change_requests(user_id):
-    """Get all change requests created by or affecting a user"""
+    """
+    Get all change requests created by or affecting a user, newest first.
+    
+    Requests are found through the change_request_participants index and
+    returned with the names of their item, project, requester and reviewer
+    from the same query.
+    
+    Args:
+        user_id: The ID of the user
+    
+    Returns:
+        List of change request dictionaries with item_type, item_name,
+        project_id, project_name, requester_name and reviewer_name added
+    """
     db = get_db_session()
     
     try:
-        # Get team member ID for this user
-        user = get_user_by_id(user_id)
-        team_member_id = user.get('team_member_id') if user else None
-        
-        # Get change requests created by this user
-        created_by_user = db.query(ChangeRequest).filter(ChangeRequest.requested_by == user_id).all()
+        team_member_id = select(User.team_member_id).where(User.id == user_id).scalar_subquery()
+        participating = select(ChangeRequestParticipant.change_request_id).where(or_(
+            ChangeRequestParticipant.user_id == user_id,
+            ChangeRequestParticipant.team_member_id == team_member_id
+        ))
         
-        # Get change requests affecting this user
-        affecting_user = []
-        if team_member_id:
-            affecting_user = db.query(ChangeRequest).filter(
-                ChangeRequest.affected_members.contains([team_member_id])
-            ).all()
+        parent_task = aliased(Task)
+        requester = aliased(User)
+        reviewer = aliased(User)
+        rows = db.query(
+            ChangeRequest,
+            func.coalesce(Task.name, Subtask.name).label('item_name'),
+            Project.id.label('project_id'),
+            Project.name.label('project_name'),
+            requester.name.label('requester_name'),
+            reviewer.name.label('reviewer_name')
+        ).options(
+            defer(ChangeRequest.impact_data)
+        ).outerjoin(
+            Task, Task.id == ChangeRequest.task_id
+        ).outerjoin(
+            Subtask, Subtask.id == ChangeRequest.subtask_id
+        ).outerjoin(
+            parent_task, parent_task.id == Subtask.parent_task_id
+        ).outerjoin(
+            Project, Project.id == func.coalesce(Task.project_id, parent_task.project_id)
+        ).outerjoin(
+            requester, requester.id == ChangeRequest.requested_by
+        ).outerjoin(
+            reviewer, reviewer.id == ChangeRequest.reviewed_by
+        ).filter(
+            ChangeRequest.id.in_(participating)
+        ).order_by(ChangeRequest.requested_at.desc(), ChangeRequest.id.desc()).all()
         
-        # Combine and remove duplicates
-        all_requests = set(created_by_user + affecting_user)
-        return [model_to_dict(request) for request in all_requests]
+        results = []
+        for request, item_name, project_id, project_name, requester_name, reviewer_name in rows:
+            result = model_to_dict(request, exclude=('impact_data',))
+            result.update({
+                'item_type': 'Task' if request.task_id else 'Subtask',
+                'item_name': item_name,
+                'project_id': project_id,
+                'project_name': project_name,
+                'requester_name': requester_name,
+                'reviewer_name': reviewer_name
+            })
+            results.append(result)
+        return results
     
     except Exception as e:
         print(f"Error getting user change requests: {e}")
@@ -308,22 +533,26 @@ def get_user_change_requests(user_id):
     finally:
         db.close()
 
-def notify_affected_members(member_ids, request_id):
+def notify_affected_members(db, member_ids, request_id, item_name=None):
     """
-    Notify team members affected by a change request.
-    This is a placeholder for future implementation with actual notifications.
+    Queue notifications to team members affected by a change request, as part of the caller's transaction.
     
     Args:
+        db: The session creating the change request
         member_ids: List of team member IDs to notify
         request_id: The ID of the change request
+        item_name: Optional name of the task or subtask being changed
     """
-    # Placeholder for future notification system
-    # For now, just print to console
-    print(f"Notifying team members {member_ids} about change request {request_id}")
-    
-    # In a future implementation, this could send emails, SMS, or in-app notifications
-    # Depending on the notification preferences of each team member
-    pass
+    subject = f"Change requested for {item_name}" if item_name else f"Change request #{request_id}"
+    add_notifications(db, build_notifications(
+        'change_request_created',
+        f"change_request:{request_id}:created",
+        subject,
+        f"A change has been requested for {item_name or 'an item'} you are assigned to "
+        f"(change request #{request_id}). It is awaiting review.",
+        member_ids=member_ids,
+        payload={'change_request_ids': [request_id]}
+    ))
 
 def notify_request_status_change(request_id, status):
     """
@@ -333,25 +562,66 @@ def notify_request_status_change(request_id, status):
         request_id: The ID of the change request
         status: The new status (approved, rejected)
     """
-    # Placeholder for future notification system
     request = get_change_request(request_id)
     if not request:
         return
     
-    # Get the user who requested the change
-    requester_id = request.get('requested_by')
-    if not requester_id:
+    db = get_db_session()
+    try:
+        notify_requests_status_change(
+            db, [(request_id, request.get('requested_by'), request.get('affected_members') or [])], status
+        )
+        db.commit()
+    except Exception as e:
+        print(f"Error queueing change request notifications: {e}")
+        db.rollback()
         return
+    finally:
+        db.close()
+    wake_dispatcher()
+
+def notify_requests_status_change(db, requests, status):
+    """
+    Queue notifications about status updates of several change requests, as
+    part of the caller's transaction, with one notification per recipient
+    covering all of their requests.
     
-    # Get affected team members
-    affected_members = request.get('affected_members', [])
+    Args:
+        db: The session updating the change requests
+        requests: List of (request ID, requester user ID, affected team member IDs) tuples
+        status: The new status (approved, rejected)
+    """
+    requesters = {}
+    members = {}
+    for request_id, requester_id, affected_members in requests:
+        if requester_id:
+            requesters.setdefault(requester_id, []).append(request_id)
+        for member_id in affected_members:
+            members.setdefault(member_id, []).append(request_id)
     
-    # Print to console for now
-    print(f"Change request {request_id} has been {status}")
-    print(f"Notifying requester {requester_id} and affected members {affected_members}")
+    # Recipients of the same set of requests share one message
+    groups = {}
+    for requester_id, request_ids in requesters.items():
+        groups.setdefault(tuple(sorted(request_ids)), ([], []))[0].append(requester_id)
+    for member_id, request_ids in members.items():
+        groups.setdefault(tuple(sorted(request_ids)), ([], []))[1].append(member_id)
     
-    # In a future implementation, this could send emails, SMS, or in-app notifications
-    pass
+    notifications = []
+    for request_ids, (user_ids, member_ids) in groups.items():
+        ids = ",".join(str(request_id) for request_id in request_ids)
+        if len(ids) > 60:
+            ids = hashlib.sha1(ids.encode()).hexdigest()[:16]
+        numbers = ", ".join(f"#{request_id}" for request_id in request_ids)
+        notifications.extend(build_notifications(
+            f"change_request_{status}",
+            f"change_requests:{ids}:{status}",
+            f"{len(request_ids)} change request(s) {status}",
+            f"Change request(s) {numbers} have been {status}.",
+            user_ids=user_ids,
+            member_ids=member_ids,
+            payload={'change_request_ids': list(request_ids)}
+        ))
+    add_notifications(db, notifications)
 
 # Import these at the end to avoid circular imports
-from utils.database import Task, Subtask
\ No newline at end of file
+from utils.database import Task, Subtask, apply_task_changes, apply_subtask_changes
\ No newline at end of file
@@ -14,6 +14,7 @@ from utils.database import (
     
     # Task functions
     get_all_tasks, get_task, get_project_tasks, create_task, update_task, delete_task,
+    get_project_completion,
     
     # Team member functions
     get_all_team_members, get_team_member, get_project_team, create_team_member, 
@@ -21,6 +22,7 @@ from utils.database import (
     
     # Document functions
     get_all_documents, get_project_documents, create_document, update_document, delete_document,
+    search_project_documents, get_document_text_preview,
     
     # Subtask functions
     get_all_subtasks, get_subtask, get_subtasks_by_parent, create_subtask,
@@ -28,7 +30,35 @@ from utils.database import (
     
     # Meeting functions
     get_all_meetings, get_meeting, get_project_meetings, create_meeting,
-    update_meeting, delete_meeting, get_completed_meetings_for_task
+    update_meeting as update_meeting_record, delete_meeting as delete_meeting_record,
+    get_completed_meetings_for_task,
+    get_project_meetings_by_status, get_max_meeting_id,
+    transition_meeting_status, update_meeting_minutes,
+    
+    # Action item functions
+    get_open_action_items_by_project, get_completed_action_items_by_project,
+    get_open_action_items_by_assignee, get_action_items_for_meetings,
+    create_action_item, update_action_item_status,
+    
+    # Cost functions
+    get_project_cost_entries, create_cost_entry, delete_cost_entry,
+    
+    # Work breakdown structure functions
+    get_project_wbs, get_wbs_node, get_wbs_node_for, get_wbs_descendants, get_wbs_ancestors,
+    get_wbs_rollup, create_wbs_node, update_wbs_node, move_wbs_node, delete_wbs_node,
+    
+    # Schedule baseline functions
+    get_project_baselines, set_current_baseline
+)
+from utils.scheduling import get_dependency_index, propagate_delay
+from utils.work_calendar import get_project_calendar
+from utils.dependency_graph import find_dependency_cycle, record_task_dependencies
+from utils.workload import get_workload, get_task_assignments, apply_workload_change
+from utils.wbs import get_wbs_outline
+from utils.earned_value import get_project_earned_value, record_task_progress, record_cost_entry
+from utils.notifications import build_notifications, wake_dispatcher
+from utils.meeting_scheduler import (
+    ACTIVE_STATUSES, find_meeting_conflicts, find_free_slots, index_meeting, unindex_meeting
 )
 
 # Legacy functions for backward compatibility (now using database)
@@ -127,7 +157,32 @@ def add_task(task_data):
     if 'id' not in task_data:
         task_data['id'] = get_new_id('tasks')
     
-    return create_task(task_data)['id']
+    versions = {}
+    task = create_task(task_data, versions)
+    record_task_dependencies(task['project_id'], task['id'], task.get('dependencies') or [])
+    apply_workload_change(None, get_task_assignments(task['id']), versions)
+    return task['id']
+
+def edit_task(task_id, task_data):
+    """Update a task, rejecting dependencies that would form a cycle"""
+    task = get_task(task_id)
+    if not task:
+        return {"success": False, "message": "Task not found!"}
+    
+    if 'dependencies' in task_data:
+        cycle = find_dependency_cycle(task['project_id'], task_id, task_data['dependencies'])
+        if cycle:
+            return {"success": False, "message": "These dependencies would form a cycle.", "cycle": cycle}
+    
+    before = get_task_assignments(task_id)
+    versions = {}
+    updated = update_task(task_id, task_data, versions)
+    if 'dependencies' in task_data:
+        record_task_dependencies(updated['project_id'], task_id, updated.get('dependencies') or [])
+    apply_workload_change(before, get_task_assignments(task_id), versions)
+    if 'progress' in task_data:
+        record_task_progress(updated['project_id'], task_id, updated.get('progress'), versions)
+    return {"success": True, "message": "Task updated successfully!"}
 
 def add_team_member(member_data):
     """Add a new team member"""
@@ -143,10 +198,13 @@ def get_project_team_leaders(project_id):
 
 def assign_task_to_team(task_id, team_member_ids):
     """Assign a task to team members"""
-    task = get_task(task_id)
-    if task:
+    before = get_task_assignments(task_id)
+    if before:
+        task = dict(before['task'])
         task['assigned_members'] = team_member_ids
-        update_task(task_id, task)
+        versions = {}
+        update_task(task_id, task, versions)
+        apply_workload_change(before, get_task_assignments(task_id), versions)
         return True
     return False
 
@@ -297,42 +355,58 @@ def get_dependent_tasks(task_id):
             task_id in task.get('dependencies', [])]
 
 def analyze_schedule_impact(task_id, new_end_date):
-    """Analyze impact on dependent tasks if end date changes"""
-    task = get_task(task_id)
-    dependent_tasks = get_dependent_tasks(task_id)
+    """
+    Analyze the impact on downstream tasks if a task's end date changes.
+    
+    The delay is propagated through the whole dependency graph of the project;
+    gaps between a task and its successors absorb it where they can.
     
-    if not task or not dependent_tasks:
+    Args:
+        task_id: The ID of the task
+        new_end_date: The proposed end date as 'YYYY-MM-DD'
+    
+    Returns:
+        Dictionary with the impacted tasks, earliest start first, and the delay of the task itself
+    
+    Raises:
+        DependencyCycleError: If the project's dependencies contain a cycle
+    """
+    task = get_task(task_id)
+    if not task:
         return {"impacted_tasks": [], "total_delay_days": 0}
     
-    current_end = datetime.datetime.strptime(task['end_date'], '%Y-%m-%d')
-    new_end = datetime.datetime.strptime(new_end_date, '%Y-%m-%d')
+    # Delays count working days of the project calendar
+    calendar = get_project_calendar(task['project_id'])
+    delay_days = int(calendar.last_day_numbers([new_end_date])[0] - calendar.last_day_numbers([task['end_date']])[0])
     
-    # If new date is earlier or the same, no impact
-    if new_end <= current_end:
+    # If the task ends no later in working time, there is no impact
+    if delay_days <= 0:
         return {"impacted_tasks": [], "total_delay_days": 0}
     
-    # Calculate delay in days
-    delay_days = (new_end - current_end).days
+    index = get_dependency_index(task['project_id'])
+    delays = propagate_delay(index, task_id, delay_days)
+    
+    # Shift all impacted tasks at once
+    positions = list(delays)
+    task_delays = [delays[position] for position in positions]
+    current_starts = [index['start_dates'][position] for position in positions]
+    current_ends = [index['end_dates'][position] for position in positions]
+    new_starts = calendar.shift(current_starts, task_delays).astype(str).tolist()
+    new_ends = calendar.shift(current_ends, task_delays, roll='backward').astype(str).tolist()
     
     impacted_tasks = []
-    for dep_task in dependent_tasks:
-        # Only count tasks that start after this task ends
-        dep_start = datetime.datetime.strptime(dep_task['start_date'], '%Y-%m-%d')
-        if dep_start >= current_end:
-            # Calculate new dates
-            new_start = dep_start + datetime.timedelta(days=delay_days)
-            dep_end = datetime.datetime.strptime(dep_task['end_date'], '%Y-%m-%d')
-            new_end = dep_end + datetime.timedelta(days=delay_days)
-            
-            impacted_tasks.append({
-                "task_id": dep_task['id'],
-                "task_name": dep_task['name'],
-                "current_start": dep_task['start_date'],
-                "current_end": dep_task['end_date'],
-                "new_start": new_start.strftime('%Y-%m-%d'),
-                "new_end": new_end.strftime('%Y-%m-%d'),
-                "delay_days": delay_days
-            })
+    for i, position in enumerate(positions):
+        impacted_tasks.append({
+            "task_id": index['task_ids'][position],
+            "task_name": index['names'][position],
+            "current_start": current_starts[i],
+            "current_end": current_ends[i],
+            "new_start": new_starts[i],
+            "new_end": new_ends[i],
+            "delay_days": task_delays[i]
+        })
+    
+    impacted_tasks.sort(key=lambda impact: (impact['new_start'], impact['task_id']))
     
     return {
         "impacted_tasks": impacted_tasks,
@@ -344,25 +418,30 @@ def add_subtask(subtask_data):
     if 'id' not in subtask_data:
         subtask_data['id'] = get_new_id('subtasks')
     
-    result = create_subtask(subtask_data)
+    before = get_task_assignments(subtask_data['parent_task_id'])
+    versions = {}
+    result = create_subtask(subtask_data, versions)
+    apply_workload_change(before, get_task_assignments(subtask_data['parent_task_id']), versions)
     
     # Update parent task progress
-    update_parent_task_progress(subtask_data['parent_task_id'])
+    update_parent_task_progress(subtask_data['parent_task_id'], versions)
     
     return result['id']
 
-def update_parent_task_progress(parent_task_id):
-    """Update parent task progress based on subtask progress"""
-    subtasks = get_subtasks_by_parent(parent_task_id)
-    if subtasks:
-        total_progress = sum(subtask.get('progress', 0) for subtask in subtasks)
-        average_progress = total_progress / len(subtasks)
-        
-        # Update parent task
-        parent_task = get_task(parent_task_id)
-        if parent_task:
-            parent_task['progress'] = int(average_progress)
-            update_task(parent_task_id, parent_task)
+def update_parent_task_progress(parent_task_id, versions):
+    """
+    Refresh cached figures after subtask progress changed.
+    
+    The database rolls subtask progress up into the parent task and its
+    project when subtasks are saved, so only in-memory caches need the new value.
+    
+    Args:
+        parent_task_id: The ID of the parent task
+        versions: The versions dictionary filled by the subtask write
+    """
+    parent_task = get_task(parent_task_id)
+    if parent_task:
+        record_task_progress(parent_task['project_id'], parent_task_id, parent_task['progress'], versions)
 
 def submit_subtask_report(subtask_id, report_data):
     """Submit a completion report for a subtask"""
@@ -381,13 +460,115 @@ def submit_subtask_report(subtask_id, report_data):
     if report_data['progress'] == 100 and subtask.get('requires_approval', False):
         subtask['approval_status'] = 'Pending Approval'
     
-    update_subtask(subtask_id, subtask)
+    versions = {}
+    update_subtask(subtask_id, subtask, versions)
     
     # Update parent task progress
-    update_parent_task_progress(subtask['parent_task_id'])
+    update_parent_task_progress(subtask['parent_task_id'], versions)
     
     return True
 
+def add_cost_entry(cost_data):
+    """Record an actual cost against a project or one of its tasks"""
+    if not cost_data.get('amount') or cost_data['amount'] <= 0:
+        return {"success": False, "message": "Cost amount must be greater than zero!"}
+    
+    if cost_data.get('task_id'):
+        task = get_task(cost_data['task_id'])
+        if not task or task['project_id'] != cost_data['project_id']:
+            return {"success": False, "message": "Task not found in this project!"}
+    
+    cost_data.setdefault('entry_date', datetime.datetime.now().strftime('%Y-%m-%d'))
+    cost_data.setdefault('created_at', datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    versions = {}
+    entry = create_cost_entry(cost_data, versions)
+    record_cost_entry(entry, versions)
+    return {"success": True, "message": "Cost recorded successfully!", "cost_entry": entry}
+
+def remove_cost_entry(cost_entry):
+    """Delete a recorded cost"""
+    versions = {}
+    if not delete_cost_entry(cost_entry['id'], versions):
+        return False
+    record_cost_entry(cost_entry, versions, sign=-1)
+    return True
+
+def add_work_package(node_data):
+    """Add a work package to a project's work breakdown structure"""
+    if not node_data.get('name'):
+        return {"success": False, "message": "Work package name is required!"}
+    
+    node_data.setdefault('created_at', datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    try:
+        node = create_wbs_node(node_data)
+    except ValueError as e:
+        return {"success": False, "message": str(e)}
+    return {"success": True, "message": "Work package added successfully!", "node": node}
+
+def add_meeting(meeting_data):
+    """Schedule a new meeting"""
+    if 'id' not in meeting_data:
+        meeting_data['id'] = get_max_meeting_id() + 1
+    
+    meeting_data.setdefault('status', 'Scheduled')
+    invitations = build_notifications(
+        'meeting_scheduled',
+        f"meeting:{meeting_data['id']}:scheduled",
+        f"Meeting scheduled: {meeting_data.get('title')}",
+        f"You are invited to {meeting_data.get('title')} on {meeting_data.get('datetime')} "
+        f"({meeting_data.get('duration')} minutes) at {meeting_data.get('location') or 'a location to be announced'}.",
+        member_ids=meeting_data.get('participants') or [],
+        payload={'meeting_id': meeting_data['id']}
+    )
+    meeting = create_meeting(meeting_data, invitations)
+    wake_dispatcher()
+    index_meeting(meeting)
+    return meeting['id']
+
+def update_meeting(meeting_id, meeting_data):
+    """Update a meeting and refresh its time in the meeting index"""
+    meeting = update_meeting_record(meeting_id, meeting_data)
+    if meeting:
+        # The time, duration, participants or status may have changed
+        unindex_meeting(meeting_id)
+        if meeting.get('status') in ACTIVE_STATUSES:
+            index_meeting(meeting)
+    return meeting
+
+def delete_meeting(meeting_id):
+    """Delete a meeting and free its participants' time"""
+    deleted = delete_meeting_record(meeting_id)
+    if deleted:
+        unindex_meeting(meeting_id)
+    return deleted
+
+def start_meeting(meeting_id):
+    """Mark a scheduled meeting as started (in progress)"""
+    return transition_meeting_status(meeting_id, ['Scheduled'], 'In Progress', {
+        'start_time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+    })
+
+def end_meeting(meeting_id):
+    """Mark a meeting in progress as completed"""
+    ended = transition_meeting_status(meeting_id, ['In Progress'], 'Completed', {
+        'end_time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+    })
+    if ended:
+        # Time left over from a meeting that ends early is free again
+        unindex_meeting(meeting_id)
+    return ended
+
+def cancel_meeting(meeting_id):
+    """Cancel a scheduled meeting"""
+    cancelled = transition_meeting_status(meeting_id, ['Scheduled'], 'Cancelled')
+    if cancelled:
+        unindex_meeting(meeting_id)
+    return cancelled
+
+def save_meeting_minutes(meeting_id, minutes):
+    """Save minutes for a meeting"""
+    return update_meeting_minutes(meeting_id, minutes)
+
 def check_task_meeting_requirement(task_id):
     """Check if a task has had a completed team meeting before allowing subtasks"""
     completed_meetings = get_completed_meetings_for_task(task_id)
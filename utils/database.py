@@ -1,11 +1,13 @@
 import os
 import json
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, ARRAY, JSON
+from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, ARRAY, JSON, Index, or_, and_, func
+from sqlalchemy import select, insert, literal, exists, case, true, update, bindparam, LargeBinary
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, defer
 
 # Load environment variables
 load_dotenv()
@@ -49,6 +51,12 @@ class Project(Base):
     created_at = Column(String(20))
     created_by = Column(Integer, nullable=True)
     is_archived = Column(Boolean, default=False)
+    schedule_version = Column(Integer, default=0)  # Bumped whenever task dates or dependencies change
+    progress_version = Column(Integer, default=0)  # Bumped whenever task progress or recorded costs change
+    task_progress_sum = Column(Integer, default=0)  # Rollup of Task.progress over the project's tasks
+    task_count = Column(Integer, default=0)
+    work_days = Column(String(7), nullable=True)  # Worked weekdays from Monday as a mask, e.g. '1111100'
+    holidays = Column(JSON, default=[])  # Non-working dates as 'YYYY-MM-DD'
     
     # Relationships
     tasks = relationship("Task", back_populates="project")
@@ -76,6 +84,12 @@ class Task(Base):
     rejection_reason = Column(Text, nullable=True)
     has_pending_changes = Column(Boolean, default=False)
     is_milestone = Column(Boolean, default=False)
+    optimistic_days = Column(Float, nullable=True)  # Three-point duration estimates for risk simulation
+    most_likely_days = Column(Float, nullable=True)
+    pessimistic_days = Column(Float, nullable=True)
+    budget = Column(Float, nullable=True)  # Budget at completion for earned value
+    subtask_progress_sum = Column(Integer, default=0)  # Rollup of Subtask.progress over the task's subtasks
+    subtask_count = Column(Integer, default=0)
     
     # Relationships
     project = relationship("Project", back_populates="tasks")
@@ -108,9 +122,39 @@ class Document(Base):
     file_path = Column(String(255))
     uploaded_by = Column(Integer, nullable=True)
     upload_date = Column(String(20))
+    category = Column(String(50), nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the stored file
+    file_size = Column(Integer, nullable=True)  # in bytes
+    text_status = Column(String(20), nullable=True)  # Pending, Extracted, Unsupported, Failed
+    extracted_text = Column(Text, nullable=True)
+    current_version = Column(Integer, nullable=True)  # None until a second version is uploaded
     
     # Relationships
     project = relationship("Project", back_populates="documents")
+    versions = relationship("DocumentVersion", back_populates="document", order_by="DocumentVersion.version_number")
+
+class DocumentVersion(Base):
+    """Model for the stored versions of a document"""
+    __tablename__ = "document_versions"
+    __table_args__ = (
+        Index("ix_document_versions_document_number", "document_id", "version_number", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    version_number = Column(Integer)
+    content_hash = Column(String(64))  # SHA-256 of the full version content
+    file_size = Column(Integer)  # Size of the full version content in bytes
+    storage_kind = Column(String(10))  # full, or delta against the previous version
+    stored_hash = Column(String(64))  # Hash of the stored full file or delta
+    stored_size = Column(Integer)  # Bytes actually stored for this version
+    file_path = Column(String(255))  # Original file name
+    uploaded_by = Column(Integer, nullable=True)
+    upload_date = Column(String(20))
+    change_note = Column(Text, nullable=True)
+    
+    # Relationships
+    document = relationship("Document", back_populates="versions")
 
 class Subtask(Base):
     __tablename__ = "subtasks"
@@ -141,6 +185,9 @@ class Subtask(Base):
 
 class Meeting(Base):
     __tablename__ = "meetings"
+    __table_args__ = (
+        Index("ix_meetings_project_status", "project_id", "status", "datetime"),
+    )
     
     id = Column(Integer, primary_key=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
@@ -153,10 +200,113 @@ class Meeting(Base):
     organized_by = Column(Integer, nullable=True)
     status = Column(String(20))  # Scheduled, In Progress, Completed, Cancelled
     minutes = Column(Text, nullable=True)
-    action_items = Column(JSON, default=[])
+    action_items = Column(JSON(none_as_null=True), nullable=True)  # Legacy, NULL once copied into ActionItem
     start_time = Column(String(20), nullable=True)
     end_time = Column(String(20), nullable=True)
 
+class ActionItem(Base):
+    """Model for action items recorded in meetings"""
+    __tablename__ = "action_items"
+    __table_args__ = (
+        Index("ix_action_items_project_status", "project_id", "status", "due_date"),
+        Index("ix_action_items_assignee_status", "assignee_id", "status", "due_date"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    meeting_id = Column(Integer, ForeignKey("meetings.id"), index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"))  # Copied from the meeting for project queries
+    description = Column(Text)
+    assignee_id = Column(Integer, nullable=True)  # Team member ID
+    due_date = Column(String(20))
+    status = Column(String(20))  # In Progress, Completed
+    created_at = Column(String(20), nullable=True)
+    completed_at = Column(String(20), nullable=True)
+
+class CostEntry(Base):
+    """Model for actual costs recorded against a project or task"""
+    __tablename__ = "cost_entries"
+    __table_args__ = (
+        Index("ix_cost_entries_project_date", "project_id", "entry_date"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"))
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=True, index=True)
+    amount = Column(Float)
+    entry_date = Column(String(20))
+    description = Column(Text, nullable=True)
+    recorded_by = Column(Integer, nullable=True)
+    created_at = Column(String(20), nullable=True)
+
+class ProgressSnapshot(Base):
+    """Model for the recorded progress history of tasks.
+    
+    Rows are run-length encoded: a row is only written when a task's progress
+    or status differs from its previous row, and its values hold until the
+    task's next row.
+    """
+    __tablename__ = "progress_snapshots"
+    __table_args__ = (
+        Index("ix_progress_snapshots_project_task_day", "project_id", "task_id", "day"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer)  # No foreign keys, so history outlives deleted tasks
+    task_id = Column(Integer, index=True)
+    day = Column(String(20))
+    progress = Column(Integer, nullable=True)
+    status = Column(String(20))
+
+class WBSNode(Base):
+    """Model for the nodes of a project's work breakdown structure.
+    
+    Every task and subtask has a node linked through task_id or subtask_id,
+    which reads its name, dates and progress from the linked row. Nodes
+    without a link are work packages: summary packages at the top level or
+    below other summary packages group tasks, and packages below a task or
+    subtask break its work down further.
+    """
+    __tablename__ = "wbs_nodes"
+    
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
+    parent_id = Column(Integer, ForeignKey("wbs_nodes.id"), nullable=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=True, unique=True)
+    subtask_id = Column(Integer, ForeignKey("subtasks.id"), nullable=True, unique=True)
+    name = Column(String(100), nullable=True)
+    description = Column(Text, nullable=True)
+    start_date = Column(String(20), nullable=True)
+    end_date = Column(String(20), nullable=True)
+    progress = Column(Integer, default=0)
+    created_at = Column(String(20), nullable=True)
+
+class WBSClosure(Base):
+    """Model for the ancestor/descendant pairs of WBS nodes, including each node with itself at depth 0"""
+    __tablename__ = "wbs_closure"
+    __table_args__ = (
+        Index("ix_wbs_closure_descendant", "descendant_id", "depth"),
+    )
+    
+    ancestor_id = Column(Integer, ForeignKey("wbs_nodes.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("wbs_nodes.id"), primary_key=True)
+    depth = Column(Integer)
+
+class ScheduleBaseline(Base):
+    """Model for saved snapshots of a project's planned task dates and progress.
+    
+    The tasks are stored as compressed columnar arrays in data, see utils.baselines.
+    """
+    __tablename__ = "schedule_baselines"
+    
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
+    name = Column(String(100))
+    is_current = Column(Boolean, default=False)  # The approved plan variances are measured against
+    task_count = Column(Integer, default=0)
+    data = Column(LargeBinary)
+    created_at = Column(String(20))
+    created_by = Column(Integer, nullable=True)
+
 class ChangeRequest(Base):
     """Model for change requests"""
     __tablename__ = "change_requests"
@@ -172,11 +322,16 @@ class ChangeRequest(Base):
     status = Column(String(20), default="Pending")  # Pending, Approved, Rejected
     
     # Current state and proposed changes
-    current_data = Column(JSON)  # Current task/subtask data as JSON
+    current_data = Column(JSON)  # Values of the changed fields before the change
+    current_data_is_delta = Column(Boolean, default=True)  # False or NULL for rows holding a full copy of the item
     proposed_changes = Column(JSON)  # Only the changes
     change_reason = Column(Text, nullable=True)  # Reason for the changes
     impact_analysis = Column(Text, nullable=True)  # Analysis of impact and risks
     
+    # Computed schedule and resource impact, and the project schedule version it was computed at
+    impact_data = Column(JSON, nullable=True)
+    impact_schedule_version = Column(Integer, nullable=True)
+    
     # Approval details
     reviewed_by = Column(Integer, nullable=True)  # User ID
     review_date = Column(String(50), nullable=True)
@@ -193,6 +348,53 @@ class ChangeRequest(Base):
     task = relationship("Task", back_populates="change_requests", foreign_keys=[task_id])
     subtask = relationship("Subtask", back_populates="change_requests", foreign_keys=[subtask_id])
 
+class ChangeRequestParticipant(Base):
+    """Model for the users and team members involved in a change request.
+    
+    One row per requesting user and per affected team member, indexed by
+    each, so a person's change requests are found without searching the
+    affected_members JSON of every request.
+    """
+    __tablename__ = "change_request_participants"
+    
+    id = Column(Integer, primary_key=True)
+    change_request_id = Column(Integer, ForeignKey("change_requests.id"), index=True)
+    user_id = Column(Integer, nullable=True, index=True)
+    team_member_id = Column(Integer, nullable=True, index=True)
+    role = Column(String(20))  # requester or affected
+
+class Notification(Base):
+    """Model for the outbox of notifications waiting to be sent.
+    
+    Rows are written in the same transaction as the change they report and
+    sent later by the background dispatcher in utils.notifications.
+    """
+    __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_notifications_status_recipient", "status", "recipient_type", "recipient_id", "channel", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String(200), unique=True)  # Enqueueing the same key twice has no effect
+    event_type = Column(String(50))
+    recipient_type = Column(String(20))  # user or team_member
+    recipient_id = Column(Integer)
+    channel = Column(String(20))  # email, sms or log
+    address = Column(String(100), nullable=True)
+    subject = Column(String(200))
+    body = Column(Text)
+    payload = Column(JSON, default={})
+    
+    status = Column(String(20), default="Pending")  # Pending, Sending, Sent, Failed, Digested
+    digest_id = Column(Integer, nullable=True)  # The digest notification that replaced this one
+    attempts = Column(Integer, default=0)
+    created_at = Column(String(20))
+    next_attempt_at = Column(String(20))
+    claimed_at = Column(String(20), nullable=True)
+    sent_at = Column(String(20), nullable=True)
+    last_error = Column(Text, nullable=True)
+
 # Create tables in the database
 def create_tables():
     # Use a more defensive approach to create tables only if they don't exist
@@ -202,13 +404,69 @@ def create_tables():
     # Get existing tables
     existing_tables = inspector.get_table_names()
     
-    # Create each table individually if it doesn't exist
+    # Versions numbered twice by concurrent writers would block their unique index
+    if 'document_versions' in existing_tables and 'ix_document_versions_document_number' not in {
+        index['name'] for index in inspector.get_indexes('document_versions')
+    }:
+        drop_duplicate_document_versions()
+    
+    # Create each table individually if it doesn't exist,
+    # otherwise bring its columns and indexes up to date with the model
+    added_columns = set()
     for table in Base.metadata.sorted_tables:
         if table.name not in existing_tables:
             table.create(engine)
+        else:
+            added_columns.update(upgrade_table(inspector, table))
+    
+    # Rollup columns added to existing rows start out empty
+    if added_columns & {'projects.task_count', 'tasks.subtask_count'}:
+        rebuild_progress_rollups()
+    # Existing tasks and subtasks need their WBS nodes
+    if 'wbs_nodes' not in existing_tables:
+        sync_wbs_nodes()
+    # Existing change requests hold full copies of their items
+    if 'change_requests.current_data_is_delta' in added_columns:
+        compact_change_request_data()
+    # Existing change requests need their participants
+    if 'change_request_participants' not in existing_tables:
+        sync_change_request_participants()
+    # Meetings may still hold action items in the legacy JSON column
+    migrate_legacy_action_items()
+    # Documents uploaded before versioning need their first version
+    sync_document_versions()
     
     print(f"Database tables verified. Existing tables: {existing_tables}")
 
+def upgrade_table(inspector, table):
+    """
+    Add columns and indexes that were added to a model after its table was created.
+    
+    Returns:
+        List of the added columns as 'table.column' names
+    """
+    from sqlalchemy import text
+    from sqlalchemy.schema import CreateColumn
+    
+    existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+    existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+    
+    added_columns = []
+    with engine.begin() as connection:
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+                added_columns.append(f"{table.name}.{column.name}")
+                print(f"Added column {table.name}.{column.name}")
+    
+    for index in table.indexes:
+        if index.name not in existing_indexes:
+            index.create(engine)
+            print(f"Created index {index.name}")
+    
+    return added_columns
+
 # Create a new session for database operations
 def get_db_session():
     return SessionLocal()
@@ -301,6 +559,8 @@ def migrate_json_to_db():
         
         # Commit all changes
         db.commit()
+        rebuild_progress_rollups()
+        sync_wbs_nodes()
         print("Data migration completed successfully!")
     
     except Exception as e:
@@ -311,9 +571,11 @@ def migrate_json_to_db():
         db.close()
 
 # Helper function to convert SQLAlchemy model instances to dictionaries
-def model_to_dict(model):
+def model_to_dict(model, exclude=()):
     result = {}
     for column in model.__table__.columns:
+        if column.name in exclude:
+            continue
         result[column.name] = getattr(model, column.name)
     return result
 
@@ -390,6 +652,19 @@ def get_project(project_id):
     finally:
         db.close()
 
+# Project fields that make up its working-day calendar
+CALENDAR_FIELDS = ('work_days', 'holidays')
+
+# Project fields that cached schedules and budget models are computed from
+PROJECT_SCHEDULE_FIELDS = CALENDAR_FIELDS + ('budget',)
+
+# Rollup and version columns kept up to date by the functions in this module;
+# rows read earlier and passed back whole must not overwrite them
+MAINTAINED_FIELDS = (
+    'schedule_version', 'progress_version', 'task_progress_sum', 'task_count',
+    'subtask_progress_sum', 'subtask_count'
+)
+
 def create_project(project_data):
     db = get_db_session()
     try:
@@ -410,10 +685,17 @@ def update_project(project_id, project_data):
         if not project:
             return None
         
+        schedule_changed = False
         for key, value in project_data.items():
-            if hasattr(project, key):
+            if hasattr(project, key) and key not in MAINTAINED_FIELDS:
+                if key in PROJECT_SCHEDULE_FIELDS and getattr(project, key) != value:
+                    schedule_changed = True
                 setattr(project, key, value)
         
+        # Working-day calendars and the budget are cached with the schedule
+        if schedule_changed:
+            _bump_schedule_version(db, project_id)
+        
         db.commit()
         return model_to_dict(project)
     finally:
@@ -459,12 +741,249 @@ def get_project_tasks(project_id):
     finally:
         db.close()
 
-def create_task(task_data):
+# Task and subtask fields that the project schedule and workload are computed from
+SCHEDULE_FIELDS = (
+    'start_date', 'end_date', 'dependencies', 'is_milestone', 'project_id', 'assigned_members',
+    'optimistic_days', 'most_likely_days', 'pessimistic_days', 'budget'
+)
+SUBTASK_SCHEDULE_FIELDS = ('start_date', 'end_date', 'assigned_members', 'parent_task_id')
+
+# Write functions taking a versions dictionary fill it, once committed, with
+# the (from, to) cache versions their transaction moved each project through,
+# keyed by ('schedule' or 'progress', project_id). In-memory caches apply a
+# change in place only when they were built at its from version.
+
+def _record_version(db, kind, project_id, version):
+    recorded = db.info.setdefault('versions', {})
+    first = recorded.get((kind, project_id), (version - 1, version))[0]
+    recorded[(kind, project_id)] = (first, version)
+
+def report_versions(db, versions):
+    """Copy the cache versions produced by a committed transaction into the caller's dictionary"""
+    if versions is not None:
+        versions.update(db.info.get('versions', {}))
+
+def _bump_schedule_version(db, project_id):
+    """Invalidate cached schedules of a project, as part of the caller's transaction"""
+    if project_id is None:
+        return
+    version = db.execute(
+        update(Project).where(Project.id == project_id)
+        .values(schedule_version=func.coalesce(Project.schedule_version, 0) + 1)
+        .returning(Project.schedule_version)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if version is not None:
+        _record_version(db, 'schedule', project_id, version)
+
+def _bump_task_schedule_version(db, task_id):
+    """Invalidate cached schedules of the project a task belongs to"""
+    project_id = db.query(Task.project_id).filter(Task.id == task_id).scalar()
+    _bump_schedule_version(db, project_id)
+
+def get_schedule_versions():
+    """Get the schedule version of every project as a dictionary"""
+    db = get_db_session()
+    try:
+        rows = db.query(Project.id, Project.schedule_version).all()
+        return {row.id: row.schedule_version or 0 for row in rows}
+    finally:
+        db.close()
+
+def _bump_progress_version(db, project_id):
+    """Invalidate cached progress and cost figures of a project, as part of the caller's transaction"""
+    if project_id is None:
+        return
+    version = db.execute(
+        update(Project).where(Project.id == project_id)
+        .values(progress_version=func.coalesce(Project.progress_version, 0) + 1)
+        .returning(Project.progress_version)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if version is not None:
+        _record_version(db, 'progress', project_id, version)
+
+def get_project_progress_version(project_id):
+    db = get_db_session()
+    try:
+        return db.query(Project.progress_version).filter(Project.id == project_id).scalar() or 0
+    finally:
+        db.close()
+
+def _roll_up_task(db, project_id, progress_delta, count_delta=0):
+    """Apply a change of task progress or count to the project's rollup, as part of the caller's transaction"""
+    if project_id is None or (not progress_delta and not count_delta):
+        return
+    db.query(Project).filter(Project.id == project_id).update(
+        {
+            Project.task_progress_sum: func.coalesce(Project.task_progress_sum, 0) + progress_delta,
+            Project.task_count: func.coalesce(Project.task_count, 0) + count_delta
+        },
+        synchronize_session=False
+    )
+
+def _roll_up_subtask(db, task_id, progress_delta, count_delta=0):
+    """
+    Apply a change of subtask progress or count to the parent task's rollup, as part of the caller's transaction.
+    
+    A task with subtasks takes their average progress, and a change of the
+    task's progress rolls on up to its project.
+    """
+    if task_id is None or (not progress_delta and not count_delta):
+        return
+    db.query(Task).filter(Task.id == task_id).update(
+        {
+            Task.subtask_progress_sum: func.coalesce(Task.subtask_progress_sum, 0) + progress_delta,
+            Task.subtask_count: func.coalesce(Task.subtask_count, 0) + count_delta
+        },
+        synchronize_session=False
+    )
+    task = db.query(Task).filter(Task.id == task_id).populate_existing().first()
+    if not task or not task.subtask_count:
+        return
+    
+    progress = int(task.subtask_progress_sum / task.subtask_count)
+    if progress != (task.progress or 0):
+        _roll_up_task(db, task.project_id, progress - (task.progress or 0))
+        _bump_progress_version(db, task.project_id)
+        task.progress = progress
+
+def rebuild_progress_rollups():
+    """Recompute the progress rollups of all tasks and projects from their children"""
+    db = get_db_session()
+    try:
+        subtask_totals = db.query(
+            Subtask.parent_task_id, func.sum(func.coalesce(Subtask.progress, 0)), func.count(Subtask.id)
+        ).group_by(Subtask.parent_task_id).all()
+        db.query(Task).update({Task.subtask_progress_sum: 0, Task.subtask_count: 0}, synchronize_session=False)
+        for task_id, progress_sum, count in subtask_totals:
+            db.query(Task).filter(Task.id == task_id).update(
+                {Task.subtask_progress_sum: int(progress_sum or 0), Task.subtask_count: count},
+                synchronize_session=False
+            )
+        
+        task_totals = db.query(
+            Task.project_id, func.sum(func.coalesce(Task.progress, 0)), func.count(Task.id)
+        ).group_by(Task.project_id).all()
+        db.query(Project).update({Project.task_progress_sum: 0, Project.task_count: 0}, synchronize_session=False)
+        for project_id, progress_sum, count in task_totals:
+            db.query(Project).filter(Project.id == project_id).update(
+                {Project.task_progress_sum: int(progress_sum or 0), Project.task_count: count},
+                synchronize_session=False
+            )
+        
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def compact_change_request_data(batch_size=500):
+    """
+    Reduce the current_data of change requests holding a full copy of their
+    task or subtask to the values of the fields they change.
+    
+    Args:
+        batch_size: Number of change requests rewritten per transaction
+    
+    Returns:
+        The number of change requests compacted
+    """
+    db = get_db_session()
+    compacted = 0
+    last_id = 0
+    try:
+        while True:
+            rows = db.query(
+                ChangeRequest.id, ChangeRequest.current_data, ChangeRequest.proposed_changes
+            ).filter(
+                ChangeRequest.id > last_id,
+                or_(ChangeRequest.current_data_is_delta.is_(None), ChangeRequest.current_data_is_delta.is_(False))
+            ).order_by(ChangeRequest.id).limit(batch_size).all()
+            if not rows:
+                break
+            
+            db.execute(update(ChangeRequest), [
+                {
+                    'id': row.id,
+                    'current_data': {key: (row.current_data or {}).get(key) for key in (row.proposed_changes or {})},
+                    'current_data_is_delta': True
+                }
+                for row in rows
+            ])
+            db.commit()
+            compacted += len(rows)
+            last_id = rows[-1].id
+        return compacted
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def change_request_participants(request_id, requested_by, affected_members):
+    """Participant rows of a change request"""
+    participants = []
+    if requested_by is not None:
+        participants.append(ChangeRequestParticipant(
+            change_request_id=request_id, user_id=requested_by, role='requester'
+        ))
+    for member_id in dict.fromkeys(affected_members or []):
+        participants.append(ChangeRequestParticipant(
+            change_request_id=request_id, team_member_id=member_id, role='affected'
+        ))
+    return participants
+
+def sync_change_request_participants():
+    """Rebuild the participant rows of all change requests"""
+    db = get_db_session()
+    try:
+        db.query(ChangeRequestParticipant).delete()
+        rows = db.query(ChangeRequest.id, ChangeRequest.requested_by, ChangeRequest.affected_members).all()
+        for request_id, requested_by, affected_members in rows:
+            db.add_all(change_request_participants(request_id, requested_by, affected_members))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def get_project_completion(project_id):
+    """
+    Get a project's completion percentage from its progress rollup.
+    
+    Returns:
+        The average progress of the project's tasks, or None if it has no tasks
+    """
+    db = get_db_session()
+    try:
+        row = db.query(Project.task_progress_sum, Project.task_count).filter(Project.id == project_id).first()
+        if not row or not row.task_count:
+            return None
+        return (row.task_progress_sum or 0) / row.task_count
+    finally:
+        db.close()
+
+def get_project_schedule_version(project_id):
+    db = get_db_session()
+    try:
+        return db.query(Project.schedule_version).filter(Project.id == project_id).scalar() or 0
+    finally:
+        db.close()
+
+def create_task(task_data, versions=None):
     db = get_db_session()
     try:
         task = Task(**task_data)
         db.add(task)
+        db.flush()
+        _add_wbs_node(db, WBSNode(project_id=task.project_id, task_id=task.id))
+        _bump_schedule_version(db, task.project_id)
+        _roll_up_task(db, task.project_id, task.progress or 0, 1)
         db.commit()
+        report_versions(db, versions)
         return model_to_dict(task)
     except TypeError as e:
         print(f"Error creating Task: {e}")
@@ -472,22 +991,51 @@ def create_task(task_data):
     finally:
         db.close()
 
-def update_task(task_id, task_data):
+def update_task(task_id, task_data, versions=None):
     db = get_db_session()
     try:
         task = db.query(Task).filter(Task.id == task_id).first()
         if not task:
             return None
         
-        for key, value in task_data.items():
-            if hasattr(task, key):
-                setattr(task, key, value)
-        
+        apply_task_changes(db, task, task_data)
         db.commit()
+        report_versions(db, versions)
         return model_to_dict(task)
     finally:
         db.close()
 
+def apply_task_changes(db, task, task_data):
+    """Set fields of a task and update versions, rollups and the WBS, as part of the caller's transaction"""
+    old_project_id = task.project_id
+    old_progress = task.progress or 0
+    schedule_changed = False
+    progress_changed = False
+    for key, value in task_data.items():
+        if hasattr(task, key) and key not in MAINTAINED_FIELDS:
+            # A task with subtasks takes its progress from them
+            if key == 'progress' and task.subtask_count:
+                continue
+            if key in SCHEDULE_FIELDS and getattr(task, key) != value:
+                schedule_changed = True
+            if key == 'progress' and task.progress != value:
+                progress_changed = True
+            setattr(task, key, value)
+    
+    if schedule_changed:
+        _bump_schedule_version(db, old_project_id)
+        if task.project_id != old_project_id:
+            _bump_schedule_version(db, task.project_id)
+    if progress_changed:
+        _bump_progress_version(db, task.project_id)
+    
+    if task.project_id != old_project_id:
+        _roll_up_task(db, old_project_id, -old_progress, -1)
+        _roll_up_task(db, task.project_id, task.progress or 0, 1)
+        _move_wbs_project(db, task.id, task.project_id)
+    else:
+        _roll_up_task(db, task.project_id, (task.progress or 0) - old_progress)
+
 def delete_task(task_id):
     db = get_db_session()
     try:
@@ -495,9 +1043,22 @@ def delete_task(task_id):
         if not task:
             return False
         
-        # Delete all subtasks associated with this task
+        # Delete all subtasks associated with this task, with the task's WBS subtree
+        node_id = db.query(WBSNode.id).filter(WBSNode.task_id == task_id).scalar()
+        if node_id is not None:
+            _delete_wbs_subtree(db, node_id)
         db.query(Subtask).filter(Subtask.parent_task_id == task_id).delete()
         
+        # Costs already spent stay on the project
+        if db.query(CostEntry).filter(CostEntry.task_id == task_id).update(
+            {CostEntry.task_id: None}, synchronize_session=False
+        ):
+            _bump_progress_version(db, task.project_id)
+        
+        _bump_schedule_version(db, task.project_id)
+        _roll_up_task(db, task.project_id, -(task.progress or 0), -1)
+        if task.progress:
+            _bump_progress_version(db, task.project_id)
         db.delete(task)
         db.commit()
         return True
@@ -575,29 +1136,99 @@ def get_team_members_by_leader(leader_id):
     finally:
         db.close()
 
+# Extracted text can be large, so document lists leave it out
 def get_all_documents():
     db = get_db_session()
     try:
-        documents = db.query(Document).all()
-        return [model_to_dict(doc) for doc in documents]
+        documents = db.query(Document).options(defer(Document.extracted_text)).all()
+        return [model_to_dict(doc, exclude={'extracted_text'}) for doc in documents]
     finally:
         db.close()
 
 def get_project_documents(project_id):
     db = get_db_session()
     try:
-        documents = db.query(Document).filter(Document.project_id == project_id).all()
-        return [model_to_dict(doc) for doc in documents]
+        documents = db.query(Document).options(defer(Document.extracted_text)).filter(
+            Document.project_id == project_id
+        ).all()
+        return [model_to_dict(doc, exclude={'extracted_text'}) for doc in documents]
+    finally:
+        db.close()
+
+def get_document(document_id):
+    db = get_db_session()
+    try:
+        document = db.query(Document).options(defer(Document.extracted_text)).filter(
+            Document.id == document_id
+        ).first()
+        return model_to_dict(document, exclude={'extracted_text'}) if document else None
+    finally:
+        db.close()
+
+def search_project_documents(project_id, search_query):
+    """Get the IDs of project documents whose name, description or extracted text match a query"""
+    db = get_db_session()
+    try:
+        pattern = f"%{search_query}%"
+        rows = db.query(Document.id).filter(
+            Document.project_id == project_id,
+            or_(
+                Document.name.ilike(pattern),
+                Document.description.ilike(pattern),
+                Document.extracted_text.ilike(pattern)
+            )
+        ).all()
+        return [row.id for row in rows]
+    finally:
+        db.close()
+
+def get_document_text_preview(document_id, max_chars):
+    """Get the first characters of a document's extracted text"""
+    db = get_db_session()
+    try:
+        row = db.query(func.substr(Document.extracted_text, 1, max_chars)).filter(
+            Document.id == document_id
+        ).first()
+        return row[0] if row else None
+    finally:
+        db.close()
+
+def get_documents_by_text_status(text_status):
+    """Get documents whose text extraction is in the given state"""
+    db = get_db_session()
+    try:
+        documents = db.query(Document).options(defer(Document.extracted_text)).filter(
+            Document.text_status == text_status
+        ).all()
+        return [model_to_dict(doc, exclude={'extracted_text'}) for doc in documents]
     finally:
         db.close()
 
+def _initial_document_version(document):
+    """The first version of a document, recording its stored file as a full copy"""
+    return DocumentVersion(
+        document_id=document.id,
+        version_number=1,
+        content_hash=document.content_hash,
+        file_size=document.file_size,
+        storage_kind='full',
+        stored_hash=document.content_hash,
+        stored_size=document.file_size,
+        file_path=document.file_path,
+        uploaded_by=document.uploaded_by,
+        upload_date=document.upload_date
+    )
+
 def create_document(document_data):
     db = get_db_session()
     try:
         document = Document(**document_data)
         db.add(document)
+        if document.content_hash:
+            db.flush()
+            db.add(_initial_document_version(document))
         db.commit()
-        return model_to_dict(document)
+        return model_to_dict(document, exclude={'extracted_text'})
     finally:
         db.close()
 
@@ -613,7 +1244,7 @@ def update_document(document_id, document_data):
                 setattr(document, key, value)
         
         db.commit()
-        return model_to_dict(document)
+        return model_to_dict(document, exclude={'extracted_text'})
     finally:
         db.close()
 
@@ -624,12 +1255,105 @@ def delete_document(document_id):
         if not document:
             return False
         
+        # Delete all stored versions of this document
+        db.query(DocumentVersion).filter(DocumentVersion.document_id == document_id).delete()
+        
         db.delete(document)
         db.commit()
         return True
     finally:
         db.close()
 
+def get_document_versions(document_id):
+    db = get_db_session()
+    try:
+        versions = db.query(DocumentVersion).filter(
+            DocumentVersion.document_id == document_id
+        ).order_by(DocumentVersion.version_number).all()
+        return [model_to_dict(version) for version in versions]
+    finally:
+        db.close()
+
+def create_document_version(version_data):
+    db = get_db_session()
+    try:
+        version = DocumentVersion(**version_data)
+        db.add(version)
+        db.commit()
+        return model_to_dict(version)
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def set_document_version_storage(version_id, stored_hash, stored_size):
+    """
+    Record that a fully stored version is now stored as a delta.
+    
+    Returns:
+        True if the version was changed, False if it is missing or no longer stored in full
+    """
+    db = get_db_session()
+    try:
+        updated = db.query(DocumentVersion).filter(
+            DocumentVersion.id == version_id,
+            DocumentVersion.storage_kind == 'full'
+        ).update({
+            DocumentVersion.storage_kind: 'delta',
+            DocumentVersion.stored_hash: stored_hash,
+            DocumentVersion.stored_size: stored_size
+        }, synchronize_session=False)
+        db.commit()
+        return bool(updated)
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def sync_document_versions():
+    """Create the first version of stored documents that have no versions"""
+    db = get_db_session()
+    try:
+        unversioned = db.query(Document).filter(
+            Document.content_hash.isnot(None),
+            ~exists().where(DocumentVersion.document_id == Document.id)
+        ).all()
+        for document in unversioned:
+            db.add(_initial_document_version(document))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def drop_duplicate_document_versions():
+    """Delete all but the first row of each document version number"""
+    db = get_db_session()
+    try:
+        first_ids = select(func.min(DocumentVersion.id)).group_by(
+            DocumentVersion.document_id, DocumentVersion.version_number
+        )
+        db.query(DocumentVersion).filter(DocumentVersion.id.notin_(first_ids)).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def is_content_hash_referenced(content_hash):
+    """Check whether a stored file is still needed by a document or a fully stored version"""
+    db = get_db_session()
+    try:
+        if db.query(Document.id).filter(Document.content_hash == content_hash).first():
+            return True
+        return db.query(DocumentVersion.id).filter(DocumentVersion.stored_hash == content_hash).first() is not None
+    finally:
+        db.close()
+
 def get_all_subtasks():
     db = get_db_session()
     try:
@@ -654,32 +1378,67 @@ def get_subtasks_by_parent(parent_task_id):
     finally:
         db.close()
 
-def create_subtask(subtask_data):
+def create_subtask(subtask_data, versions=None):
     db = get_db_session()
     try:
         subtask = Subtask(**subtask_data)
         db.add(subtask)
+        db.flush()
+        parent_node = db.query(WBSNode).filter(WBSNode.task_id == subtask.parent_task_id).first()
+        if parent_node:
+            _add_wbs_node(db, WBSNode(project_id=parent_node.project_id, parent_id=parent_node.id, subtask_id=subtask.id))
+        _bump_task_schedule_version(db, subtask.parent_task_id)
+        _roll_up_subtask(db, subtask.parent_task_id, subtask.progress or 0, 1)
         db.commit()
+        report_versions(db, versions)
         return model_to_dict(subtask)
     finally:
         db.close()
 
-def update_subtask(subtask_id, subtask_data):
+def update_subtask(subtask_id, subtask_data, versions=None):
     db = get_db_session()
     try:
         subtask = db.query(Subtask).filter(Subtask.id == subtask_id).first()
         if not subtask:
             return None
         
-        for key, value in subtask_data.items():
-            if hasattr(subtask, key):
-                setattr(subtask, key, value)
-        
+        apply_subtask_changes(db, subtask, subtask_data)
         db.commit()
+        report_versions(db, versions)
         return model_to_dict(subtask)
     finally:
         db.close()
 
+def apply_subtask_changes(db, subtask, subtask_data):
+    """Set fields of a subtask and update versions, rollups and the WBS, as part of the caller's transaction"""
+    old_parent_id = subtask.parent_task_id
+    old_progress = subtask.progress or 0
+    schedule_changed = False
+    for key, value in subtask_data.items():
+        if hasattr(subtask, key) and key not in MAINTAINED_FIELDS:
+            if key in SUBTASK_SCHEDULE_FIELDS and getattr(subtask, key) != value:
+                schedule_changed = True
+            setattr(subtask, key, value)
+    
+    if schedule_changed:
+        _bump_task_schedule_version(db, old_parent_id)
+        if subtask.parent_task_id != old_parent_id:
+            _bump_task_schedule_version(db, subtask.parent_task_id)
+    
+    if subtask.parent_task_id != old_parent_id:
+        _roll_up_subtask(db, old_parent_id, -old_progress, -1)
+        _roll_up_subtask(db, subtask.parent_task_id, subtask.progress or 0, 1)
+        node = db.query(WBSNode).filter(WBSNode.subtask_id == subtask.id).first()
+        parent_node = db.query(WBSNode).filter(WBSNode.task_id == subtask.parent_task_id).first()
+        if node and parent_node:
+            # Only the subtask's node moves; the new parent task keeps its place
+            _move_wbs_node(db, node, parent_node.id)
+            db.query(WBSNode).filter(WBSNode.id.in_(_subtree_ids(node.id))).update(
+                {WBSNode.project_id: parent_node.project_id}, synchronize_session=False
+            )
+    else:
+        _roll_up_subtask(db, subtask.parent_task_id, (subtask.progress or 0) - old_progress)
+
 def delete_subtask(subtask_id):
     db = get_db_session()
     try:
@@ -687,12 +1446,44 @@ def delete_subtask(subtask_id):
         if not subtask:
             return False
         
+        _bump_task_schedule_version(db, subtask.parent_task_id)
+        _roll_up_subtask(db, subtask.parent_task_id, -(subtask.progress or 0), -1)
+        node_id = db.query(WBSNode.id).filter(WBSNode.subtask_id == subtask_id).scalar()
+        if node_id is not None:
+            _delete_wbs_subtree(db, node_id)
         db.delete(subtask)
         db.commit()
         return True
     finally:
         db.close()
 
+def get_workload_assignments(project_id=None):
+    """
+    Get the dates and assigned members of tasks and subtasks.
+    
+    Args:
+        project_id: Optional project to limit the results to
+        
+    Returns:
+        Tuple of (tasks, subtasks); each item is a dictionary with id, start_date,
+        end_date and assigned_members, and subtasks also have parent_task_id
+    """
+    db = get_db_session()
+    try:
+        task_query = db.query(Task.id, Task.start_date, Task.end_date, Task.assigned_members)
+        subtask_query = db.query(
+            Subtask.id, Subtask.parent_task_id, Subtask.start_date, Subtask.end_date, Subtask.assigned_members
+        )
+        if project_id is not None:
+            task_query = task_query.filter(Task.project_id == project_id)
+            subtask_query = subtask_query.join(Task, Task.id == Subtask.parent_task_id).filter(Task.project_id == project_id)
+        
+        tasks = [row._asdict() for row in task_query.all()]
+        subtasks = [row._asdict() for row in subtask_query.all()]
+        return tasks, subtasks
+    finally:
+        db.close()
+
 def get_subtasks_by_member(member_id):
     db = get_db_session()
     try:
@@ -734,47 +1525,857 @@ def get_project_meetings(project_id):
     finally:
         db.close()
 
-def create_meeting(meeting_data):
+def get_project_meetings_by_status(project_id, statuses, after=None, descending=False):
+    """
+    Get a project's meetings in the given statuses, ordered by meeting time.
+    
+    Args:
+        project_id: The ID of the project
+        statuses: List of meeting statuses to include
+        after: Optional 'YYYY-MM-DD HH:MM' string; only later meetings are returned
+        descending: Whether to return the latest meetings first
+    """
     db = get_db_session()
     try:
-        meeting = Meeting(**meeting_data)
-        db.add(meeting)
-        db.commit()
-        return model_to_dict(meeting)
+        query = db.query(Meeting).filter(
+            Meeting.project_id == project_id,
+            Meeting.status.in_(statuses)
+        )
+        if after:
+            query = query.filter(Meeting.datetime > after)
+        
+        order = Meeting.datetime.desc() if descending else Meeting.datetime
+        meetings = query.order_by(order).all()
+        return [model_to_dict(meeting) for meeting in meetings]
     finally:
         db.close()
 
-def update_meeting(meeting_id, meeting_data):
+def get_meeting_slots_by_status(statuses):
+    """
+    Get the time slots of all meetings in the given statuses.
+
+    Args:
+        statuses: List of meeting statuses to include
+
+    Returns:
+        List of dictionaries with the id, title, datetime, duration and participants of each meeting
+    """
     db = get_db_session()
     try:
-        meeting = db.query(Meeting).filter(Meeting.id == meeting_id).first()
-        if not meeting:
-            return None
-        
-        for key, value in meeting_data.items():
-            if hasattr(meeting, key):
-                setattr(meeting, key, value)
-        
-        db.commit()
-        return model_to_dict(meeting)
+        rows = db.query(
+            Meeting.id, Meeting.title, Meeting.datetime, Meeting.duration, Meeting.participants
+        ).filter(Meeting.status.in_(statuses)).all()
+        return [
+            {
+                'id': row.id,
+                'title': row.title,
+                'datetime': row.datetime,
+                'duration': row.duration,
+                'participants': row.participants or []
+            }
+            for row in rows
+        ]
     finally:
         db.close()
 
-def delete_meeting(meeting_id):
+def get_max_meeting_id():
     db = get_db_session()
     try:
-        meeting = db.query(Meeting).filter(Meeting.id == meeting_id).first()
-        if not meeting:
-            return False
+        return db.query(func.max(Meeting.id)).scalar() or 0
+    finally:
+        db.close()
+
+def transition_meeting_status(meeting_id, from_statuses, to_status, extra_values=None):
+    """
+    Move a meeting to a new status in a single conditional update.
+    
+    Args:
+        meeting_id: The ID of the meeting
+        from_statuses: Statuses the meeting must currently have
+        to_status: The new status
+        extra_values: Optional dictionary of other columns to set
         
-        db.delete(meeting)
+    Returns:
+        True if the meeting was in one of from_statuses and was updated
+    """
+    db = get_db_session()
+    try:
+        values = {'status': to_status}
+        values.update(extra_values or {})
+        updated = db.query(Meeting).filter(
+            Meeting.id == meeting_id,
+            Meeting.status.in_(from_statuses)
+        ).update(values, synchronize_session=False)
         db.commit()
-        return True
+        return updated > 0
+    except Exception as e:
+        db.rollback()
+        raise e
     finally:
         db.close()
 
-def get_completed_meetings_for_task(task_id):
-    """Get all completed meetings that discuss a specific task"""
+def update_meeting_minutes(meeting_id, minutes):
+    db = get_db_session()
+    try:
+        updated = db.query(Meeting).filter(Meeting.id == meeting_id).update(
+            {'minutes': minutes}, synchronize_session=False
+        )
+        db.commit()
+        return updated > 0
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def create_meeting(meeting_data, notifications=None):
+    db = get_db_session()
+    try:
+        meeting = Meeting(**meeting_data)
+        db.add(meeting)
+        # Invitations are queued with the meeting
+        if notifications:
+            add_notifications(db, notifications)
+        db.commit()
+        return model_to_dict(meeting)
+    finally:
+        db.close()
+
+def update_meeting(meeting_id, meeting_data):
+    db = get_db_session()
+    try:
+        meeting = db.query(Meeting).filter(Meeting.id == meeting_id).first()
+        if not meeting:
+            return None
+        
+        for key, value in meeting_data.items():
+            if hasattr(meeting, key):
+                setattr(meeting, key, value)
+        
+        db.commit()
+        return model_to_dict(meeting)
+    finally:
+        db.close()
+
+def delete_meeting(meeting_id):
+    db = get_db_session()
+    try:
+        meeting = db.query(Meeting).filter(Meeting.id == meeting_id).first()
+        if not meeting:
+            return False
+        
+        # Delete all action items recorded in this meeting
+        db.query(ActionItem).filter(ActionItem.meeting_id == meeting_id).delete()
+        
+        db.delete(meeting)
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+def migrate_legacy_action_items():
+    """
+    Copy action items from the legacy Meeting.action_items JSON column into
+    the action_items table and clear the column.
+    
+    Each legacy item is copied unless the meeting already has an action item
+    with the same description and assignee, so items added to a meeting
+    before its migration do not stop its legacy items from being copied.
+    
+    Returns:
+        The number of action items copied
+    """
+    db = get_db_session()
+    try:
+        meetings = db.query(Meeting).filter(Meeting.action_items.isnot(None)).all()
+        if not meetings:
+            return 0
+        
+        existing = {}
+        for meeting_id, description, assignee_id in db.query(
+            ActionItem.meeting_id, ActionItem.description, ActionItem.assignee_id
+        ).filter(ActionItem.meeting_id.in_([meeting.id for meeting in meetings])):
+            key = (meeting_id, description or '', assignee_id)
+            existing[key] = existing.get(key, 0) + 1
+        
+        migrated_count = 0
+        for meeting in meetings:
+            for item in meeting.action_items or []:
+                if not isinstance(item, dict):
+                    continue
+                
+                # Items already copied are matched one for one
+                key = (meeting.id, item.get('description', '') or '', item.get('assignee_id'))
+                if existing.get(key):
+                    existing[key] -= 1
+                    continue
+                
+                db.add(ActionItem(
+                    meeting_id=meeting.id,
+                    project_id=meeting.project_id,
+                    description=item.get('description', ''),
+                    assignee_id=item.get('assignee_id'),
+                    due_date=item.get('due_date'),
+                    status=item.get('status', 'In Progress'),
+                    created_at=item.get('created_at'),
+                    completed_at=item.get('completed_at')
+                ))
+                migrated_count += 1
+            meeting.action_items = None
+        
+        db.commit()
+        if migrated_count:
+            print(f"Migrated {migrated_count} action items")
+        return migrated_count
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def _action_item_query(db):
+    """Query action items together with their meeting and assignee details"""
+    return db.query(
+        ActionItem, Meeting.title, Meeting.datetime, TeamMember.name
+    ).join(
+        Meeting, Meeting.id == ActionItem.meeting_id
+    ).outerjoin(
+        TeamMember, TeamMember.id == ActionItem.assignee_id
+    )
+
+def _action_item_to_dict(row):
+    item, meeting_title, meeting_date, assignee_name = row
+    result = model_to_dict(item)
+    result['meeting_title'] = meeting_title
+    result['meeting_date'] = meeting_date
+    result['assignee_name'] = assignee_name or "Unknown"
+    return result
+
+def get_open_action_items_by_project(project_id):
+    db = get_db_session()
+    try:
+        rows = _action_item_query(db).filter(
+            ActionItem.project_id == project_id,
+            ActionItem.status != 'Completed'
+        ).order_by(ActionItem.due_date).all()
+        return [_action_item_to_dict(row) for row in rows]
+    finally:
+        db.close()
+
+def get_completed_action_items_by_project(project_id):
+    db = get_db_session()
+    try:
+        rows = _action_item_query(db).filter(
+            ActionItem.project_id == project_id,
+            ActionItem.status == 'Completed'
+        ).order_by(ActionItem.due_date).all()
+        return [_action_item_to_dict(row) for row in rows]
+    finally:
+        db.close()
+
+def get_open_action_items_by_assignee(assignee_id):
+    db = get_db_session()
+    try:
+        rows = _action_item_query(db).filter(
+            ActionItem.assignee_id == assignee_id,
+            ActionItem.status != 'Completed'
+        ).order_by(ActionItem.due_date).all()
+        return [_action_item_to_dict(row) for row in rows]
+    finally:
+        db.close()
+
+def get_action_items_for_meetings(meeting_ids):
+    db = get_db_session()
+    try:
+        rows = _action_item_query(db).filter(
+            ActionItem.meeting_id.in_(meeting_ids)
+        ).order_by(ActionItem.id).all()
+        return [_action_item_to_dict(row) for row in rows]
+    finally:
+        db.close()
+
+def create_action_item(action_item_data):
+    db = get_db_session()
+    try:
+        action_item = ActionItem(**action_item_data)
+        db.add(action_item)
+        db.commit()
+        return model_to_dict(action_item)
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def update_action_item_status(action_item_id, status):
+    """Update the status of a single action item"""
+    db = get_db_session()
+    try:
+        completed_at = datetime.now().strftime('%Y-%m-%d %H:%M') if status == 'Completed' else None
+        updated = db.query(ActionItem).filter(ActionItem.id == action_item_id).update(
+            {ActionItem.status: status, ActionItem.completed_at: completed_at},
+            synchronize_session=False
+        )
+        db.commit()
+        return updated > 0
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def get_project_task_progress(project_id):
+    """Get the progress of each task of a project as a dictionary"""
+    db = get_db_session()
+    try:
+        rows = db.query(Task.id, Task.progress).filter(Task.project_id == project_id).all()
+        return {row.id: row.progress or 0 for row in rows}
+    finally:
+        db.close()
+
+def _add_wbs_node(db, node):
+    """Insert a WBS node and its closure rows, as part of the caller's transaction"""
+    db.add(node)
+    db.flush()
+    # The new node descends from each ancestor of its parent, one level deeper, and from itself
+    ancestors = select(
+        WBSClosure.ancestor_id, literal(node.id, Integer), WBSClosure.depth + 1
+    ).where(WBSClosure.descendant_id == node.parent_id)
+    db.execute(insert(WBSClosure).from_select(
+        ['ancestor_id', 'descendant_id', 'depth'],
+        ancestors.union_all(select(literal(node.id, Integer), literal(node.id, Integer), literal(0, Integer)))
+    ))
+    return node
+
+def _subtree_ids(node_id):
+    """Select the IDs of a node and all of its descendants"""
+    return select(WBSClosure.descendant_id).where(WBSClosure.ancestor_id == node_id)
+
+def _delete_wbs_subtree(db, node_id):
+    """Delete a WBS node, its descendants and their closure rows, as part of the caller's transaction"""
+    subtree = [row[0] for row in db.execute(_subtree_ids(node_id)).all()]
+    db.query(WBSClosure).filter(
+        or_(WBSClosure.descendant_id.in_(subtree), WBSClosure.ancestor_id.in_(subtree))
+    ).delete(synchronize_session=False)
+    db.query(WBSNode).filter(WBSNode.id.in_(subtree)).delete(synchronize_session=False)
+
+def _move_wbs_node(db, node, parent_id):
+    """Move a WBS node and its subtree under a new parent (None for the top level)"""
+    # Detach the subtree from the old parent's ancestors
+    db.query(WBSClosure).filter(
+        WBSClosure.descendant_id.in_(_subtree_ids(node.id)),
+        WBSClosure.ancestor_id.notin_(_subtree_ids(node.id))
+    ).delete(synchronize_session=False)
+    
+    if parent_id is not None:
+        # Attach it below every ancestor of the new parent
+        above = aliased(WBSClosure)
+        below = aliased(WBSClosure)
+        db.execute(insert(WBSClosure).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1).join_from(
+                above, below, true()
+            ).where(
+                above.descendant_id == parent_id, below.ancestor_id == node.id
+            )
+        ))
+    node.parent_id = parent_id
+
+def _move_wbs_project(db, task_id, project_id):
+    """Move the WBS subtree of a task to the top level of the task's new project"""
+    node = db.query(WBSNode).filter(WBSNode.task_id == task_id).first()
+    if node is not None:
+        # Summary packages of the old project cannot hold it
+        if node.parent_id is not None:
+            _move_wbs_node(db, node, None)
+        db.query(WBSNode).filter(WBSNode.id.in_(_subtree_ids(node.id))).update(
+            {WBSNode.project_id: project_id}, synchronize_session=False
+        )
+
+def _is_summary_position(db, parent_id):
+    """Whether tasks can be placed below a node: at the top level or below work packages only"""
+    if parent_id is None:
+        return True
+    return not db.query(WBSNode.id).join(
+        WBSClosure, WBSClosure.ancestor_id == WBSNode.id
+    ).filter(
+        WBSClosure.descendant_id == parent_id,
+        or_(WBSNode.task_id.isnot(None), WBSNode.subtask_id.isnot(None))
+    ).first()
+
+def sync_wbs_nodes():
+    """Create the WBS nodes missing for existing tasks and subtasks"""
+    db = get_db_session()
+    try:
+        linked_tasks = select(WBSNode.task_id).where(WBSNode.task_id.isnot(None))
+        for task_id, project_id in db.query(Task.id, Task.project_id).filter(Task.id.notin_(linked_tasks)).all():
+            _add_wbs_node(db, WBSNode(project_id=project_id, task_id=task_id))
+        
+        task_nodes = dict(db.query(WBSNode.task_id, WBSNode.id).filter(WBSNode.task_id.isnot(None)).all())
+        linked_subtasks = select(WBSNode.subtask_id).where(WBSNode.subtask_id.isnot(None))
+        for subtask_id, parent_task_id in db.query(Subtask.id, Subtask.parent_task_id).filter(
+            Subtask.id.notin_(linked_subtasks)
+        ).all():
+            parent_node = db.get(WBSNode, task_nodes[parent_task_id]) if parent_task_id in task_nodes else None
+            if parent_node:
+                _add_wbs_node(db, WBSNode(project_id=parent_node.project_id, parent_id=parent_node.id, subtask_id=subtask_id))
+        
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def _wbs_node_columns():
+    """Columns of a WBS node, reading linked tasks and subtasks through to their rows"""
+    return (
+        WBSNode.id, WBSNode.project_id, WBSNode.parent_id, WBSNode.task_id, WBSNode.subtask_id,
+        func.coalesce(Subtask.name, Task.name, WBSNode.name).label('name'),
+        func.coalesce(Subtask.start_date, Task.start_date, WBSNode.start_date).label('start_date'),
+        func.coalesce(Subtask.end_date, Task.end_date, WBSNode.end_date).label('end_date'),
+        func.coalesce(Subtask.progress, Task.progress, WBSNode.progress, 0).label('progress')
+    )
+
+def _wbs_query(db, *extra_columns):
+    return db.query(*_wbs_node_columns(), *extra_columns).outerjoin(
+        Task, Task.id == WBSNode.task_id
+    ).outerjoin(
+        Subtask, Subtask.id == WBSNode.subtask_id
+    )
+
+def get_project_wbs(project_id):
+    """
+    Get the WBS nodes of a project.
+    
+    Returns:
+        List of node dictionaries with their depth, ordered by depth and ID
+    """
+    db = get_db_session()
+    try:
+        # A node's depth is its longest closure path, which ends at its top-level ancestor
+        depth = select(func.max(WBSClosure.depth)).where(
+            WBSClosure.descendant_id == WBSNode.id
+        ).scalar_subquery().label('depth')
+        rows = _wbs_query(db, depth).filter(WBSNode.project_id == project_id).order_by(depth, WBSNode.id).all()
+        return [row._asdict() for row in rows]
+    finally:
+        db.close()
+
+def get_wbs_node(node_id):
+    db = get_db_session()
+    try:
+        row = _wbs_query(db).filter(WBSNode.id == node_id).first()
+        return row._asdict() if row else None
+    finally:
+        db.close()
+
+def get_wbs_node_for(task_id=None, subtask_id=None):
+    """Get the WBS node linked to a task or subtask"""
+    db = get_db_session()
+    try:
+        query = _wbs_query(db)
+        if subtask_id is not None:
+            query = query.filter(WBSNode.subtask_id == subtask_id)
+        else:
+            query = query.filter(WBSNode.task_id == task_id)
+        row = query.first()
+        return row._asdict() if row else None
+    finally:
+        db.close()
+
+def get_wbs_descendants(node_id, include_self=False):
+    """
+    Get all descendants of a WBS node.
+    
+    Returns:
+        List of node dictionaries with their depth below the node, ordered by depth and ID
+    """
+    db = get_db_session()
+    try:
+        query = _wbs_query(db, WBSClosure.depth).join(
+            WBSClosure, WBSClosure.descendant_id == WBSNode.id
+        ).filter(WBSClosure.ancestor_id == node_id)
+        if not include_self:
+            query = query.filter(WBSClosure.depth > 0)
+        return [row._asdict() for row in query.order_by(WBSClosure.depth, WBSNode.id).all()]
+    finally:
+        db.close()
+
+def get_wbs_ancestors(node_id):
+    """Get the ancestors of a WBS node, from the top level down to its parent"""
+    db = get_db_session()
+    try:
+        rows = _wbs_query(db).join(
+            WBSClosure, WBSClosure.ancestor_id == WBSNode.id
+        ).filter(
+            WBSClosure.descendant_id == node_id, WBSClosure.depth > 0
+        ).order_by(WBSClosure.depth.desc()).all()
+        return [row._asdict() for row in rows]
+    finally:
+        db.close()
+
+def get_wbs_rollup(node_id):
+    """
+    Roll up the subtree below a WBS node.
+    
+    Returns:
+        Dictionary with the number of leaves, their average progress, and the
+        earliest start and latest end date within the subtree
+    """
+    db = get_db_session()
+    try:
+        child = aliased(WBSClosure)
+        is_leaf = ~exists().where(child.ancestor_id == WBSNode.id, child.depth == 1)
+        columns = _wbs_node_columns()
+        progress, start_date, end_date = columns[-1], columns[-3], columns[-2]
+        row = db.query(
+            func.count(case((is_leaf, 1))).label('leaf_count'),
+            func.avg(case((is_leaf, progress))).label('progress'),
+            func.min(start_date).label('start_date'),
+            func.max(end_date).label('end_date')
+        ).select_from(WBSClosure).join(
+            WBSNode, WBSNode.id == WBSClosure.descendant_id
+        ).outerjoin(
+            Task, Task.id == WBSNode.task_id
+        ).outerjoin(
+            Subtask, Subtask.id == WBSNode.subtask_id
+        ).filter(WBSClosure.ancestor_id == node_id).first()
+        
+        result = row._asdict()
+        result['progress'] = float(result['progress'] or 0)
+        return result
+    finally:
+        db.close()
+
+def create_wbs_node(node_data):
+    """
+    Create a work package in a project's WBS.
+    
+    Args:
+        node_data: Dictionary of node fields; parent_id places it below another node
+        
+    Returns:
+        The created node as a dictionary
+        
+    Raises:
+        ValueError: If the parent node does not belong to the same project
+    """
+    db = get_db_session()
+    try:
+        node = WBSNode(**node_data)
+        if node.parent_id is not None:
+            parent = db.get(WBSNode, node.parent_id)
+            if not parent or parent.project_id != node.project_id:
+                raise ValueError("Parent node not found in this project")
+        _add_wbs_node(db, node)
+        db.commit()
+        return model_to_dict(node)
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def update_wbs_node(node_id, node_data):
+    """Update the fields of a work package; linked task and subtask nodes are edited through their rows"""
+    db = get_db_session()
+    try:
+        node = db.get(WBSNode, node_id)
+        if not node:
+            return None
+        
+        for key, value in node_data.items():
+            if hasattr(node, key) and key not in ('id', 'parent_id', 'project_id', 'task_id', 'subtask_id'):
+                setattr(node, key, value)
+        
+        db.commit()
+        return model_to_dict(node)
+    finally:
+        db.close()
+
+def move_wbs_node(node_id, parent_id):
+    """
+    Move a work package or task and its subtree below another node of the same project.
+    
+    Tasks, and work packages containing tasks, can only be placed at the top
+    level or below summary work packages. Subtask nodes follow their parent
+    task and cannot be moved.
+    
+    Args:
+        node_id: The ID of the node to move
+        parent_id: The ID of the new parent node, or None for the top level
+        
+    Returns:
+        True if the node was moved, False if the move is not allowed
+    """
+    db = get_db_session()
+    try:
+        node = db.get(WBSNode, node_id)
+        if not node or node.subtask_id is not None:
+            return False
+        if parent_id is not None:
+            parent = db.get(WBSNode, parent_id)
+            if not parent or node.project_id != parent.project_id:
+                return False
+            # A node cannot move into its own subtree
+            if db.query(WBSClosure).filter(
+                WBSClosure.ancestor_id == node_id, WBSClosure.descendant_id == parent_id
+            ).first():
+                return False
+        
+        holds_tasks = db.query(WBSNode.id).join(
+            WBSClosure, WBSClosure.descendant_id == WBSNode.id
+        ).filter(
+            WBSClosure.ancestor_id == node_id, WBSNode.task_id.isnot(None)
+        ).first()
+        if holds_tasks and not _is_summary_position(db, parent_id):
+            return False
+        
+        _move_wbs_node(db, node, parent_id)
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def delete_wbs_node(node_id):
+    """Delete a work package and its subtree; task and subtask nodes are deleted with their rows"""
+    db = get_db_session()
+    try:
+        node = db.get(WBSNode, node_id)
+        if not node or node.task_id is not None or node.subtask_id is not None:
+            return False
+        if db.query(WBSNode.id).join(
+            WBSClosure, WBSClosure.descendant_id == WBSNode.id
+        ).filter(
+            WBSClosure.ancestor_id == node_id,
+            or_(WBSNode.task_id.isnot(None), WBSNode.subtask_id.isnot(None))
+        ).first():
+            return False
+        
+        _delete_wbs_subtree(db, node_id)
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+def get_project_task_plan(project_id):
+    """
+    Get the planned dates and progress of a project's tasks.
+    
+    Returns:
+        List of (id, start_date, end_date, progress) tuples
+    """
+    db = get_db_session()
+    try:
+        return [
+            tuple(row) for row in db.query(Task.id, Task.start_date, Task.end_date, Task.progress).filter(
+                Task.project_id == project_id
+            ).all()
+        ]
+    finally:
+        db.close()
+
+def create_schedule_baseline(baseline_data):
+    """Save a baseline; a baseline saved as current replaces the project's current baseline"""
+    db = get_db_session()
+    try:
+        baseline = ScheduleBaseline(**baseline_data)
+        if baseline.is_current:
+            db.query(ScheduleBaseline).filter(
+                ScheduleBaseline.project_id == baseline.project_id
+            ).update({ScheduleBaseline.is_current: False}, synchronize_session=False)
+        db.add(baseline)
+        db.commit()
+        return model_to_dict(baseline, exclude=('data',))
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def get_project_baselines(project_id):
+    """Get the baselines of a project without their data, newest first"""
+    db = get_db_session()
+    try:
+        baselines = db.query(ScheduleBaseline).options(defer(ScheduleBaseline.data)).filter(
+            ScheduleBaseline.project_id == project_id
+        ).order_by(ScheduleBaseline.id.desc()).all()
+        return [model_to_dict(baseline, exclude=('data',)) for baseline in baselines]
+    finally:
+        db.close()
+
+def get_schedule_baseline(baseline_id):
+    """Get a baseline including its data"""
+    db = get_db_session()
+    try:
+        baseline = db.query(ScheduleBaseline).filter(ScheduleBaseline.id == baseline_id).first()
+        return model_to_dict(baseline) if baseline else None
+    finally:
+        db.close()
+
+def set_current_baseline(baseline_id):
+    db = get_db_session()
+    try:
+        baseline = db.query(ScheduleBaseline).filter(ScheduleBaseline.id == baseline_id).first()
+        if not baseline:
+            return False
+        
+        # One statement, so the flag is set even when the baseline was already current
+        db.query(ScheduleBaseline).filter(
+            ScheduleBaseline.project_id == baseline.project_id
+        ).update(
+            {ScheduleBaseline.is_current: case((ScheduleBaseline.id == baseline_id, True), else_=False)},
+            synchronize_session=False
+        )
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+def delete_schedule_baseline(baseline_id):
+    db = get_db_session()
+    try:
+        baseline = db.query(ScheduleBaseline).filter(ScheduleBaseline.id == baseline_id).first()
+        if not baseline:
+            return False
+        
+        db.delete(baseline)
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+def record_progress_snapshots(day):
+    """
+    Record the progress and status of every task for a day, writing only what changed.
+    
+    Args:
+        day: The day of the snapshot, as 'YYYY-MM-DD'
+        
+    Returns:
+        The number of snapshot rows written
+    """
+    db = get_db_session()
+    try:
+        latest_ids = db.query(func.max(ProgressSnapshot.id)).group_by(ProgressSnapshot.task_id)
+        latest = {
+            row.task_id: row
+            for row in db.query(ProgressSnapshot).filter(ProgressSnapshot.id.in_(latest_ids)).all()
+        }
+        
+        written = 0
+        current = db.query(Task.id, Task.project_id, Task.progress, Task.status).all()
+        changes = [(row.id, row.project_id, row.progress or 0, row.status) for row in current]
+        
+        # Tasks deleted since their last snapshot end their history
+        current_ids = set(row.id for row in current)
+        changes.extend(
+            (task_id, row.project_id, None, 'Deleted')
+            for task_id, row in latest.items()
+            if task_id not in current_ids and row.status != 'Deleted'
+        )
+        
+        for task_id, project_id, progress, status in changes:
+            previous = latest.get(task_id)
+            if previous and previous.progress == progress and previous.status == status \
+                    and previous.project_id == project_id:
+                continue
+            moved = previous is not None and previous.project_id != project_id
+            if moved:
+                # A task moved to another project ends its history in the old one
+                closing = previous if previous.day == day else ProgressSnapshot(
+                    project_id=previous.project_id, task_id=task_id, day=day
+                )
+                closing.progress = None
+                closing.status = 'Moved'
+                db.add(closing)
+                written += 1
+            if previous and previous.day == day and not moved:
+                # A day holds one value per task, so a second change that day replaces the first
+                previous.progress = progress
+                previous.status = status
+            else:
+                db.add(ProgressSnapshot(
+                    project_id=project_id, task_id=task_id, day=day, progress=progress, status=status
+                ))
+            written += 1
+        
+        db.commit()
+        return written
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def get_project_progress_snapshots(project_id):
+    """
+    Get the progress history of a project's tasks.
+    
+    Args:
+        project_id: The ID of the project
+        
+    Returns:
+        List of dictionaries with task_id, day, progress and status, ordered by task and day
+    """
+    db = get_db_session()
+    try:
+        rows = db.query(
+            ProgressSnapshot.task_id, ProgressSnapshot.day, ProgressSnapshot.progress, ProgressSnapshot.status
+        ).filter(
+            ProgressSnapshot.project_id == project_id
+        ).order_by(ProgressSnapshot.task_id, ProgressSnapshot.day).all()
+        return [row._asdict() for row in rows]
+    finally:
+        db.close()
+
+def get_project_cost_entries(project_id):
+    """Get the cost entries of a project, oldest first"""
+    db = get_db_session()
+    try:
+        entries = db.query(CostEntry).filter(
+            CostEntry.project_id == project_id
+        ).order_by(CostEntry.entry_date, CostEntry.id).all()
+        return [model_to_dict(entry) for entry in entries]
+    finally:
+        db.close()
+
+def create_cost_entry(cost_data, versions=None):
+    db = get_db_session()
+    try:
+        entry = CostEntry(**cost_data)
+        db.add(entry)
+        _bump_progress_version(db, entry.project_id)
+        db.commit()
+        report_versions(db, versions)
+        return model_to_dict(entry)
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def delete_cost_entry(cost_entry_id, versions=None):
+    db = get_db_session()
+    try:
+        entry = db.query(CostEntry).filter(CostEntry.id == cost_entry_id).first()
+        if not entry:
+            return False
+        
+        _bump_progress_version(db, entry.project_id)
+        db.delete(entry)
+        db.commit()
+        report_versions(db, versions)
+        return True
+    finally:
+        db.close()
+
+def get_completed_meetings_for_task(task_id):
+    """Get all completed meetings that discuss a specific task"""
     db = get_db_session()
     try:
         # We need to find meetings related to this task
@@ -793,6 +2394,14 @@ def get_completed_meetings_for_task(task_id):
             Meeting.status == 'Completed'
         ).all()
         
+        # Action item descriptions per meeting
+        meeting_action_items = {}
+        action_items = db.query(ActionItem.meeting_id, ActionItem.description).filter(
+            ActionItem.project_id == task.project_id
+        ).all()
+        for meeting_id, description in action_items:
+            meeting_action_items.setdefault(meeting_id, []).append(description or '')
+        
         # Convert to dict for manipulation and analysis
         meetings_list = [model_to_dict(meeting) for meeting in project_meetings]
         
@@ -809,17 +2418,280 @@ def get_completed_meetings_for_task(task_id):
                 continue
                 
             # Check if task is mentioned in action items
-            action_items = meeting.get('action_items', [])
-            for item in action_items:
-                if isinstance(item, dict) and 'description' in item:
-                    if task_name in item['description'].lower():
-                        relevant_meetings.append(meeting)
-                        break
+            for description in meeting_action_items.get(meeting['id'], []):
+                if task_name in description.lower():
+                    relevant_meetings.append(meeting)
+                    break
         
         return relevant_meetings
     finally:
         db.close()
 
+def get_notification_recipients(user_ids=(), member_ids=()):
+    """
+    Get the contact details of users and team members to notify.
+    
+    Returns:
+        List of dictionaries with recipient_type, recipient_id, name, email and phone
+    """
+    db = get_db_session()
+    try:
+        recipients = []
+        if user_ids:
+            for user in db.query(User.id, User.name, User.email).filter(User.id.in_(list(user_ids))):
+                recipients.append({
+                    'recipient_type': 'user', 'recipient_id': user.id, 'name': user.name,
+                    'email': user.email, 'phone': None
+                })
+        if member_ids:
+            members = db.query(
+                TeamMember.id, TeamMember.name, TeamMember.contact_email, TeamMember.contact_phone
+            ).filter(TeamMember.id.in_(list(member_ids)))
+            for member in members:
+                recipients.append({
+                    'recipient_type': 'team_member', 'recipient_id': member.id, 'name': member.name,
+                    'email': member.contact_email, 'phone': member.contact_phone
+                })
+        return recipients
+    finally:
+        db.close()
+
+def add_notifications(db, notifications):
+    """
+    Queue notifications in the outbox, as part of the caller's transaction.
+    
+    Args:
+        db: The session of the transaction making the change being reported
+        notifications: List of notification dictionaries, each with an idempotency_key
+    
+    Returns:
+        The number of notifications queued; those whose key is already queued are skipped
+    """
+    notifications = list({n['idempotency_key']: n for n in notifications}.values())
+    if not notifications:
+        return 0
+    
+    existing = {
+        key for (key,) in db.query(Notification.idempotency_key).filter(
+            Notification.idempotency_key.in_([n['idempotency_key'] for n in notifications])
+        )
+    }
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    new = [
+        Notification(**{'status': 'Pending', 'attempts': 0, 'created_at': now, 'next_attempt_at': now, **n})
+        for n in notifications if n['idempotency_key'] not in existing
+    ]
+    db.add_all(new)
+    return len(new)
+
+def coalesce_notifications(cutoff, format_digest, sample_size=20, batch_size=1000):
+    """
+    Replace the queued notifications of each recipient and channel with one
+    digest notification, for recipients whose oldest queued notification is
+    due.
+    
+    Due recipients are found with a single grouped query over the pending
+    queue. Digests are then written batch_size recipients per transaction:
+    only the first sample_size notifications of each recipient in the batch
+    are read, the digests are inserted together and the replaced
+    notifications are marked with one batched update.
+    
+    Args:
+        cutoff: Time as 'YYYY-MM-DD HH:MM:SS'; recipients with a notification queued at or before it are due
+        format_digest: Function taking (count, sample notification dictionaries) and returning (subject, body)
+        sample_size: Number of notifications read per digest
+        batch_size: Number of digests written per transaction
+    
+    Returns:
+        The number of digests written
+    """
+    db = get_db_session()
+    try:
+        queued = and_(
+            Notification.status == 'Pending',
+            Notification.attempts == 0,
+            Notification.event_type != 'digest'
+        )
+        recipient = (Notification.recipient_type, Notification.recipient_id, Notification.channel)
+        groups = db.query(
+            *recipient,
+            func.count(Notification.id).label('count'),
+            func.min(Notification.id).label('first_id'),
+            func.max(Notification.id).label('last_id'),
+            func.max(Notification.address).label('address')
+        ).filter(queued).group_by(*recipient).having(
+            func.count(Notification.id) > 1,
+            func.min(Notification.created_at) <= cutoff
+        ).order_by(func.min(Notification.id)).all()
+        db.rollback()
+        
+        table = Notification.__table__
+        mark_digested = update(table).where(
+            table.c.status == 'Pending',
+            table.c.attempts == 0,
+            table.c.event_type != 'digest',
+            table.c.recipient_type == bindparam('group_type'),
+            table.c.recipient_id == bindparam('group_id'),
+            table.c.channel == bindparam('group_channel'),
+            table.c.id.between(bindparam('group_first'), bindparam('group_last'))
+        ).values(status='Digested', digest_id=bindparam('group_digest'))
+        
+        for start in range(0, len(groups), batch_size):
+            due = {(g.recipient_type, g.recipient_id, g.channel): g for g in groups[start:start + batch_size]}
+            
+            # The first few notifications of each recipient in the batch, numbered within the group
+            numbered = db.query(
+                *recipient, Notification.id, Notification.event_type, Notification.subject, Notification.created_at,
+                func.row_number().over(partition_by=recipient, order_by=Notification.id).label('position')
+            ).filter(
+                queued,
+                Notification.recipient_id.in_({key[1] for key in due}),
+                Notification.id <= max(g.last_id for g in due.values())
+            ).subquery()
+            samples = {}
+            rows = db.execute(select(
+                numbered.c.recipient_type, numbered.c.recipient_id, numbered.c.channel, numbered.c.id,
+                numbered.c.event_type, numbered.c.subject, numbered.c.created_at
+            ).where(numbered.c.position <= sample_size).order_by(numbered.c.id)).all()
+            for recipient_type, recipient_id, channel, notification_id, event_type, subject, created_at in rows:
+                key = (recipient_type, recipient_id, channel)
+                group = due.get(key)
+                if group is not None and notification_id <= group.last_id:
+                    samples.setdefault(key, []).append({
+                        'id': notification_id, 'event_type': event_type, 'subject': subject, 'created_at': created_at
+                    })
+            
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            digests = []
+            for key, group in due.items():
+                subject, body = format_digest(group.count, samples.get(key, []))
+                digests.append({
+                    'idempotency_key': f"digest:{key[0]}:{key[1]}:{key[2]}:{group.first_id}-{group.last_id}",
+                    'event_type': 'digest',
+                    'recipient_type': key[0],
+                    'recipient_id': key[1],
+                    'channel': key[2],
+                    'address': group.address,
+                    'subject': subject,
+                    'body': body,
+                    'payload': {'count': group.count, 'first_id': group.first_id, 'last_id': group.last_id},
+                    'status': 'Pending',
+                    'attempts': 0,
+                    'created_at': now,
+                    'next_attempt_at': now
+                })
+            
+            connection = db.connection()
+            connection.execute(insert(table), digests)
+            digest_ids = dict(db.query(Notification.idempotency_key, Notification.id).filter(
+                Notification.idempotency_key.in_([digest['idempotency_key'] for digest in digests])
+            ).all())
+            connection.execute(mark_digested, [
+                {
+                    'group_type': key[0], 'group_id': key[1], 'group_channel': key[2],
+                    'group_first': group.first_id, 'group_last': group.last_id,
+                    'group_digest': digest_ids[digest['idempotency_key']]
+                }
+                for (key, group), digest in zip(due.items(), digests)
+            ])
+            db.commit()
+        
+        return len(groups)
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def claim_notifications(limit, lease_seconds):
+    """
+    Claim a batch of notifications that are due to be sent.
+    
+    Notifications left in Sending by a dispatcher that stopped are claimed
+    again once their lease has expired.
+    
+    Args:
+        limit: Maximum number of notifications to claim
+        lease_seconds: How long a claim lasts before the notification can be claimed again
+    
+    Returns:
+        List of the claimed notification dictionaries, oldest first
+    """
+    db = get_db_session()
+    try:
+        now = datetime.now()
+        now_text = now.strftime('%Y-%m-%d %H:%M:%S')
+        expired = (now - timedelta(seconds=lease_seconds)).strftime('%Y-%m-%d %H:%M:%S')
+        notifications = db.query(Notification).filter(or_(
+            (Notification.status == 'Pending') & (Notification.next_attempt_at <= now_text),
+            (Notification.status == 'Sending') & (Notification.claimed_at <= expired)
+        )).order_by(Notification.id).limit(limit).with_for_update(skip_locked=True).all()
+        
+        if notifications:
+            db.query(Notification).filter(Notification.id.in_([n.id for n in notifications])).update(
+                {Notification.status: 'Sending', Notification.claimed_at: now_text},
+                synchronize_session=False
+            )
+        claimed = [model_to_dict(n) for n in notifications]
+        db.commit()
+        return claimed
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def complete_notifications(sent_ids, failures=None):
+    """
+    Record the outcome of sending claimed notifications.
+    
+    Args:
+        sent_ids: IDs of the notifications that were sent
+        failures: Optional list of (ID, error, next attempt time or None to give up) tuples
+    """
+    db = get_db_session()
+    try:
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if sent_ids:
+            db.query(Notification).filter(Notification.id.in_(list(sent_ids))).update({
+                Notification.status: 'Sent',
+                Notification.sent_at: now,
+                Notification.attempts: func.coalesce(Notification.attempts, 0) + 1,
+                Notification.claimed_at: None
+            }, synchronize_session=False)
+        if failures:
+            db.execute(update(Notification), [
+                {
+                    'id': notification_id,
+                    'status': 'Pending' if next_attempt_at else 'Failed',
+                    'next_attempt_at': next_attempt_at,
+                    'last_error': error,
+                    'claimed_at': None
+                }
+                for notification_id, error, next_attempt_at in failures
+            ])
+            db.query(Notification).filter(Notification.id.in_([f[0] for f in failures])).update(
+                {Notification.attempts: func.coalesce(Notification.attempts, 0) + 1},
+                synchronize_session=False
+            )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def get_notifications(status=None, limit=100):
+    """Get the most recent notifications, optionally with a given status"""
+    db = get_db_session()
+    try:
+        query = db.query(Notification)
+        if status:
+            query = query.filter(Notification.status == status)
+        return [model_to_dict(n) for n in query.order_by(Notification.id.desc()).limit(limit)]
+    finally:
+        db.close()
+
 if __name__ == "__main__":
     # Create database tables and migrate data when this module is run directly
     migrate_json_to_db()
@@ -0,0 +1,137 @@
+"""
+Module for binary deltas between two versions of a file.
+
+A delta is a list of operations that rebuild the target from the source:
+COPY a range of the source, or INSERT literal bytes. Unchanged ranges are
+found by indexing fixed-size blocks of the source, so a delta grows with the
+size of the changes rather than the size of the file. The operation stream
+is zlib-compressed.
+"""
+
+import zlib
+import struct
+
+DELTA_MAGIC = b"DLT1"
+BLOCK_SIZE = 64
+
+OP_COPY = b"C"
+OP_INSERT = b"I"
+
+def _common_prefix_length(a, b, a_start=0, b_start=0, limit=None):
+    """Length of the common prefix of a[a_start:] and b[b_start:], by binary search on slices"""
+    low = 0
+    high = min(len(a) - a_start, len(b) - b_start)
+    if limit is not None:
+        high = min(high, limit)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[a_start:a_start + mid] == b[b_start:b_start + mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+def _common_suffix_length(a, b, limit):
+    """Length of the common suffix of a and b, at most limit bytes"""
+    low = 0
+    high = min(len(a), len(b), limit)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+def encode_delta(source, target):
+    """
+    Encode target as a delta against source.
+
+    Args:
+        source: The previous version as bytes
+        target: The new version as bytes
+
+    Returns:
+        The delta as bytes
+    """
+    ops = []
+
+    def emit_copy(offset, length):
+        if length:
+            ops.append(OP_COPY + struct.pack(">QQ", offset, length))
+
+    def emit_insert(data):
+        if data:
+            ops.append(OP_INSERT + struct.pack(">Q", len(data)) + data)
+
+    # Unchanged head and tail are the common case for revised documents
+    prefix = _common_prefix_length(source, target)
+    suffix = _common_suffix_length(source, target, min(len(source), len(target)) - prefix)
+    emit_copy(0, prefix)
+
+    target_end = len(target) - suffix
+
+    # Index the source by aligned blocks
+    block_index = {}
+    for offset in range(0, len(source) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        block_index.setdefault(source[offset:offset + BLOCK_SIZE], offset)
+
+    position = prefix
+    literal_start = prefix
+    while position + BLOCK_SIZE <= target_end:
+        source_offset = block_index.get(target[position:position + BLOCK_SIZE])
+        if source_offset is None:
+            position += 1
+            continue
+
+        # Extend the match forwards, without running into the shared suffix
+        length = _common_prefix_length(source, target, source_offset, position, target_end - position)
+
+        # Extend the match backwards into pending literal bytes
+        back = 0
+        while (back < position - literal_start and back < source_offset and
+               source[source_offset - back - 1] == target[position - back - 1]):
+            back += 1
+
+        emit_insert(target[literal_start:position - back])
+        emit_copy(source_offset - back, length + back)
+        position += length
+        literal_start = position
+
+    emit_insert(target[literal_start:target_end])
+    emit_copy(len(source) - suffix, suffix)
+
+    return DELTA_MAGIC + zlib.compress(b"".join(ops))
+
+def apply_delta(source, delta):
+    """
+    Rebuild the target of a delta from its source.
+
+    Args:
+        source: The version the delta was encoded against, as bytes
+        delta: The delta produced by encode_delta
+
+    Returns:
+        The target version as bytes
+    """
+    if not delta.startswith(DELTA_MAGIC):
+        raise ValueError("Not a delta produced by encode_delta")
+
+    stream = zlib.decompress(delta[len(DELTA_MAGIC):])
+    parts = []
+    position = 0
+    while position < len(stream):
+        op = stream[position:position + 1]
+        if op == OP_COPY:
+            offset, length = struct.unpack_from(">QQ", stream, position + 1)
+            parts.append(source[offset:offset + length])
+            position += 17
+        elif op == OP_INSERT:
+            (length,) = struct.unpack_from(">Q", stream, position + 1)
+            start = position + 9
+            parts.append(stream[start:start + length])
+            position = start + length
+        else:
+            raise ValueError(f"Unknown delta operation {op!r}")
+
+    return b"".join(parts)
@@ -0,0 +1,180 @@
+"""
+Module for keeping task dependencies acyclic as they are edited.
+
+Each project's dependency graph is kept in memory together with a topological
+order of its tasks, maintained with the Pearce-Kelly online algorithm. A new
+dependency that agrees with the current order is accepted at once; otherwise
+only the tasks positioned between its two ends are searched and reordered, so
+an edit costs far less than checking the whole graph. When the search reaches
+the task the edge starts from, the dependency would close a cycle and the path
+found is reported.
+
+Graphs are cached per project and keyed by Project.schedule_version. Edits
+made through data_management keep the cached graph current; any other change
+to the project's tasks makes it rebuild on next use.
+"""
+
+import threading
+
+from utils.database import get_project_tasks, get_project_schedule_version
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+class DependencyGraph:
+    """Dependency edges of a project's tasks with an online topological order"""
+
+    def __init__(self):
+        self.successors = {}
+        self.predecessors = {}
+        self.order = {}
+        self._next_position = 0
+
+    @classmethod
+    def from_tasks(cls, tasks):
+        graph = cls()
+        for task in tasks:
+            graph.add_task(task['id'])
+        for task in tasks:
+            for dep_id in task.get('dependencies') or []:
+                if dep_id in graph.order:
+                    # Stored dependencies may already contain a cycle; keep the acyclic part
+                    graph.add_edge(dep_id, task['id'])
+        return graph
+
+    def add_task(self, task_id):
+        if task_id not in self.order:
+            self.successors[task_id] = set()
+            self.predecessors[task_id] = set()
+            self.order[task_id] = self._next_position
+            self._next_position += 1
+
+    def remove_edge(self, pred, succ):
+        self.successors[pred].discard(succ)
+        self.predecessors[succ].discard(pred)
+
+    def add_edge(self, pred, succ):
+        """
+        Add the dependency edge pred -> succ (succ depends on pred).
+
+        Returns:
+            None if the edge was added, otherwise the cycle it would close as a
+            list of task IDs from succ back to succ, each depending on the one before
+        """
+        if succ in self.successors[pred]:
+            return None
+        if pred == succ:
+            return [succ, succ]
+
+        lower, upper = self.order[succ], self.order[pred]
+        if lower < upper:
+            # Search forwards from succ among tasks ordered no later than pred
+            parents = {succ: None}
+            stack = [succ]
+            while stack:
+                node = stack.pop()
+                for next_node in self.successors[node]:
+                    if next_node == pred:
+                        path = [pred, node]
+                        while parents[node] is not None:
+                            node = parents[node]
+                            path.append(node)
+                        return list(reversed(path)) + [succ]
+                    if next_node not in parents and self.order[next_node] < upper:
+                        parents[next_node] = node
+                        stack.append(next_node)
+            forward = list(parents)
+
+            # Search backwards from pred among tasks ordered no earlier than succ
+            backward = {pred}
+            stack = [pred]
+            while stack:
+                node = stack.pop()
+                for prev_node in self.predecessors[node]:
+                    if prev_node not in backward and self.order[prev_node] > lower:
+                        backward.add(prev_node)
+                        stack.append(prev_node)
+
+            # Reuse the affected positions: everything behind pred, then everything ahead of succ
+            moved = sorted(backward, key=self.order.get) + sorted(forward, key=self.order.get)
+            positions = sorted(self.order[node] for node in moved)
+            for node, position in zip(moved, positions):
+                self.order[node] = position
+
+        self.successors[pred].add(succ)
+        self.predecessors[succ].add(pred)
+        return None
+
+    def set_dependencies(self, task_id, dependencies):
+        """
+        Replace the dependencies of a task, leaving the graph unchanged if they would form a cycle.
+
+        Returns:
+            None if the dependencies were applied, otherwise the cycle found
+        """
+        self.add_task(task_id)
+        wanted = set(dep_id for dep_id in dependencies if dep_id in self.order)
+        current = set(self.predecessors[task_id])
+
+        for dep_id in current - wanted:
+            self.remove_edge(dep_id, task_id)
+
+        added = []
+        for dep_id in wanted - current:
+            cycle = self.add_edge(dep_id, task_id)
+            if cycle:
+                for added_id in added:
+                    self.remove_edge(added_id, task_id)
+                # The original graph was acyclic, so restoring its edges always succeeds
+                for dep_id in current - wanted:
+                    self.add_edge(dep_id, task_id)
+                return cycle
+            added.append(dep_id)
+        return None
+
+def _get_graph(project_id):
+    """Get the cached graph of a project, rebuilding it if the tasks changed elsewhere"""
+    version = get_project_schedule_version(project_id)
+    cached = _graphs.get(project_id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    graph = DependencyGraph.from_tasks(get_project_tasks(project_id))
+    _graphs[project_id] = (version, graph)
+    return graph
+
+def find_dependency_cycle(project_id, task_id, dependencies):
+    """
+    Check whether giving a task these dependencies would create a cycle.
+
+    Args:
+        project_id: The ID of the task's project
+        task_id: The ID of the task
+        dependencies: The proposed list of task IDs it depends on
+
+    Returns:
+        None if the dependencies are acyclic, otherwise the cycle as a list of
+        task IDs, each depending on the one before, starting and ending with task_id
+    """
+    with _graphs_lock:
+        graph = _get_graph(project_id)
+        previous = list(graph.predecessors.get(task_id, ()))
+        cycle = graph.set_dependencies(task_id, dependencies)
+        if cycle is None:
+            graph.set_dependencies(task_id, previous)
+        return cycle
+
+def record_task_dependencies(project_id, task_id, dependencies):
+    """Apply the saved dependencies of a task to the cached graph of its project"""
+    with _graphs_lock:
+        cached = _graphs.get(project_id)
+        if not cached:
+            return
+
+        # The save bumps the version at most once; anything more means other
+        # changes the cached graph has not seen
+        version = get_project_schedule_version(project_id)
+        if version - cached[0] > 1 or cached[1].set_dependencies(task_id, dependencies):
+            del _graphs[project_id]
+            return
+        _graphs[project_id] = (version, cached[1])
@@ -0,0 +1,141 @@
+"""
+Module for storing document files on disk and reading them back lazily.
+
+Files are stored once per content hash, so the database only keeps a small
+reference to each file and pages read file content only when it is needed.
+"""
+
+import os
+import io
+import uuid
+import codecs
+import hashlib
+import functools
+from pathlib import Path
+
+# Root directory for stored document files
+STORAGE_DIR = Path(os.getenv("DOCUMENT_STORAGE_DIR", "data/documents"))
+
+# Only this many bytes are read to build a text preview
+PREVIEW_BYTES = 16 * 1024
+
+# Uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def get_content_path(content_hash):
+    """Get the path of the stored file for a content hash"""
+    return STORAGE_DIR / content_hash[:2] / content_hash
+
+def document_content_exists(content_hash):
+    """Check whether the file for a content hash is stored"""
+    return bool(content_hash) and get_content_path(content_hash).exists()
+
+def store_document_stream(file_obj, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Store file content read from a file-like object and return its storage reference.
+    
+    The content is spooled to a temporary file chunk by chunk while its hash is
+    computed, so the whole file never has to be held in memory at once.
+    
+    Args:
+        file_obj: A binary file-like object positioned at the start of the content
+        chunk_size: Number of bytes to read per chunk
+        
+    Returns:
+        Dictionary with the content_hash and file_size of the stored file
+    """
+    temp_dir = STORAGE_DIR / "tmp"
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    temp_path = temp_dir / f"{uuid.uuid4().hex}.part"
+    
+    hasher = hashlib.sha256()
+    file_size = 0
+    
+    try:
+        with open(temp_path, "wb") as f:
+            while True:
+                chunk = file_obj.read(chunk_size)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                file_size += len(chunk)
+                f.write(chunk)
+        
+        content_hash = hasher.hexdigest()
+        path = get_content_path(content_hash)
+        
+        # Identical content is only stored once
+        if path.exists():
+            temp_path.unlink()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, path)
+    except Exception:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
+    
+    return {"content_hash": content_hash, "file_size": file_size}
+
+def store_document_content(content):
+    """
+    Store file content and return its storage reference.
+    
+    Args:
+        content: The file content as bytes
+        
+    Returns:
+        Dictionary with the content_hash and file_size of the stored file
+    """
+    return store_document_stream(io.BytesIO(content))
+
+def open_document_content(content_hash):
+    """Open the stored file for a content hash for binary reading"""
+    return open(get_content_path(content_hash), "rb")
+
+def read_document_content(content_hash):
+    """Read the whole stored file for a content hash"""
+    with open_document_content(content_hash) as f:
+        return f.read()
+
+def delete_document_content(content_hash):
+    """Remove the stored file for a content hash if it exists"""
+    path = get_content_path(content_hash)
+    if path.exists():
+        path.unlink()
+
+@functools.lru_cache(maxsize=256)
+def get_text_preview(content_hash, max_bytes=PREVIEW_BYTES):
+    """
+    Build a text preview from the beginning of a stored file.
+    
+    Stored files never change for a given hash, so previews are cached by hash.
+    
+    Args:
+        content_hash: The content hash of the stored file
+        max_bytes: Maximum number of bytes to read for the preview
+        
+    Returns:
+        Tuple of (preview text, truncated flag), or None for binary or missing files
+    """
+    if not document_content_exists(content_hash):
+        return None
+    
+    with open_document_content(content_hash) as f:
+        head = f.read(max_bytes + 1)
+    
+    truncated = len(head) > max_bytes
+    head = head[:max_bytes]
+    
+    # Null bytes almost never appear in text files
+    if b"\x00" in head:
+        return None
+    
+    # Decode incrementally so a multi-byte character cut off at the end is dropped
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        text = decoder.decode(head, final=not truncated)
+    except UnicodeDecodeError:
+        return None
+    
+    return text, truncated
@@ -0,0 +1,207 @@
+"""
+Module for document version history with delta storage.
+
+Each version is stored as a full file when it is uploaded, so an upload
+returns as soon as the file is spooled to disk. A background worker then
+encodes the version as a binary delta against the previous version and keeps
+the delta instead when it is smaller. The latest version always keeps its
+full file as well, so reading the current document never needs
+reconstruction; older versions are rebuilt on demand from the nearest full
+copy.
+"""
+
+import hashlib
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import IntegrityError
+
+from utils.database import (
+    get_document, update_document, get_document_versions, create_document_version,
+    set_document_version_storage, sync_document_versions, is_content_hash_referenced
+)
+from utils.document_store import (
+    store_document_stream, store_document_content, read_document_content,
+    delete_document_content, document_content_exists
+)
+from utils.delta import encode_delta, apply_delta
+from utils.text_extraction import submit_text_extraction
+
+# A full copy is stored after this many deltas in a row to bound reconstruction
+MAX_DELTA_CHAIN = 10
+
+# Encoding holds both versions in memory, so larger files stay full copies
+MAX_DELTA_FILE_SIZE = 32 * 1024 * 1024
+
+# Attempts at numbering a new version when other uploads take the number first
+MAX_VERSION_ATTEMPTS = 3
+
+# One worker, so the versions of a document are encoded in upload order
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="document-delta")
+
+def get_document_history(document_id):
+    """Get the versions of a document, oldest first"""
+    return get_document_versions(document_id)
+
+def add_document_version(document_id, file_obj, file_name, uploaded_by=None, change_note=None):
+    """
+    Store a new version of a document.
+
+    The version is stored as a full file and queued for delta encoding on
+    the background worker.
+
+    Args:
+        document_id: The ID of the document
+        file_obj: A binary file-like object with the new content
+        file_name: The original file name of the new version
+        uploaded_by: The ID of the uploading user
+        change_note: Optional description of what changed
+
+    Returns:
+        The new version, or None if the content is identical to the latest version
+    """
+    document = get_document(document_id)
+    if not document:
+        return None
+
+    stored_file = store_document_stream(file_obj)
+    now = datetime.datetime.now().strftime('%Y-%m-%d')
+    file_type = file_name.rsplit('.', 1)[-1].lower()
+
+    for attempt in range(MAX_VERSION_ATTEMPTS):
+        versions = get_document_versions(document_id)
+        if not versions and document.get('content_hash'):
+            # Documents uploaded before versioning get their first version now
+            sync_document_versions()
+            versions = get_document_versions(document_id)
+        latest = versions[-1] if versions else None
+        if latest and stored_file['content_hash'] == latest['content_hash']:
+            return None
+
+        version_number = latest['version_number'] + 1 if latest else 1
+        try:
+            version = create_document_version({
+                'document_id': document_id,
+                'version_number': version_number,
+                'content_hash': stored_file['content_hash'],
+                'file_size': stored_file['file_size'],
+                'storage_kind': 'full',
+                'stored_hash': stored_file['content_hash'],
+                'stored_size': stored_file['file_size'],
+                'file_path': file_name,
+                'uploaded_by': uploaded_by,
+                'upload_date': now,
+                'change_note': change_note
+            })
+            break
+        except IntegrityError:
+            # Another upload took this version number
+            if attempt == MAX_VERSION_ATTEMPTS - 1:
+                raise
+
+    # The document always points at the materialized latest version
+    update_document(document_id, {
+        'content_hash': stored_file['content_hash'],
+        'file_size': stored_file['file_size'],
+        'file_path': file_name,
+        'file_type': file_type,
+        'upload_date': now,
+        'current_version': version_number,
+        'text_status': 'Pending'
+    })
+
+    submit_text_extraction(document_id, stored_file['content_hash'], file_type)
+    if latest:
+        submit_delta_encoding(document_id, version_number)
+
+    return version
+
+def encode_document_version(document_id, version_number):
+    """
+    Store a fully stored version as a delta against the previous version when that is smaller.
+
+    Afterwards the full files of versions stored as deltas are deleted,
+    except for the latest version's.
+
+    Args:
+        document_id: The ID of the document
+        version_number: The version to encode
+
+    Returns:
+        True if the version is now stored as a delta
+    """
+    versions = get_document_versions(document_id)
+    by_number = {v['version_number']: v for v in versions}
+    target = by_number.get(version_number)
+    previous = by_number.get(version_number - 1)
+
+    encoded = False
+    if target and previous and target['storage_kind'] == 'full' and \
+            max(target['file_size'] or 0, previous['file_size'] or 0) <= MAX_DELTA_FILE_SIZE:
+        # Count the deltas since the last full copy
+        delta_chain = 0
+        for number in range(version_number - 1, 0, -1):
+            if by_number.get(number, {}).get('storage_kind') != 'delta':
+                break
+            delta_chain += 1
+
+        if delta_chain < MAX_DELTA_CHAIN:
+            new_content = read_document_content(target['content_hash'])
+            delta = encode_delta(get_document_version_content(document_id, previous['version_number']), new_content)
+            if len(delta) < len(new_content):
+                stored_delta = store_document_content(delta)
+                encoded = set_document_version_storage(target['id'], stored_delta['content_hash'], stored_delta['file_size'])
+                if encoded:
+                    target['storage_kind'] = 'delta'
+
+    # Superseded versions stored as deltas no longer need their full copies
+    for version in versions[:-1]:
+        if version['storage_kind'] == 'delta' and document_content_exists(version['content_hash']) and \
+                not is_content_hash_referenced(version['content_hash']):
+            delete_document_content(version['content_hash'])
+
+    return encoded
+
+def _run_delta_encoding(document_id, version_number):
+    try:
+        encode_document_version(document_id, version_number)
+    except Exception as e:
+        print(f"Error encoding version {version_number} of document {document_id}: {e}")
+
+def submit_delta_encoding(document_id, version_number):
+    """Queue the delta encoding of a document version on the background worker and return the future"""
+    return _executor.submit(_run_delta_encoding, document_id, version_number)
+
+def get_document_version_content(document_id, version_number):
+    """
+    Get the full content of a document version.
+
+    Args:
+        document_id: The ID of the document
+        version_number: The version to read
+
+    Returns:
+        The version content as bytes, or None if the version does not exist
+    """
+    versions = {v['version_number']: v for v in get_document_versions(document_id)}
+    target = versions.get(version_number)
+    if not target:
+        return None
+
+    # Walk back to the nearest version with a full copy
+    chain = []
+    version = target
+    while not document_content_exists(version['content_hash']):
+        if version['storage_kind'] != 'delta':
+            raise ValueError(f"Stored file for version {version['version_number']} is missing")
+        chain.append(version)
+        version = versions[version['version_number'] - 1]
+
+    content = read_document_content(version['content_hash'])
+    for version in reversed(chain):
+        content = apply_delta(content, read_document_content(version['stored_hash']))
+
+    if hashlib.sha256(content).hexdigest() != target['content_hash']:
+        raise ValueError(f"Reconstructed version {version_number} does not match its hash")
+
+    return content
@@ -0,0 +1,283 @@
+"""
+Module for earned value management (EVM) of projects and tasks.
+
+Each task's budget at completion (BAC) comes from Task.budget. When no task in
+a project has a budget, the project budget is spread over the tasks in
+proportion to their planned durations. The planned value (PV) of a task ramps
+linearly from nothing on its start date to its full budget on its end date,
+the earned value (EV) is its budget times its progress, and the actual cost
+(AC) is the sum of its cost entries. From these follow the schedule and cost
+variances (SV, CV), the performance indices (SPI, CPI) and the forecasts at
+completion (EAC, ETC, VAC).
+
+The time-phased PV series is built with difference arrays: each task adds its
+daily rate on its start day and removes it after its end day, one cumulative
+sum gives the planned spend per day and a second gives the cumulative PV. The
+AC series accumulates cost entries by day the same way.
+
+The budget model is cached per project and keyed by Project.schedule_version,
+which update_project also bumps when the project budget changes;
+progress and costs are cached separately, keyed by Project.progress_version.
+Changes made through data_management are applied to them in place when the
+cache was built at the version the change started from.
+"""
+
+import threading
+
+import numpy as np
+
+from utils.database import (
+    get_project, get_project_tasks, get_project_cost_entries, get_project_task_progress,
+    get_project_schedule_version, get_project_progress_version
+)
+
+_model_cache = {}
+_actuals_cache = {}
+_cache_lock = threading.Lock()
+
+def build_budget_model(tasks, project_budget=None):
+    """
+    Prepare the planned dates and budgets of a set of tasks.
+
+    Args:
+        tasks: List of task dictionaries
+        project_budget: Optional project budget, used when no task has a budget
+
+    Returns:
+        Dictionary with the task IDs, names, planned start and end day offsets,
+        the budget of each task, the project origin and the cumulative PV series
+    """
+    tasks = [task for task in tasks if task.get('start_date') and task.get('end_date')]
+    task_ids = [task['id'] for task in tasks]
+
+    planned_start = np.array([task['start_date'] for task in tasks], dtype='datetime64[D]')
+    planned_end = np.array([task['end_date'] for task in tasks], dtype='datetime64[D]')
+    planned_end = np.maximum(planned_end, planned_start)
+    origin = planned_start.min() if tasks else np.datetime64('today', 'D')
+
+    start = (planned_start - origin).astype(np.int64)
+    end = (planned_end - origin).astype(np.int64)
+    duration = end - start + 1
+    milestone = np.array([bool(task.get('is_milestone')) for task in tasks], dtype=bool)
+
+    budgets = np.array([task.get('budget') if task.get('budget') is not None else np.nan for task in tasks], dtype=np.float64)
+    if tasks and np.isnan(budgets).all() and project_budget:
+        # Spread the project budget over the tasks by planned duration
+        weights = np.where(milestone, 0, duration).astype(np.float64)
+        budgets = project_budget * weights / weights.sum() if weights.sum() else np.zeros(len(tasks))
+    budgets = np.nan_to_num(budgets)
+
+    # Second-order difference array: each task spends its budget evenly from start to end
+    days = int(end.max()) + 1 if tasks else 0
+    rate = np.zeros(days + 1)
+    np.add.at(rate, start, budgets / duration)
+    np.add.at(rate, end + 1, -budgets / duration)
+    planned_value = np.cumsum(np.cumsum(rate[:-1]))
+
+    return {
+        'task_ids': task_ids,
+        'positions': {task_id: i for i, task_id in enumerate(task_ids)},
+        'names': [task.get('name') for task in tasks],
+        'origin': origin,
+        'start': start,
+        'end': end,
+        'budget': budgets,
+        'planned_value': planned_value
+    }
+
+def build_actuals(model, progress, cost_entries):
+    """
+    Collect the progress and actual costs of the tasks of a budget model.
+
+    Args:
+        model: A model from build_budget_model
+        progress: Dictionary mapping task IDs to progress percentages
+        cost_entries: List of cost entry dictionaries
+
+    Returns:
+        Dictionary with the progress and actual cost of each task, and the
+        project's costs as parallel arrays of day offsets and amounts
+    """
+    actuals = {
+        'progress': np.array([progress.get(task_id, 0) or 0 for task_id in model['task_ids']], dtype=np.float64),
+        'actual_cost': np.zeros(len(model['task_ids'])),
+        'cost_days': [],
+        'cost_amounts': []
+    }
+    for entry in cost_entries:
+        record_cost(model, actuals, entry)
+    return actuals
+
+def record_cost(model, actuals, entry, sign=1):
+    """Add (sign=1) or remove (sign=-1) a cost entry from a set of actuals"""
+    amount = sign * (entry.get('amount') or 0)
+    position = model['positions'].get(entry.get('task_id'))
+    if position is not None:
+        actuals['actual_cost'][position] += amount
+    day = int((np.datetime64(entry['entry_date'], 'D') - model['origin']).astype(np.int64))
+    actuals['cost_days'].append(day)
+    actuals['cost_amounts'].append(amount)
+
+def _ratio(numerator, denominator):
+    return float(numerator / denominator) if denominator else None
+
+def _indicators(bac, pv, ev, ac):
+    """The EVM variances, indices and forecasts for one set of totals"""
+    cpi = _ratio(ev, ac)
+    spi = _ratio(ev, pv)
+    if cpi:
+        eac = bac / cpi
+    else:
+        # No cost performance yet, so the remaining work is forecast at plan
+        eac = ac + bac - ev
+    return {
+        'bac': float(bac),
+        'pv': float(pv),
+        'ev': float(ev),
+        'ac': float(ac),
+        'sv': float(ev - pv),
+        'cv': float(ev - ac),
+        'spi': spi,
+        'cpi': cpi,
+        'eac': float(eac),
+        'etc': float(max(eac - ac, 0)),
+        'vac': float(bac - eac)
+    }
+
+def compute_earned_value(model, actuals, status_date=None):
+    """
+    Compute the earned value metrics of a project and its tasks.
+
+    Args:
+        model: A model from build_budget_model
+        actuals: Actuals from build_actuals
+        status_date: Optional date to measure at (default: today)
+
+    Returns:
+        Dictionary with the project metrics, the metrics of each task by ID,
+        and the cumulative PV and AC series by date
+    """
+    status = np.datetime64(status_date, 'D') if status_date else np.datetime64('today', 'D')
+    day = int((status - model['origin']).astype(np.int64))
+
+    budget, start, end = model['budget'], model['start'], model['end']
+    elapsed = np.clip((day - start + 1) / (end - start + 1), 0, 1)
+    task_pv = budget * elapsed
+    task_ev = budget * np.clip(actuals['progress'], 0, 100) / 100
+    task_ac = actuals['actual_cost']
+
+    cost_days = np.array(actuals['cost_days'], dtype=np.int64)
+    cost_amounts = np.array(actuals['cost_amounts'], dtype=np.float64)
+
+    # Series run from the project start to the later of its planned end, the status date and the last cost
+    planned_value = model['planned_value']
+    last_day = max(len(planned_value) - 1, day, int(cost_days.max()) if cost_days.size else 0, 0)
+    series_pv = np.concatenate([planned_value, np.full(last_day + 1 - len(planned_value), planned_value[-1] if len(planned_value) else 0.0)])
+    daily_cost = np.zeros(last_day + 1)
+    # Costs recorded before the first task starts count from the first day
+    np.add.at(daily_cost, np.clip(cost_days, 0, last_day), cost_amounts)
+    series_ac = np.cumsum(daily_cost)
+
+    project_pv = series_pv[day] if day >= 0 else 0.0
+    project_ac = series_ac[day] if day >= 0 else 0.0
+    project = _indicators(budget.sum(), project_pv, task_ev.sum(), project_ac)
+    project['status_date'] = str(status)
+    project['percent_complete'] = _ratio(float(task_ev.sum()), float(budget.sum()))
+
+    tasks = {}
+    for i, task_id in enumerate(model['task_ids']):
+        tasks[task_id] = _indicators(budget[i], task_pv[i], task_ev[i], task_ac[i])
+        tasks[task_id]['name'] = model['names'][i]
+
+    dates = (model['origin'] + np.arange(last_day + 1).astype('timedelta64[D]')).astype(str).tolist()
+    return {
+        'project': project,
+        'tasks': tasks,
+        'series': {
+            'dates': dates,
+            'pv': series_pv.tolist(),
+            'ac': series_ac.tolist()
+        }
+    }
+
+def _get_model(project_id):
+    version = get_project_schedule_version(project_id)
+    with _cache_lock:
+        cached = _model_cache.get(project_id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    project = get_project(project_id) or {}
+    model = build_budget_model(get_project_tasks(project_id), project.get('budget'))
+    with _cache_lock:
+        _model_cache[project_id] = (version, model)
+        # Actuals are laid out by the model's task positions
+        _actuals_cache.pop(project_id, None)
+    return model
+
+def _get_actuals(project_id, model):
+    version = get_project_progress_version(project_id)
+    with _cache_lock:
+        cached = _actuals_cache.get(project_id)
+    if cached and cached[0] == version and cached[1] is model:
+        return cached[2]
+
+    actuals = build_actuals(model, get_project_task_progress(project_id), get_project_cost_entries(project_id))
+    with _cache_lock:
+        _actuals_cache[project_id] = (version, model, actuals)
+    return actuals
+
+def get_project_earned_value(project_id, status_date=None):
+    """
+    Get the earned value metrics of a project, see compute_earned_value.
+
+    Args:
+        project_id: The ID of the project
+        status_date: Optional date to measure at (default: today)
+
+    Returns:
+        The result of compute_earned_value
+    """
+    model = _get_model(project_id)
+    return compute_earned_value(model, _get_actuals(project_id, model), status_date)
+
+def _update_actuals(project_id, update, versions):
+    """
+    Apply a change to the cached actuals if they were built at the progress
+    version the change started from, and drop them otherwise.
+
+    Args:
+        project_id: The ID of the project
+        update: Function taking (model, actuals) and changing the actuals in place
+        versions: The versions dictionary filled by the database write, see utils.database.report_versions
+    """
+    span = versions.get(('progress', project_id))
+    if span is None:
+        # The write left the project's progress and costs as they were
+        return
+    with _cache_lock:
+        cached = _actuals_cache.get(project_id)
+        if not cached:
+            return
+        if cached[0] != span[0]:
+            del _actuals_cache[project_id]
+            return
+        update(cached[1], cached[2])
+        _actuals_cache[project_id] = (span[1], cached[1], cached[2])
+
+def reset_project_actuals(project_id):
+    """Discard a project's cached actuals so they are rebuilt on next use"""
+    with _cache_lock:
+        _actuals_cache.pop(project_id, None)
+
+def record_task_progress(project_id, task_id, progress, versions):
+    """Apply a saved task progress to the cached actuals of its project"""
+    def update(model, actuals):
+        position = model['positions'].get(task_id)
+        if position is not None:
+            actuals['progress'][position] = progress or 0
+    _update_actuals(project_id, update, versions)
+
+def record_cost_entry(entry, versions, sign=1):
+    """Apply a saved (sign=1) or deleted (sign=-1) cost entry to the cached actuals of its project"""
+    _update_actuals(entry['project_id'], lambda model, actuals: record_cost(model, actuals, entry, sign), versions)
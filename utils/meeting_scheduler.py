@@ -0,0 +1,269 @@
+"""
+Module for detecting meeting conflicts and finding common free time slots.
+
+Each team member's active meetings are kept in a sorted interval index: start
+times in ascending order alongside a running maximum of end times. A new
+meeting conflicts with a member's schedule if some meeting starting before it
+ends is still running when it starts, which takes one binary search and one
+lookup. The index is built from the database on first use and kept up to date
+as meetings are added, ended and cancelled.
+"""
+
+import bisect
+import datetime
+import heapq
+import threading
+
+from utils.database import get_meeting_slots_by_status
+
+# Meetings in these statuses occupy their participants' time
+ACTIVE_STATUSES = ['Scheduled', 'In Progress']
+
+# Free slots start on multiples of this many minutes
+SLOT_GRANULARITY = 15
+
+WORKDAY_START = datetime.time(9, 0)
+WORKDAY_END = datetime.time(17, 0)
+
+# How far ahead the free slot search looks
+SEARCH_HORIZON_DAYS = 60
+
+def parse_meeting_datetime(value):
+    """Parse a stored meeting datetime string, returning None if it is invalid"""
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def _round_up(moment):
+    """Round a datetime up to the next slot boundary"""
+    moment = moment.replace(second=0, microsecond=0)
+    remainder = moment.minute % SLOT_GRANULARITY
+    if remainder:
+        moment += datetime.timedelta(minutes=SLOT_GRANULARITY - remainder)
+    return moment
+
+class MemberSchedule:
+    """The active meetings of one team member, sorted by start time"""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.meeting_ids = []
+        # max_ends[i] is the latest end among the first i + 1 meetings
+        self.max_ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end, meeting_id):
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.meeting_ids.insert(index, meeting_id)
+        self._refresh_max_ends(index)
+
+    def remove(self, start, meeting_id):
+        index = bisect.bisect_left(self.starts, start)
+        while index < len(self.starts) and self.starts[index] == start:
+            if self.meeting_ids[index] == meeting_id:
+                del self.starts[index]
+                del self.ends[index]
+                del self.meeting_ids[index]
+                self._refresh_max_ends(index)
+                return True
+            index += 1
+        return False
+
+    def _refresh_max_ends(self, index):
+        # New meetings are usually the latest ones, so this touches few entries
+        del self.max_ends[index:]
+        running = self.max_ends[-1] if self.max_ends else None
+        for end in self.ends[index:]:
+            if running is None or end > running:
+                running = end
+            self.max_ends.append(running)
+
+    def has_conflict(self, start, end):
+        """Whether any meeting overlaps [start, end)"""
+        count = bisect.bisect_left(self.starts, end)
+        return count > 0 and self.max_ends[count - 1] > start
+
+    def conflicts(self, start, end):
+        """IDs of the meetings that overlap [start, end)"""
+        result = []
+        index = bisect.bisect_left(self.starts, end) - 1
+        # Once the running maximum ends before start, no earlier meeting can overlap
+        while index >= 0 and self.max_ends[index] > start:
+            if self.ends[index] > start:
+                result.append(self.meeting_ids[index])
+            index -= 1
+        return result
+
+    def busy_from(self, moment):
+        """Yield the (start, end) intervals still running at or after moment, in start order"""
+        index = bisect.bisect_right(self.max_ends, moment)
+        for position in range(index, len(self.starts)):
+            if self.ends[position] > moment:
+                yield self.starts[position], self.ends[position]
+
+class MeetingIndex:
+    """Interval index of active meetings for all team members"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._members = {}
+        self._meetings = {}
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            for meeting in get_meeting_slots_by_status(ACTIVE_STATUSES):
+                self._add(meeting)
+            self._loaded = True
+
+    def _add(self, meeting):
+        start = parse_meeting_datetime(meeting.get('datetime'))
+        if start is None or meeting['id'] in self._meetings:
+            return
+        end = start + datetime.timedelta(minutes=meeting.get('duration') or 0)
+        participants = [p for p in (meeting.get('participants') or []) if p is not None]
+
+        self._meetings[meeting['id']] = {
+            'title': meeting.get('title'),
+            'start': start,
+            'end': end,
+            'participants': participants
+        }
+        for member_id in participants:
+            self._members.setdefault(member_id, MemberSchedule()).add(start, end, meeting['id'])
+
+    def add_meeting(self, meeting):
+        with self._lock:
+            if self._loaded:
+                self._add(meeting)
+
+    def remove_meeting(self, meeting_id):
+        with self._lock:
+            entry = self._meetings.pop(meeting_id, None)
+            if entry is None:
+                return
+            for member_id in entry['participants']:
+                schedule = self._members.get(member_id)
+                if schedule is not None:
+                    schedule.remove(entry['start'], meeting_id)
+
+    def reset(self):
+        with self._lock:
+            self._loaded = False
+            self._members = {}
+            self._meetings = {}
+
+    def find_conflicts(self, participant_ids, start, duration):
+        with self._lock:
+            self._ensure_loaded()
+            end = start + datetime.timedelta(minutes=duration)
+            conflicts = []
+            for member_id in participant_ids:
+                schedule = self._members.get(member_id)
+                if schedule is None or not schedule.has_conflict(start, end):
+                    continue
+                for meeting_id in schedule.conflicts(start, end):
+                    entry = self._meetings[meeting_id]
+                    conflicts.append({
+                        'member_id': member_id,
+                        'meeting_id': meeting_id,
+                        'title': entry['title'],
+                        'start': entry['start'],
+                        'end': entry['end']
+                    })
+            return conflicts
+
+    def find_free_slots(self, participant_ids, duration, earliest, count, day_start, day_end,
+                        include_weekends, horizon_days):
+        with self._lock:
+            self._ensure_loaded()
+            length = datetime.timedelta(minutes=duration)
+            cursor = _round_up(earliest)
+
+            # One stream of everyone's busy intervals, ordered by start
+            schedules = [self._members[m] for m in set(participant_ids) if m in self._members]
+            busy = heapq.merge(*[schedule.busy_from(cursor) for schedule in schedules])
+            next_busy = next(busy, None)
+
+            slots = []
+            for offset in range(horizon_days + 1):
+                day = earliest.date() + datetime.timedelta(days=offset)
+                if not include_weekends and day.weekday() >= 5:
+                    continue
+
+                window_end = datetime.datetime.combine(day, day_end)
+                cursor = max(cursor, _round_up(datetime.datetime.combine(day, day_start)))
+                while cursor + length <= window_end:
+                    # Drop intervals that are over before the candidate slot starts
+                    while next_busy is not None and next_busy[1] <= cursor:
+                        next_busy = next(busy, None)
+
+                    if next_busy is not None and next_busy[0] < cursor + length:
+                        cursor = _round_up(next_busy[1])
+                        continue
+
+                    slots.append((cursor, cursor + length))
+                    if len(slots) >= count:
+                        return slots
+                    cursor += length
+            return slots
+
+_index = MeetingIndex()
+
+def find_meeting_conflicts(participant_ids, start, duration):
+    """
+    Find meetings that overlap a proposed meeting for any of its participants.
+
+    Args:
+        participant_ids: List of team member IDs
+        start: The proposed start as a datetime
+        duration: The proposed duration in minutes
+
+    Returns:
+        List of conflicts, one per participant and overlapping meeting
+    """
+    return _index.find_conflicts(participant_ids, start, duration)
+
+def find_free_slots(participant_ids, duration, earliest=None, count=5,
+                    day_start=WORKDAY_START, day_end=WORKDAY_END,
+                    include_weekends=False, horizon_days=SEARCH_HORIZON_DAYS):
+    """
+    Find the next time slots in which all participants are free.
+
+    Args:
+        participant_ids: List of team member IDs
+        duration: The meeting duration in minutes
+        earliest: The earliest start as a datetime (default: now)
+        count: The number of slots to return
+        day_start: Start of the working day
+        day_end: End of the working day
+        include_weekends: Whether slots may fall on Saturday or Sunday
+        horizon_days: How many days ahead to search
+
+    Returns:
+        List of (start, end) datetime tuples, earliest first
+    """
+    if earliest is None:
+        earliest = datetime.datetime.now()
+    return _index.find_free_slots(participant_ids, duration, earliest, count,
+                                  day_start, day_end, include_weekends, horizon_days)
+
+def index_meeting(meeting):
+    """Add a newly scheduled meeting to the index"""
+    _index.add_meeting(meeting)
+
+def unindex_meeting(meeting_id):
+    """Remove a meeting that no longer occupies its participants' time"""
+    _index.remove_meeting(meeting_id)
+
+def reset_meeting_index():
+    """Discard the index so it is rebuilt from the database on next use"""
+    _index.reset()
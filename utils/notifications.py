@@ -0,0 +1,300 @@
+"""
+Module for queueing and sending notifications.
+
+Notifications go through an outbox: they are written to the notifications
+table in the same transaction as the change they report, so a change is never
+saved without its notifications or the other way around, and the user making
+the change never waits for an email or SMS to be sent.
+
+A background dispatcher claims due notifications in batches and hands them to
+the transport for their channel. Sends are rate limited per channel, failures
+are retried with exponential backoff, and a notification left half-sent by a
+stopped dispatcher is claimed again once its lease expires. Every notification
+carries an idempotency key, so queueing the same event twice sends it once,
+and transports pass the key on where the provider supports it.
+
+Notifications are held for a digest window after they are queued. Before each
+batch, the dispatcher replaces all queued notifications of a recipient and
+channel with one digest message once the oldest of them has waited a full
+window; a notification that is still alone when its window ends is sent as
+is. Set NOTIFICATION_DIGEST_WINDOW_SECONDS=0 to send everything right away.
+
+Transports are pluggable. By default every channel writes to a local log
+file; set NOTIFICATION_EMAIL_TRANSPORT=smtp (pointing SMTP_HOST/SMTP_PORT at
+e.g. `python -m aiosmtpd -n -l localhost:1025` for testing) and
+NOTIFICATION_SMS_TRANSPORT=twilio to send for real.
+"""
+
+import os
+import json
+import time
+import datetime
+import threading
+import smtplib
+from email.message import EmailMessage
+from pathlib import Path
+
+from utils.database import (
+    get_notification_recipients, coalesce_notifications, claim_notifications, complete_notifications
+)
+
+# How often the dispatcher checks the outbox when it is not woken up
+DISPATCH_INTERVAL_SECONDS = 30
+
+BATCH_SIZE = 100
+
+# A claimed notification can be claimed again after this long
+LEASE_SECONDS = 300
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 3600
+
+# How long notifications wait to be combined with later ones into a digest
+DIGEST_WINDOW_SECONDS = int(os.getenv("NOTIFICATION_DIGEST_WINDOW_SECONDS", "900"))
+
+# Notifications listed in a digest message; the rest are counted
+DIGEST_MAX_ITEMS = 20
+
+# Digests written per transaction
+DIGEST_BATCH_SIZE = 1000
+
+# Messages per second each channel may send
+RATE_LIMITS = {'email': 5.0, 'sms': 1.0}
+
+class PermanentTransportError(Exception):
+    """Raised by a transport when retrying a notification cannot succeed"""
+
+class LogTransport:
+    """Appends notifications to a local file as JSON lines, standing in for a real provider"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv("NOTIFICATION_LOG_PATH", "data/notifications.log"))
+        self._lock = threading.Lock()
+
+    def send(self, notification):
+        record = {
+            'idempotency_key': notification['idempotency_key'],
+            'channel': notification['channel'],
+            'address': notification['address'],
+            'subject': notification['subject'],
+            'body': notification['body'],
+            'sent_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+
+class SMTPTransport:
+    """Sends email notifications through an SMTP server"""
+
+    def __init__(self, host=None, port=None, sender=None, username=None, password=None, use_tls=None):
+        self.host = host or os.getenv("SMTP_HOST", "localhost")
+        self.port = int(port or os.getenv("SMTP_PORT", "1025"))
+        self.sender = sender or os.getenv("SMTP_SENDER", "notifications@localhost")
+        self.username = username or os.getenv("SMTP_USERNAME")
+        self.password = password or os.getenv("SMTP_PASSWORD")
+        self.use_tls = use_tls if use_tls is not None else os.getenv("SMTP_USE_TLS") == "1"
+
+    def send(self, notification):
+        if not notification['address']:
+            raise PermanentTransportError("No email address")
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = notification['address']
+        message['Subject'] = notification['subject']
+        # Receiving servers drop repeated Message-IDs, which makes retries safe
+        message['Message-ID'] = f"<{notification['idempotency_key']}@{self.host}>"
+        message.set_content(notification['body'])
+
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+class TwilioTransport:
+    """Sends SMS notifications through Twilio"""
+
+    def __init__(self, account_sid=None, auth_token=None, from_number=None):
+        from twilio.rest import Client
+        self.client = Client(account_sid or os.getenv("TWILIO_ACCOUNT_SID"), auth_token or os.getenv("TWILIO_AUTH_TOKEN"))
+        self.from_number = from_number or os.getenv("TWILIO_FROM_NUMBER")
+
+    def send(self, notification):
+        if not notification['address']:
+            raise PermanentTransportError("No phone number")
+        self.client.messages.create(
+            to=notification['address'],
+            from_=self.from_number,
+            body=f"{notification['subject']}\n{notification['body']}"[:1600]
+        )
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+def register_transport(channel, transport):
+    """Use a transport (any object with a send(notification) method) for a channel"""
+    with _transports_lock:
+        _transports[channel] = transport
+
+def get_transport(channel):
+    """Get the transport of a channel, creating it from the environment on first use"""
+    with _transports_lock:
+        if channel not in _transports:
+            kind = os.getenv(f"NOTIFICATION_{channel.upper()}_TRANSPORT", "log")
+            if kind == 'smtp':
+                _transports[channel] = SMTPTransport()
+            elif kind == 'twilio':
+                _transports[channel] = TwilioTransport()
+            else:
+                _transports[channel] = LogTransport()
+        return _transports[channel]
+
+class RateLimiter:
+    """Token bucket allowing a number of sends per second with bursts of up to one second's worth"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = max(rate, 1.0)
+        self.updated = time.monotonic()
+
+    def acquire(self):
+        now = time.monotonic()
+        self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            time.sleep((1 - self.tokens) / self.rate)
+            self.tokens = 1
+            self.updated = time.monotonic()
+        self.tokens -= 1
+
+_rate_limiters = {}
+
+def build_notifications(event_type, key, subject, body, user_ids=(), member_ids=(), payload=None):
+    """
+    Prepare notifications of an event for users and team members.
+
+    Each recipient gets one notification per channel they have an address
+    for (email and SMS), or a log notification if they have none.
+
+    Args:
+        event_type: Kind of event, e.g. 'change_request_created'
+        key: Key identifying the event; with the recipient and channel it forms the idempotency key
+        subject: Short summary of the event
+        body: Message text
+        user_ids: IDs of users to notify
+        member_ids: IDs of team members to notify
+        payload: Optional dictionary of event details
+
+    Returns:
+        List of notification dictionaries for add_notifications
+    """
+    # Held for the digest window
+    not_before = datetime.datetime.now() + datetime.timedelta(seconds=max(DIGEST_WINDOW_SECONDS, 0))
+    not_before = not_before.strftime('%Y-%m-%d %H:%M:%S')
+    
+    notifications = []
+    for recipient in get_notification_recipients(set(user_ids), set(member_ids)):
+        channels = [(channel, address) for channel, address in (('email', recipient['email']), ('sms', recipient['phone'])) if address]
+        for channel, address in channels or [('log', None)]:
+            notifications.append({
+                'idempotency_key': f"{key}:{recipient['recipient_type']}:{recipient['recipient_id']}:{channel}",
+                'event_type': event_type,
+                'recipient_type': recipient['recipient_type'],
+                'recipient_id': recipient['recipient_id'],
+                'channel': channel,
+                'address': address,
+                'subject': subject,
+                'body': body,
+                'payload': payload or {},
+                'next_attempt_at': not_before
+            })
+    return notifications
+
+def format_digest(count, notifications):
+    """Subject and body of a digest of count notifications, listing the first of them"""
+    lines = [f"- {n['created_at']}: {n['subject']}" for n in notifications[:DIGEST_MAX_ITEMS]]
+    if count > len(lines):
+        lines.append(f"...and {count - len(lines)} more")
+    return f"{count} project updates", "\n".join(lines)
+
+def coalesce_pending(window_seconds=None):
+    """
+    Combine the queued notifications of recipients whose digest window has ended.
+
+    Returns:
+        The number of digests written
+    """
+    window_seconds = DIGEST_WINDOW_SECONDS if window_seconds is None else window_seconds
+    cutoff = (datetime.datetime.now() - datetime.timedelta(seconds=max(window_seconds, 0))).strftime('%Y-%m-%d %H:%M:%S')
+    return coalesce_notifications(cutoff, format_digest, DIGEST_MAX_ITEMS, DIGEST_BATCH_SIZE)
+
+def _retry_time(attempts):
+    delay = min(RETRY_BASE_SECONDS * 2 ** attempts, RETRY_MAX_SECONDS)
+    return (datetime.datetime.now() + datetime.timedelta(seconds=delay)).strftime('%Y-%m-%d %H:%M:%S')
+
+def dispatch_pending(batch_size=BATCH_SIZE):
+    """
+    Send one batch of due notifications.
+
+    Returns:
+        Tuple of (number claimed, number sent)
+    """
+    notifications = claim_notifications(batch_size, LEASE_SECONDS)
+    sent, failures = [], []
+    for notification in notifications:
+        channel = notification['channel']
+        limiter = _rate_limiters.get(channel)
+        if limiter is None and channel in RATE_LIMITS:
+            limiter = _rate_limiters[channel] = RateLimiter(RATE_LIMITS[channel])
+        try:
+            if limiter:
+                limiter.acquire()
+            get_transport(channel).send(notification)
+            sent.append(notification['id'])
+        except PermanentTransportError as e:
+            failures.append((notification['id'], str(e), None))
+        except Exception as e:
+            attempts = (notification['attempts'] or 0) + 1
+            failures.append((notification['id'], str(e), _retry_time(attempts) if attempts < MAX_ATTEMPTS else None))
+
+    if notifications:
+        complete_notifications(sent, failures)
+    return len(notifications), len(sent)
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+_wake_event = threading.Event()
+
+def _run_dispatcher(stop_event, interval):
+    while not stop_event.is_set():
+        try:
+            # Drain the outbox, then wait to be woken up or for the next interval
+            coalesce_pending()
+            while dispatch_pending()[0] == BATCH_SIZE and not stop_event.is_set():
+                pass
+        except Exception as e:
+            print(f"Error dispatching notifications: {e}")
+        _wake_event.wait(interval)
+        _wake_event.clear()
+
+def start_dispatcher(interval=DISPATCH_INTERVAL_SECONDS):
+    """Start the background dispatcher unless it is already running; returns its stop event"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher and _dispatcher[0].is_alive():
+            return _dispatcher[1]
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=_run_dispatcher, args=(stop_event, interval), name="notification-dispatcher", daemon=True
+        )
+        thread.start()
+        _dispatcher = (thread, stop_event)
+        return stop_event
+
+def wake_dispatcher():
+    """Have the dispatcher check the outbox now, after notifications were committed"""
+    _wake_event.set()
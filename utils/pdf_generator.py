@@ -1,12 +1,17 @@
 import io
 import datetime
 import pandas as pd
+import numpy as np
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.units import inch
 from utils.data_management import get_project, get_project_tasks, get_project_team, get_project_documents
+from utils.scheduling import get_project_schedule, DependencyCycleError
+from utils.earned_value import get_project_earned_value
+from utils.baselines import get_baseline_variance
+from utils.work_calendar import get_project_calendar
 
 def generate_project_report(project_id):
     """Generate a PDF report for a specific project"""
@@ -105,6 +110,36 @@ def generate_project_report(project_id):
         
         story.append(task_table)
         story.append(Spacer(1, 0.3 * inch))
+        
+        # Add earned value
+        evm = get_project_earned_value(project_id)['project']
+        
+        def format_index(value):
+            return f"{value:.2f}" if value is not None else "N/A"
+        
+        story.append(Paragraph("Earned Value", styles['Heading2']))
+        story.append(Paragraph(f"Status date: {evm['status_date']}", styles['Normal']))
+        story.append(Spacer(1, 0.1 * inch))
+        
+        evm_data = [
+            ["Budget at Completion (BAC):", f"${evm['bac']:,.2f}", "Schedule Variance (SV):", f"${evm['sv']:,.2f}"],
+            ["Planned Value (PV):", f"${evm['pv']:,.2f}", "Cost Variance (CV):", f"${evm['cv']:,.2f}"],
+            ["Earned Value (EV):", f"${evm['ev']:,.2f}", "Schedule Performance (SPI):", format_index(evm['spi'])],
+            ["Actual Cost (AC):", f"${evm['ac']:,.2f}", "Cost Performance (CPI):", format_index(evm['cpi'])],
+            ["Estimate at Completion (EAC):", f"${evm['eac']:,.2f}", "Estimate to Complete (ETC):", f"${evm['etc']:,.2f}"]
+        ]
+        
+        evm_table = Table(evm_data, colWidths=[1.9*inch, 1.1*inch, 1.9*inch, 1.1*inch])
+        evm_table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+            ('BACKGROUND', (2, 0), (2, -1), colors.lightgrey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('PADDING', (0, 0), (-1, -1), 6),
+        ]))
+        
+        story.append(evm_table)
+        story.append(Spacer(1, 0.3 * inch))
     
     # Add team
     if team:
@@ -140,8 +175,8 @@ def generate_project_report(project_id):
         for doc in documents:
             doc_data.append([
                 doc['name'],
-                doc['category'],
-                doc['uploaded_at']
+                doc.get('category') or 'Uncategorized',
+                doc.get('upload_date') or ''
             ])
         
         doc_table = Table(doc_data, colWidths=[2.5*inch, 1.5*inch, 2*inch])
@@ -212,10 +247,15 @@ def generate_timeline_report(project_id):
     story.append(Paragraph("Project Timeline", styles['Heading2']))
     story.append(Spacer(1, 0.1 * inch))
     
+    calendar = get_project_calendar(project_id)
+    project_working_days = int(calendar.working_days([project['start_date']], [project['end_date']])[0])
+    
     timeline_data = [
         ["Project Start:", project['start_date']],
         ["Project End:", project['end_date']],
-        ["Duration:", f"{(datetime.datetime.strptime(project['end_date'], '%Y-%m-%d') - datetime.datetime.strptime(project['start_date'], '%Y-%m-%d')).days + 1} days"]
+        ["Duration:", f"{project_working_days} working days"],
+        ["Working Days:", ", ".join(calendar.work_day_names())],
+        ["Holidays:", ", ".join(calendar.holidays) if calendar.holidays else "None"]
     ]
     
     timeline_table = Table(timeline_data, colWidths=[2*inch, 3*inch])
@@ -238,17 +278,18 @@ def generate_timeline_report(project_id):
         # Sort tasks by start date
         sorted_tasks = sorted(tasks, key=lambda x: x['start_date'])
         
+        durations = calendar.working_days(
+            [task['start_date'] for task in sorted_tasks],
+            [task['end_date'] for task in sorted_tasks]
+        )
+        
         task_data = [["Task Name", "Start Date", "End Date", "Duration", "Status"]]
-        for task in sorted_tasks:
-            start_date = datetime.datetime.strptime(task['start_date'], '%Y-%m-%d')
-            end_date = datetime.datetime.strptime(task['end_date'], '%Y-%m-%d')
-            duration = (end_date - start_date).days + 1
-            
+        for task, duration in zip(sorted_tasks, durations):
             task_data.append([
                 task['name'],
                 task['start_date'],
                 task['end_date'],
-                f"{duration} days",
+                f"{duration} working days",
                 task['status']
             ])
         
@@ -325,6 +366,90 @@ def generate_timeline_report(project_id):
             story.append(dependency_table)
             story.append(Spacer(1, 0.3 * inch))
     
+    # Add critical path section
+    if tasks:
+        story.append(Paragraph("Critical Path", styles['Heading2']))
+        story.append(Spacer(1, 0.1 * inch))
+        
+        try:
+            schedule = get_project_schedule(project_id)
+        except DependencyCycleError as e:
+            schedule = None
+            story.append(Paragraph(f"The critical path cannot be computed: {e}", styles['Normal']))
+        
+        if schedule and schedule['critical_path']:
+            story.append(Paragraph(
+                f"Scheduled finish: {schedule['project_finish']} ({schedule['duration_days']} days)",
+                styles['Normal']
+            ))
+            story.append(Spacer(1, 0.1 * inch))
+            
+            task_dict = {task['id']: task['name'] for task in tasks}
+            critical_data = [["Task", "Earliest Start", "Earliest Finish", "Duration"]]
+            for task_id in schedule['critical_path']:
+                entry = schedule['tasks'][task_id]
+                critical_data.append([
+                    task_dict[task_id],
+                    entry['early_start'],
+                    entry['early_finish'],
+                    f"{entry['duration_days']} days"
+                ])
+            
+            critical_table = Table(critical_data, colWidths=[2.5*inch, 1.25*inch, 1.25*inch, 1*inch])
+            critical_table.setStyle(TableStyle([
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('PADDING', (0, 0), (-1, -1), 6),
+            ]))
+            
+            story.append(critical_table)
+        story.append(Spacer(1, 0.3 * inch))
+        
+        # Add variance against the current baseline
+        variance = get_baseline_variance(project_id)
+        if variance is not None:
+            summary = variance['summary']
+            story.append(Paragraph("Baseline Variance", styles['Heading2']))
+            story.append(Spacer(1, 0.1 * inch))
+            story.append(Paragraph(
+                f"Baseline finish: {summary['baseline_finish'] or 'N/A'}, current finish: "
+                f"{summary['current_finish'] or 'N/A'} ({summary['project_finish_variance']:+d} days). "
+                f"{summary['tasks_late']} of {summary['tasks_compared']} tasks finish later than planned, "
+                f"{summary['tasks_early']} earlier.",
+                styles['Normal']
+            ))
+            story.append(Spacer(1, 0.1 * inch))
+            
+            task_dict = {task['id']: task['name'] for task in tasks}
+            moved = np.flatnonzero((variance['start_variance'] != 0) | (variance['finish_variance'] != 0))
+            moved = moved[np.argsort(-variance['finish_variance'][moved], kind='stable')]
+            if moved.size:
+                variance_data = [["Task", "Baseline Finish", "Current Finish", "Start Var.", "Finish Var."]]
+                for i in moved:
+                    variance_data.append([
+                        task_dict.get(int(variance['task_id'][i]), f"Task #{variance['task_id'][i]}"),
+                        str(variance['baseline_finish'][i]),
+                        str(variance['current_finish'][i]),
+                        f"{variance['start_variance'][i]:+d} days",
+                        f"{variance['finish_variance'][i]:+d} days"
+                    ])
+                
+                variance_table = Table(variance_data, colWidths=[2*inch, 1.1*inch, 1.1*inch, 0.9*inch, 0.9*inch])
+                variance_table.setStyle(TableStyle([
+                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+                    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                    ('PADDING', (0, 0), (-1, -1), 6),
+                ]))
+                
+                story.append(variance_table)
+            else:
+                story.append(Paragraph("All tasks are on their baseline dates.", styles['Normal']))
+            story.append(Spacer(1, 0.3 * inch))
+    
     # Add footer
     now = datetime.datetime.now()
     footer_text = f"Timeline Report generated on {now.strftime('%Y-%m-%d %H:%M:%S')}"
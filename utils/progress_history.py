@@ -0,0 +1,156 @@
+"""
+Module for recording and reading the daily progress history of tasks.
+
+A background snapshotter records every task's progress and status once per
+check interval. Snapshots are run-length encoded in the progress_snapshots
+table: a row is written only when a task changes, so days without changes
+cost nothing to store.
+
+Reading a project's history expands the runs into a task x day matrix by
+forward filling each task's row positions, from which burndown, velocity and
+trend series follow with array operations.
+"""
+
+import datetime
+import threading
+
+import numpy as np
+
+from utils.database import record_progress_snapshots, get_project_progress_snapshots
+
+# How often the snapshotter checks for changes; the history keeps one value per task per day
+SNAPSHOT_INTERVAL_SECONDS = 3600
+
+_snapshotter = None
+_snapshotter_lock = threading.Lock()
+
+def take_progress_snapshot(day=None):
+    """
+    Record the current progress of all tasks.
+
+    Args:
+        day: Optional day of the snapshot (default: today)
+
+    Returns:
+        The number of snapshot rows written
+    """
+    day = day or datetime.date.today().strftime('%Y-%m-%d')
+    return record_progress_snapshots(day)
+
+def _run_snapshotter(stop_event, interval):
+    while True:
+        try:
+            take_progress_snapshot()
+        except Exception as e:
+            print(f"Error recording progress snapshot: {e}")
+        if stop_event.wait(interval):
+            return
+
+def start_snapshotter(interval=SNAPSHOT_INTERVAL_SECONDS):
+    """Start the background snapshotter unless it is already running; returns its stop event"""
+    global _snapshotter
+    with _snapshotter_lock:
+        if _snapshotter and _snapshotter[0].is_alive():
+            return _snapshotter[1]
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=_run_snapshotter, args=(stop_event, interval), name="progress-snapshotter", daemon=True
+        )
+        thread.start()
+        _snapshotter = (thread, stop_event)
+        return stop_event
+
+def get_progress_history(project_id, end_date=None):
+    """
+    Get the daily progress of a project's tasks as arrays.
+
+    Args:
+        project_id: The ID of the project
+        end_date: Optional last day of the history (default: today)
+
+    Returns:
+        Dictionary with 'dates' (datetime64[D] array), 'task_ids', 'progress'
+        (task x day float array, NaN where the task did not exist) and
+        'completed' (task x day bool array), or None if nothing was recorded
+    """
+    rows = get_project_progress_snapshots(project_id)
+    if not rows:
+        return None
+
+    task_ids = sorted(set(row['task_id'] for row in rows))
+    positions = {task_id: i for i, task_id in enumerate(task_ids)}
+    row_days = np.array([row['day'] for row in rows], dtype='datetime64[D]')
+    first_day = row_days.min()
+    last_day = max(np.datetime64(end_date, 'D') if end_date else np.datetime64('today', 'D'), row_days.max())
+    days = int((last_day - first_day).astype(np.int64)) + 1
+
+    row_tasks = np.array([positions[row['task_id']] for row in rows], dtype=np.int64)
+    row_progress = np.array([np.nan if row['progress'] is None else row['progress'] for row in rows], dtype=np.float64)
+    row_completed = np.array([row['status'] == 'Completed' for row in rows], dtype=bool)
+
+    # Each run starts at its row's day and lasts until the task's next row;
+    # rows are ordered by task and day, so the latest row index wins a forward fill
+    latest_row = np.full((len(task_ids), days), -1, dtype=np.int64)
+    latest_row[row_tasks, (row_days - first_day).astype(np.int64)] = np.arange(len(rows))
+    latest_row = np.maximum.accumulate(latest_row, axis=1)
+
+    recorded = latest_row >= 0
+    progress = np.where(recorded, row_progress[latest_row], np.nan)
+    completed = recorded & row_completed[latest_row]
+
+    return {
+        'dates': first_day + np.arange(days),
+        'task_ids': task_ids,
+        'progress': progress,
+        'completed': completed
+    }
+
+def get_burndown_history(project_id, end_date=None):
+    """
+    Get the recorded remaining, completed and average progress of a project's tasks per day.
+
+    Returns:
+        Dictionary with 'dates', 'remaining', 'completed' and 'average_progress'
+        arrays, or None if nothing was recorded
+    """
+    history = get_progress_history(project_id, end_date)
+    if history is None:
+        return None
+
+    active = ~np.isnan(history['progress'])
+    completed = history['completed'].sum(axis=0)
+    task_count = active.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average_progress = np.where(task_count > 0, np.nansum(history['progress'], axis=0) / task_count, 0.0)
+
+    return {
+        'dates': history['dates'],
+        'remaining': task_count - completed,
+        'completed': completed,
+        'average_progress': average_progress
+    }
+
+# A Monday, so weekly periods start on Mondays
+_WEEK_ORIGIN = np.datetime64('1970-01-05', 'D')
+
+def get_velocity(burndown, period='W'):
+    """
+    Count the tasks completed in each week or month of a burndown history.
+
+    Args:
+        burndown: A history from get_burndown_history
+        period: 'W' for weeks starting on Monday or 'M' for calendar months
+
+    Returns:
+        Tuple of (period start dates, net tasks completed per period)
+    """
+    dates = burndown['dates']
+    if period == 'W':
+        period_starts = _WEEK_ORIGIN + ((dates - _WEEK_ORIGIN).astype(np.int64) // 7) * 7
+    else:
+        period_starts = dates.astype(f'datetime64[{period}]').astype('datetime64[D]')
+    boundaries = np.flatnonzero(np.r_[True, period_starts[1:] != period_starts[:-1]])
+
+    # Completions are the change of the completed count, starting from the first recorded day
+    daily = np.diff(burndown['completed'], prepend=burndown['completed'][:1])
+    return period_starts[boundaries], np.add.reduceat(daily, boundaries)
@@ -0,0 +1,299 @@
+"""
+Module for Monte Carlo simulation of project completion dates.
+
+Task durations are sampled from the three-point estimates stored on each task
+(optimistic, most likely and pessimistic days) using a PERT or triangular
+distribution; tasks without estimates keep their planned duration. Every
+iteration is a row of a NumPy array, so each pass over the dependency levels
+schedules all iterations at once with the same rules as the CPM engine in
+utils.scheduling. Large simulations are split into shards with independent
+random streams and run in a process pool shared by all simulations. Its
+workers are started by a fork server rather than forked from the app, whose
+background threads may hold locks at the time of the fork.
+
+Results are cached per project, keyed by Project.schedule_version and the
+simulation settings.
+"""
+
+import os
+import math
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from utils.database import get_project_tasks, get_project_schedule_version
+from utils.scheduling import dependency_edges, topological_levels
+
+DEFAULT_ITERATIONS = 10000
+
+# Simulations with more task samples than this are sharded across processes
+PARALLEL_THRESHOLD = 5_000_000
+
+# Iterations per shard, so memory per worker stays bounded
+SHARD_ITERATIONS = 2500
+
+DISTRIBUTIONS = ('pert', 'triangular')
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """The process pool for sharded simulations, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context(method))
+        return _executor
+
+def _discard_executor(executor):
+    """Drop a broken process pool so the next simulation starts a new one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+def build_simulation_model(tasks):
+    """
+    Prepare the arrays a simulation needs from a list of tasks.
+
+    Args:
+        tasks: List of task dictionaries
+
+    Returns:
+        Dictionary of arrays describing the tasks, their estimates and dependency levels
+
+    Raises:
+        DependencyCycleError: If the dependencies contain a cycle
+    """
+    tasks = [task for task in tasks if task.get('start_date') and task.get('end_date')]
+    task_ids = [task['id'] for task in tasks]
+    positions = {task_id: i for i, task_id in enumerate(task_ids)}
+    predecessors, successors = dependency_edges(tasks, positions)
+    levels = topological_levels(task_ids, predecessors, successors)
+
+    planned_start = np.array([task['start_date'] for task in tasks], dtype='datetime64[D]')
+    planned_end = np.array([task['end_date'] for task in tasks], dtype='datetime64[D]')
+    milestone = np.array([bool(task.get('is_milestone')) for task in tasks], dtype=bool)
+
+    planned = np.maximum((planned_end - planned_start).astype(np.int64) + 1, 1).astype(np.float64)
+    planned[milestone] = 0.0
+
+    # Missing estimates fall back to the planned duration
+    def estimate(field, fallback):
+        values = np.array([task.get(field) if task.get(field) is not None else np.nan for task in tasks], dtype=np.float64)
+        return np.where(np.isnan(values), fallback, values)
+
+    likely = estimate('most_likely_days', planned)
+    optimistic = np.minimum(estimate('optimistic_days', likely), likely)
+    pessimistic = np.maximum(estimate('pessimistic_days', likely), likely)
+    for values in (optimistic, likely, pessimistic):
+        values[milestone] = 0.0
+
+    origin = planned_start.min() if tasks else np.datetime64('today', 'D')
+    return {
+        'task_ids': task_ids,
+        'origin': origin,
+        'constraint': (planned_start - origin).astype(np.float64),
+        'optimistic': optimistic,
+        'likely': likely,
+        'pessimistic': pessimistic,
+        'predecessors': predecessors,
+        'successors': successors,
+        'levels': levels
+    }
+
+def sample_durations(model, iterations, rng, distribution='pert'):
+    """Sample an iterations x tasks array of durations"""
+    low = model['optimistic']
+    mode = model['likely']
+    high = model['pessimistic']
+    spread = high - low
+    uncertain = spread > 0
+
+    durations = np.broadcast_to(mode, (iterations, len(mode))).copy()
+    if not uncertain.any():
+        return durations
+
+    low_u, mode_u, high_u, spread_u = low[uncertain], mode[uncertain], high[uncertain], spread[uncertain]
+    if distribution == 'pert':
+        alpha = 1 + 4 * (mode_u - low_u) / spread_u
+        beta = 1 + 4 * (high_u - mode_u) / spread_u
+        samples = low_u + rng.beta(alpha, beta, size=(iterations, len(low_u))) * spread_u
+    elif distribution == 'triangular':
+        samples = rng.triangular(low_u, mode_u, high_u, size=(iterations, len(low_u)))
+    else:
+        raise ValueError(f"Unknown distribution '{distribution}'")
+
+    durations[:, uncertain] = samples
+    return durations
+
+def simulate_finish(model, durations):
+    """
+    Schedule every iteration and return its finish offset.
+
+    Args:
+        model: A model from build_simulation_model
+        durations: An iterations x tasks array of durations
+
+    Returns:
+        Array with the project finish of each iteration, in days after the model origin
+    """
+    predecessors, successors, levels = model['predecessors'], model['successors'], model['levels']
+    iterations, count = durations.shape
+    if count == 0:
+        return np.zeros(iterations)
+
+    early_start = np.broadcast_to(model['constraint'], durations.shape).copy()
+    early_finish = np.zeros_like(early_start)
+
+    # Edges sorted by successor level, then successor, so each level is one contiguous block
+    edge_order = np.lexsort((successors, levels[successors]))
+    edge_preds = predecessors[edge_order]
+    edge_succs = successors[edge_order]
+    edge_levels = levels[edge_succs]
+
+    level_count = int(levels.max()) + 1
+    node_order = np.argsort(levels, kind='stable')
+    node_bounds = np.searchsorted(levels[node_order], np.arange(level_count + 1))
+    edge_bounds = np.searchsorted(edge_levels, np.arange(level_count + 1))
+
+    for level in range(level_count):
+        lo, hi = edge_bounds[level], edge_bounds[level + 1]
+        if hi > lo:
+            succs = edge_succs[lo:hi]
+            # Latest predecessor finish per successor, for all iterations at once
+            group_starts = np.flatnonzero(np.r_[True, succs[1:] != succs[:-1]])
+            latest = np.maximum.reduceat(early_finish[:, edge_preds[lo:hi]], group_starts, axis=1)
+            targets = succs[group_starts]
+            early_start[:, targets] = np.maximum(early_start[:, targets], latest)
+
+        nodes = node_order[node_bounds[level]:node_bounds[level + 1]]
+        early_finish[:, nodes] = early_start[:, nodes] + durations[:, nodes]
+
+    return early_finish.max(axis=1)
+
+def _simulate_shard(model, iterations, seed, distribution):
+    """Run one shard of a simulation with its own random stream"""
+    rng = np.random.default_rng(seed)
+    return simulate_finish(model, sample_durations(model, iterations, rng, distribution))
+
+def run_simulation(model, iterations=DEFAULT_ITERATIONS, seed=None, distribution='pert'):
+    """
+    Simulate project finish offsets.
+
+    Args:
+        model: A model from build_simulation_model
+        iterations: Number of iterations
+        seed: Optional seed for reproducible results
+        distribution: 'pert' or 'triangular'
+
+    Returns:
+        Array with the project finish of each iteration, in days after the model origin
+    """
+    shard_count = math.ceil(iterations / SHARD_ITERATIONS)
+    shard_sizes = [SHARD_ITERATIONS] * (shard_count - 1) + [iterations - SHARD_ITERATIONS * (shard_count - 1)]
+    seeds = np.random.SeedSequence(seed).spawn(shard_count)
+
+    if iterations * len(model['task_ids']) > PARALLEL_THRESHOLD and shard_count > 1 and (os.cpu_count() or 1) > 1:
+        executor = _get_executor()
+        try:
+            results = list(executor.map(
+                _simulate_shard,
+                [model] * shard_count, shard_sizes, seeds, [distribution] * shard_count
+            ))
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            raise
+    else:
+        results = [
+            _simulate_shard(model, size, shard_seed, distribution)
+            for size, shard_seed in zip(shard_sizes, seeds)
+        ]
+    return np.concatenate(results)
+
+def summarize_simulation(model, finishes, target_date=None, bins=40):
+    """
+    Summarize simulated finish offsets as completion dates and a distribution.
+
+    Args:
+        model: The model the finishes were simulated from
+        finishes: Finish offsets from run_simulation
+        target_date: Optional date to compute the on-time probability for
+        bins: Number of histogram bins
+
+    Returns:
+        Dictionary with P50/P80/P90 completion dates, the mean duration, the
+        on-time probability and a histogram of completion dates
+    """
+    origin = model['origin']
+
+    def to_date(offset):
+        # Finish dates are inclusive, so a task finishing at offset n ends on day n - 1
+        return str(origin + np.timedelta64(max(int(math.ceil(offset)) - 1, 0), 'D'))
+
+    p50, p80, p90 = np.percentile(finishes, [50, 80, 90])
+    counts, edges = np.histogram(finishes, bins=bins)
+
+    summary = {
+        'iterations': int(finishes.size),
+        'p50': to_date(p50),
+        'p80': to_date(p80),
+        'p90': to_date(p90),
+        'mean_duration_days': float(finishes.mean()),
+        'earliest': to_date(finishes.min()),
+        'latest': to_date(finishes.max()),
+        'histogram': {
+            'counts': counts.tolist(),
+            'dates': [to_date(edge) for edge in edges[:-1]]
+        },
+        'on_time_probability': None
+    }
+    if target_date:
+        target_offset = int((np.datetime64(target_date, 'D') - origin).astype(np.int64)) + 1
+        summary['on_time_probability'] = float((finishes <= target_offset).mean())
+    return summary
+
+def get_project_risk(project_id, iterations=DEFAULT_ITERATIONS, distribution='pert', target_date=None, seed=0):
+    """
+    Get the Monte Carlo completion forecast of a project, simulating only when tasks have changed.
+
+    Args:
+        project_id: The ID of the project
+        iterations: Number of iterations
+        distribution: 'pert' or 'triangular'
+        target_date: Optional date to compute the on-time probability for
+        seed: Seed for reproducible results
+
+    Returns:
+        The summary from summarize_simulation, or None if the project has no tasks
+
+    Raises:
+        DependencyCycleError: If the project's dependencies contain a cycle
+    """
+    key = (project_id, iterations, distribution, target_date, seed)
+    version = get_project_schedule_version(project_id)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    model = build_simulation_model(get_project_tasks(project_id))
+    summary = None
+    if model['task_ids']:
+        finishes = run_simulation(model, iterations, seed=seed, distribution=distribution)
+        summary = summarize_simulation(model, finishes, target_date)
+
+    with _cache_lock:
+        # Drop results for older versions of this project
+        for stale_key in [k for k, v in _cache.items() if k[0] == project_id and v[0] != version]:
+            del _cache[stale_key]
+        _cache[key] = (version, summary)
+    return summary
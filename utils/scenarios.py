@@ -0,0 +1,232 @@
+"""
+Module for what-if scenarios over a project's schedule.
+
+A scenario is an overlay of task changes on top of a snapshot of the
+project. The snapshot holds read-only views of the project's tasks and is
+shared by every scenario of the project; a scenario copies a task only when
+it first changes it, so each scenario costs memory in proportion to the tasks
+it touches. The full CPM schedule is recomputed per scenario from the merged
+task list, and scenarios can be compared side by side with the current plan.
+
+Nothing is written to the database while exploring. Promoting a scenario
+turns each changed task into a change request for review.
+
+Snapshots are cached per project and keyed by Project.schedule_version, so
+scenarios opened at the same schedule version share one snapshot.
+"""
+
+import datetime
+import threading
+from types import MappingProxyType
+
+from utils.database import get_project_tasks, get_project_schedule_version
+from utils.scheduling import compute_critical_path
+from utils.change_request import create_task_change_requests
+
+# Task fields a scenario can change
+SCENARIO_FIELDS = ('start_date', 'end_date', 'dependencies', 'is_milestone', 'status', 'priority', 'progress')
+
+_snapshot_cache = {}
+_cache_lock = threading.Lock()
+
+class StaleScenarioError(ValueError):
+    """Raised when promoting a scenario whose snapshot no longer matches the project's schedule"""
+
+    def __init__(self, scenario):
+        self.scenario = scenario
+        super().__init__(f"The schedule of the project changed since scenario '{scenario.name}' was created")
+
+def _freeze(task):
+    """Read-only view of a task, with its dependencies as a tuple"""
+    task = dict(task)
+    task['dependencies'] = tuple(task.get('dependencies') or [])
+    return MappingProxyType(task)
+
+class ProjectSnapshot:
+    """Read-only tasks of a project at one schedule version"""
+
+    def __init__(self, project_id, version, tasks):
+        self.project_id = project_id
+        self.version = version
+        self.tasks = MappingProxyType({task['id']: _freeze(task) for task in tasks})
+        self._schedule = None
+
+    def schedule(self):
+        """CPM schedule of the snapshot, see compute_critical_path"""
+        if self._schedule is None:
+            self._schedule = compute_critical_path(list(self.tasks.values()))
+        return self._schedule
+
+    def is_current(self):
+        return get_project_schedule_version(self.project_id) == self.version
+
+def get_project_snapshot(project_id):
+    """Get the shared snapshot of a project's current tasks"""
+    version = get_project_schedule_version(project_id)
+    with _cache_lock:
+        cached = _snapshot_cache.get(project_id)
+    if cached and cached.version == version:
+        return cached
+
+    snapshot = ProjectSnapshot(project_id, version, get_project_tasks(project_id))
+    with _cache_lock:
+        _snapshot_cache[project_id] = snapshot
+    return snapshot
+
+class Scenario:
+    """Task changes layered over a project snapshot"""
+
+    def __init__(self, snapshot, name):
+        self.snapshot = snapshot
+        self.name = name
+        self._overlay = {}
+        self._schedule = None
+
+    def get_task(self, task_id):
+        """The task as seen in this scenario, or None"""
+        return self._overlay.get(task_id) or self.snapshot.tasks.get(task_id)
+
+    def tasks(self):
+        """All tasks as seen in this scenario"""
+        overlay = self._overlay
+        return [overlay.get(task_id, task) for task_id, task in self.snapshot.tasks.items()]
+
+    def update_task(self, task_id, changes):
+        """
+        Change fields of a task in this scenario.
+
+        Args:
+            task_id: The ID of the task
+            changes: Dictionary of new values for fields in SCENARIO_FIELDS
+
+        Raises:
+            KeyError: If the task is not in the snapshot
+            ValueError: If a field cannot be changed in a scenario
+        """
+        base = self.snapshot.tasks[task_id]
+        invalid = set(changes) - set(SCENARIO_FIELDS)
+        if invalid:
+            raise ValueError(f"Fields cannot be changed in a scenario: {', '.join(sorted(invalid))}")
+
+        # Copy the task on its first change
+        task = self._overlay.get(task_id)
+        if task is None:
+            task = dict(base)
+        task.update(changes)
+        task['dependencies'] = tuple(task.get('dependencies') or [])
+
+        if all(task.get(field) == base.get(field) for field in SCENARIO_FIELDS):
+            self._overlay.pop(task_id, None)
+        else:
+            self._overlay[task_id] = task
+        self._schedule = None
+
+    def revert_task(self, task_id):
+        """Drop the changes to a task"""
+        self._overlay.pop(task_id, None)
+        self._schedule = None
+
+    def changes(self):
+        """Changed fields of each changed task, by task ID"""
+        changes = {}
+        for task_id, task in self._overlay.items():
+            base = self.snapshot.tasks[task_id]
+            changed = {}
+            for field in SCENARIO_FIELDS:
+                if task.get(field) != base.get(field):
+                    value = task.get(field)
+                    changed[field] = list(value) if field == 'dependencies' else value
+            changes[task_id] = changed
+        return changes
+
+    def schedule(self):
+        """CPM schedule of this scenario, see compute_critical_path"""
+        if self._schedule is None:
+            self._schedule = compute_critical_path(self.tasks())
+        return self._schedule
+
+    def rebase(self):
+        """A copy of this scenario over the project's current snapshot, keeping changes to tasks that still exist"""
+        scenario = Scenario(get_project_snapshot(self.snapshot.project_id), self.name)
+        for task_id, changed in self.changes().items():
+            if task_id in scenario.snapshot.tasks:
+                scenario.update_task(task_id, changed)
+        return scenario
+
+def compare_scenarios(snapshot, scenarios):
+    """
+    Compare the schedules of scenarios with the current plan.
+
+    Args:
+        snapshot: The ProjectSnapshot the scenarios are based on
+        scenarios: List of Scenario objects
+
+    Returns:
+        Dictionary with a 'summary' row per plan (the current plan first) and
+        a 'tasks' row per task whose earliest finish differs between plans,
+        with that finish in each plan
+
+    Raises:
+        DependencyCycleError: If a plan's dependencies contain a cycle
+    """
+    plans = [("Current plan", snapshot.schedule(), {})]
+    plans += [(scenario.name, scenario.schedule(), scenario.changes()) for scenario in scenarios]
+    base_finish = snapshot.schedule()['project_finish']
+
+    summary = []
+    for name, schedule, changes in plans:
+        finish = schedule['project_finish']
+        shift = 0
+        if finish and base_finish:
+            shift = (datetime.date.fromisoformat(finish) - datetime.date.fromisoformat(base_finish)).days
+        summary.append({
+            'plan': name,
+            'changed_tasks': len(changes),
+            'project_finish': finish,
+            'duration_days': schedule['duration_days'],
+            'finish_shift_days': shift,
+            'critical_tasks': len(schedule['critical_path'])
+        })
+
+    tasks = []
+    for task_id, task in snapshot.tasks.items():
+        finishes = [schedule['tasks'].get(task_id, {}).get('early_finish') for _, schedule, _ in plans]
+        if len(set(finishes)) > 1:
+            row = {'task_id': task_id, 'task_name': task.get('name')}
+            for (name, _, _), finish in zip(plans, finishes):
+                row[name] = finish
+            tasks.append(row)
+
+    return {'summary': summary, 'tasks': tasks}
+
+def promote_scenario(scenario, user_id, change_reason=None, requires_meeting=False):
+    """
+    Submit the changes of a scenario as change requests, one per changed task.
+
+    The requests are created in one transaction, so a failed promotion
+    leaves nothing behind and can be retried.
+
+    Args:
+        scenario: The Scenario to promote
+        user_id: The ID of the user submitting the requests
+        change_reason: Optional reason given for every request
+        requires_meeting: Whether the changes need a team meeting
+
+    Returns:
+        List of the IDs of the created change requests
+
+    Raises:
+        StaleScenarioError: If the project's schedule changed since the scenario's snapshot
+        DependencyCycleError: If the scenario's dependencies contain a cycle
+        ValueError: If a changed task no longer exists
+    """
+    if not scenario.snapshot.is_current():
+        raise StaleScenarioError(scenario)
+
+    comparison = compare_scenarios(scenario.snapshot, [scenario])['summary'][-1]
+    impact = (
+        f"What-if scenario '{scenario.name}': {comparison['changed_tasks']} task(s) changed, "
+        f"project finish {comparison['project_finish']} ({comparison['finish_shift_days']:+d} days)."
+    )
+
+    return create_task_change_requests(scenario.changes(), user_id, requires_meeting, change_reason, impact)
@@ -0,0 +1,350 @@
+"""
+Module for critical path method (CPM) scheduling of project tasks.
+
+Tasks are nodes and Task.dependencies are finish-to-start edges. A single
+topological pass groups the tasks into levels, where every task comes after
+all of its predecessors; the forward and backward passes then process one
+level at a time with array operations instead of one task at a time.
+
+Offsets are whole days from the earliest planned task start. A task's planned
+start acts as a "start no earlier than" constraint, and durations follow the
+rest of the app: end date minus start date plus one day, with milestones
+taking no time.
+
+Delays are propagated over the planned dates: a delayed task pushes each
+successor only by the part of the delay that the gap between them cannot
+absorb, and the push continues downstream until the gaps absorb it entirely.
+Delays and gaps are counted in working days of the project calendar.
+
+Schedules and dependency indexes are cached per project and keyed by
+Project.schedule_version, which the task create, update and delete functions
+bump.
+"""
+
+import heapq
+import datetime
+import threading
+
+import numpy as np
+
+from utils.database import get_project_tasks, get_project_schedule_version
+
+class DependencyCycleError(ValueError):
+    """Raised when task dependencies form a cycle"""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__("Task dependencies form a cycle: " + " -> ".join(str(task_id) for task_id in cycle))
+
+_schedule_cache = {}
+_index_cache = {}
+_cache_lock = threading.Lock()
+
+def _gather_ranges(starts, lengths):
+    """Indices of the concatenated ranges [start, start + length)"""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(total) - np.repeat(offsets, lengths) + np.repeat(starts, lengths)
+
+def _find_cycle(task_ids, remaining, predecessors, successors):
+    """Find one dependency cycle among the tasks left over by the topological pass"""
+    remaining = set(int(i) for i in remaining)
+    incoming = {}
+    for pred, succ in zip(predecessors, successors):
+        if int(pred) in remaining and int(succ) in remaining:
+            incoming.setdefault(int(succ), []).append(int(pred))
+
+    # Every leftover task still has a leftover predecessor, so walking
+    # backwards must eventually repeat a task
+    node = min(remaining)
+    seen = {}
+    path = []
+    while node not in seen:
+        seen[node] = len(path)
+        path.append(node)
+        node = incoming[node][0]
+    cycle = path[seen[node]:] + [node]
+    return [task_ids[i] for i in reversed(cycle)]
+
+def topological_levels(task_ids, predecessors, successors):
+    """
+    Group tasks into dependency levels.
+
+    Args:
+        task_ids: List of task IDs, indexed by node position
+        predecessors: Array of predecessor node positions, one per edge
+        successors: Array of successor node positions, one per edge
+
+    Returns:
+        Array with the level of each node; a node's level is greater than those of its predecessors
+
+    Raises:
+        DependencyCycleError: If the dependencies contain a cycle
+    """
+    count = len(task_ids)
+    levels = np.full(count, -1, dtype=np.int64)
+    indegree = np.bincount(successors, minlength=count)
+
+    # Outgoing edges of each node as contiguous ranges
+    order = np.argsort(predecessors, kind='stable')
+    targets = successors[order]
+    out_degree = np.bincount(predecessors, minlength=count)
+    out_start = np.cumsum(out_degree) - out_degree
+
+    frontier = np.flatnonzero(indegree == 0)
+    level = 0
+    while frontier.size:
+        levels[frontier] = level
+        reached = targets[_gather_ranges(out_start[frontier], out_degree[frontier])]
+        np.subtract.at(indegree, reached, 1)
+        frontier = np.unique(reached[indegree[reached] == 0])
+        level += 1
+
+    remaining = np.flatnonzero(levels < 0)
+    if remaining.size:
+        raise DependencyCycleError(_find_cycle(task_ids, remaining, predecessors, successors))
+    return levels
+
+def dependency_edges(tasks, positions):
+    """Predecessor and successor node positions of all dependencies within the tasks"""
+    edges = set()
+    for task in tasks:
+        succ = positions[task['id']]
+        for dep_id in task.get('dependencies') or []:
+            if dep_id in positions:
+                edges.add((positions[dep_id], succ))
+
+    if not edges:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    pairs = np.array(sorted(edges), dtype=np.int64)
+    return pairs[:, 0], pairs[:, 1]
+
+def compute_critical_path(tasks):
+    """
+    Compute the CPM schedule of a set of tasks.
+
+    Args:
+        tasks: List of task dictionaries with id, start_date, end_date and dependencies
+
+    Returns:
+        Dictionary with the schedule of each task by ID, the critical task IDs
+        in schedule order, and the project start, finish and duration
+
+    Raises:
+        DependencyCycleError: If the dependencies contain a cycle
+    """
+    tasks = [task for task in tasks if task.get('start_date') and task.get('end_date')]
+    if not tasks:
+        return {'tasks': {}, 'critical_path': [], 'project_start': None, 'project_finish': None, 'duration_days': 0}
+
+    task_ids = [task['id'] for task in tasks]
+    positions = {task_id: i for i, task_id in enumerate(task_ids)}
+    predecessors, successors = dependency_edges(tasks, positions)
+    levels = topological_levels(task_ids, predecessors, successors)
+
+    planned_start = np.array([task['start_date'] for task in tasks], dtype='datetime64[D]')
+    planned_end = np.array([task['end_date'] for task in tasks], dtype='datetime64[D]')
+    milestone = np.array([bool(task.get('is_milestone')) for task in tasks])
+
+    origin = planned_start.min()
+    constraint = (planned_start - origin).astype(np.int64)
+    duration = np.maximum((planned_end - planned_start).astype(np.int64) + 1, 1)
+    duration[milestone] = 0
+
+    # Nodes and edges grouped by level: edges by successor level for the
+    # forward pass and by predecessor level for the backward pass
+    level_count = int(levels.max()) + 1
+    nodes_by_level = np.split(np.argsort(levels, kind='stable'), np.cumsum(np.bincount(levels, minlength=level_count))[:-1])
+    in_order = np.argsort(levels[successors], kind='stable')
+    in_edges = np.split(in_order, np.cumsum(np.bincount(levels[successors], minlength=level_count))[:-1])
+    out_order = np.argsort(levels[predecessors], kind='stable')
+    out_edges = np.split(out_order, np.cumsum(np.bincount(levels[predecessors], minlength=level_count))[:-1])
+
+    # Forward pass: earliest start is the latest predecessor finish, or the planned start
+    early_start = constraint.copy()
+    early_finish = np.zeros_like(early_start)
+    for level in range(level_count):
+        edges = in_edges[level]
+        np.maximum.at(early_start, successors[edges], early_finish[predecessors[edges]])
+        nodes = nodes_by_level[level]
+        early_finish[nodes] = early_start[nodes] + duration[nodes]
+
+    project_finish = int(early_finish.max())
+
+    # Backward pass: latest finish is the earliest successor latest start
+    late_finish = np.full_like(early_start, project_finish)
+    late_start = np.zeros_like(early_start)
+    for level in range(level_count - 1, -1, -1):
+        edges = out_edges[level]
+        np.minimum.at(late_finish, predecessors[edges], late_start[successors[edges]])
+        nodes = nodes_by_level[level]
+        late_start[nodes] = late_finish[nodes] - duration[nodes]
+
+    total_float = late_start - early_start
+
+    # Free float: delay possible without moving any successor's earliest start
+    next_start = np.full_like(early_start, project_finish)
+    np.minimum.at(next_start, predecessors, early_start[successors])
+    free_float = next_start - early_finish
+
+    critical = total_float == 0
+
+    def to_date(offsets):
+        return (origin + offsets.astype('timedelta64[D]')).astype(str).tolist()
+
+    # Finish dates are inclusive, so a task finishes on the day before its finish offset
+    early_start_dates = to_date(early_start)
+    early_finish_dates = to_date(np.maximum(early_finish - 1, early_start))
+    late_start_dates = to_date(late_start)
+    late_finish_dates = to_date(np.maximum(late_finish - 1, late_start))
+
+    schedule = {}
+    for i, task_id in enumerate(task_ids):
+        schedule[task_id] = {
+            'early_start': early_start_dates[i],
+            'early_finish': early_finish_dates[i],
+            'late_start': late_start_dates[i],
+            'late_finish': late_finish_dates[i],
+            'duration_days': int(duration[i]),
+            'total_float': int(total_float[i]),
+            'free_float': int(free_float[i]),
+            'is_critical': bool(critical[i])
+        }
+
+    critical_order = np.flatnonzero(critical)
+    critical_order = critical_order[np.lexsort((early_finish[critical_order], early_start[critical_order]))]
+
+    return {
+        'tasks': schedule,
+        'critical_path': [task_ids[i] for i in critical_order],
+        'project_start': str(origin),
+        'project_finish': str(origin + np.timedelta64(max(project_finish - 1, 0), 'D')),
+        'duration_days': project_finish
+    }
+
+def _get_cached(cache, project_id, build):
+    """Get a value computed from a project's tasks, rebuilding it when the schedule version changes"""
+    version = get_project_schedule_version(project_id)
+    with _cache_lock:
+        cached = cache.get(project_id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    value = build(get_project_tasks(project_id))
+    with _cache_lock:
+        cache[project_id] = (version, value)
+    return value
+
+def get_project_schedule(project_id):
+    """
+    Get the CPM schedule of a project, computing it only when tasks have changed.
+
+    Args:
+        project_id: The ID of the project
+
+    Returns:
+        The schedule as returned by compute_critical_path
+
+    Raises:
+        DependencyCycleError: If the project's dependencies contain a cycle
+    """
+    return _get_cached(_schedule_cache, project_id, compute_critical_path)
+
+def build_dependency_index(tasks, calendar=None):
+    """
+    Build the successor adjacency index of a set of tasks.
+
+    Args:
+        tasks: List of task dictionaries with id, name, start_date, end_date and dependencies
+        calendar: Optional WorkCalendar to number days by; without one every day counts
+
+    Returns:
+        Dictionary with the task IDs, names, planned dates, the planned dates
+        as day numbers, the successors of each task as contiguous ranges, and
+        the dependency levels
+
+    Raises:
+        DependencyCycleError: If the dependencies contain a cycle
+    """
+    tasks = [task for task in tasks if task.get('start_date') and task.get('end_date')]
+    task_ids = [task['id'] for task in tasks]
+    positions = {task_id: i for i, task_id in enumerate(task_ids)}
+    predecessors, successors = dependency_edges(tasks, positions)
+    levels = topological_levels(task_ids, predecessors, successors)
+
+    order = np.argsort(predecessors, kind='stable')
+    out_degree = np.bincount(predecessors, minlength=len(task_ids))
+
+    start_dates = [task['start_date'] for task in tasks]
+    end_dates = [task['end_date'] for task in tasks]
+    if calendar is not None:
+        # A task starts on its first working day and ends on its last
+        start = calendar.day_numbers(start_dates).tolist()
+        end = calendar.last_day_numbers(end_dates).tolist()
+    else:
+        start = [datetime.date.fromisoformat(date).toordinal() for date in start_dates]
+        end = [datetime.date.fromisoformat(date).toordinal() for date in end_dates]
+
+    return {
+        'task_ids': task_ids,
+        'positions': positions,
+        'names': [task.get('name') for task in tasks],
+        'start_dates': start_dates,
+        'end_dates': end_dates,
+        'start': start,
+        'end': end,
+        'succ_start': (np.cumsum(out_degree) - out_degree).tolist(),
+        'succ_count': out_degree.tolist(),
+        'successors': successors[order].tolist(),
+        'levels': levels.tolist()
+    }
+
+def get_dependency_index(project_id):
+    """Get the cached dependency index of a project over its working-day calendar, see build_dependency_index"""
+    from utils.work_calendar import get_project_calendar
+    calendar = get_project_calendar(project_id)
+    return _get_cached(_index_cache, project_id, lambda tasks: build_dependency_index(tasks, calendar))
+
+def propagate_delay(index, task_id, delay_days):
+    """
+    Find every downstream task that a delay of one task's end pushes back.
+
+    A successor absorbs as much of its predecessor's delay as the gap between
+    the predecessor's end and its own start; tasks that already overlap their
+    predecessor keep that overlap and absorb nothing.
+
+    Args:
+        index: A dependency index from build_dependency_index
+        task_id: The ID of the delayed task
+        delay_days: How many days (counted like the index's day numbers) later the task will end
+
+    Returns:
+        Dictionary mapping node positions of the impacted tasks (excluding the delayed task) to their delay in days
+    """
+    source = index['positions'].get(task_id)
+    if source is None or delay_days <= 0:
+        return {}
+
+    start, end, levels = index['start'], index['end'], index['levels']
+    succ_start, succ_count, successors = index['succ_start'], index['succ_count'], index['successors']
+
+    # Visit tasks in level order so a task's delay is final once all its predecessors are done
+    delays = {source: delay_days}
+    queue = [(levels[source], source)]
+    while queue:
+        _, node = heapq.heappop(queue)
+        delay = delays[node]
+        for position in range(succ_start[node], succ_start[node] + succ_count[node]):
+            succ = successors[position]
+            slack = max(start[succ] - end[node] - 1, 0)
+            pushed = delay - slack
+            if pushed > 0 and pushed > delays.get(succ, 0):
+                if succ not in delays:
+                    heapq.heappush(queue, (levels[succ], succ))
+                delays[succ] = pushed
+
+    del delays[source]
+    return delays
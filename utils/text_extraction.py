@@ -0,0 +1,113 @@
+"""
+Module for extracting searchable text from uploaded documents in the background.
+
+Extraction runs in a small worker pool so uploads return as soon as the file
+is stored. All extractors work offline; PDF text is read with pypdf.
+"""
+
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.database import update_document, get_documents_by_text_status
+from utils.document_store import get_content_path, document_content_exists
+
+# Extracted text beyond this length is not stored
+MAX_EXTRACTED_CHARS = 1_000_000
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="text-extraction")
+_resumed = False
+_resume_lock = threading.Lock()
+
+def extract_plain_text(path):
+    """Extract text from a plain text or CSV file"""
+    with open(path, "rb") as f:
+        content = f.read(MAX_EXTRACTED_CHARS * 4)
+    return content.decode("utf-8", errors="replace")
+
+def extract_pdf_text(path):
+    """Extract text from a PDF file"""
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    pages = []
+    length = 0
+    for page in reader.pages:
+        page_text = page.extract_text() or ""
+        pages.append(page_text)
+        length += len(page_text)
+        if length >= MAX_EXTRACTED_CHARS:
+            break
+    return "\n".join(pages)
+
+def extract_docx_text(path):
+    """Extract paragraph text from a Word (.docx) file"""
+    with zipfile.ZipFile(path) as archive:
+        with archive.open("word/document.xml") as f:
+            tree = ET.parse(f)
+
+    paragraphs = []
+    for paragraph in tree.iter(f"{WORD_NAMESPACE}p"):
+        runs = [node.text for node in paragraph.iter(f"{WORD_NAMESPACE}t") if node.text]
+        if runs:
+            paragraphs.append("".join(runs))
+    return "\n".join(paragraphs)
+
+EXTRACTORS = {
+    "txt": extract_plain_text,
+    "csv": extract_plain_text,
+    "pdf": extract_pdf_text,
+    "docx": extract_docx_text,
+}
+
+def extract_document_text(document_id, content_hash, file_type):
+    """
+    Extract the text of a stored document and save it on the document.
+
+    Args:
+        document_id: The ID of the document
+        content_hash: The content hash of the stored file
+        file_type: The file extension, e.g. 'pdf'
+
+    Returns:
+        The resulting text status
+    """
+    extractor = EXTRACTORS.get((file_type or "").lower())
+    if extractor is None or not document_content_exists(content_hash):
+        update_document(document_id, {'text_status': 'Unsupported'})
+        return 'Unsupported'
+
+    try:
+        text = extractor(get_content_path(content_hash))
+    except Exception as e:
+        print(f"Error extracting text from document {document_id}: {e}")
+        update_document(document_id, {'text_status': 'Failed'})
+        return 'Failed'
+
+    # PostgreSQL text columns cannot hold null characters
+    text = text[:MAX_EXTRACTED_CHARS].replace("\x00", "")
+    update_document(document_id, {'extracted_text': text, 'text_status': 'Extracted'})
+    return 'Extracted'
+
+def submit_text_extraction(document_id, content_hash, file_type):
+    """Queue text extraction for a document and return the future"""
+    return _executor.submit(extract_document_text, document_id, content_hash, file_type)
+
+def resume_pending_extractions():
+    """
+    Queue extraction for documents left pending, e.g. by a restart.
+
+    Runs once per process; documents uploaded afterwards are queued by their
+    upload, so later calls return 0.
+    """
+    global _resumed
+    with _resume_lock:
+        if _resumed:
+            return 0
+        _resumed = True
+    pending_documents = get_documents_by_text_status('Pending')
+    for doc in pending_documents:
+        submit_text_extraction(doc['id'], doc['content_hash'], doc['file_type'])
+    return len(pending_documents)
@@ -5,6 +5,7 @@ import numpy as np
 import datetime
 import streamlit as st
 from utils.data_management import get_project_tasks
+from utils.work_calendar import get_project_calendar
 
 # Create chart for project statuses
 def create_project_status_chart(projects):
@@ -87,13 +88,7 @@ def create_gantt_chart(project_id, tasks):
             'Status': task['status'],
             'Progress': task.get('progress', 0),
             'ID': task['id'],
-            # 'Milestone': task.get('is_milestone', False)  # Add default value
-            # Safeguard for missing 'Milestone' column
-            if 'Milestone' in df.columns:
-                milestones = df[df['Milestone']]
-            else:
-                milestones = None  # Or handle it differently if milestones are crucial
-            
+            'Milestone': bool(task.get('is_milestone', False))
         }
         for task in tasks
     ])
@@ -157,11 +152,36 @@ def create_gantt_chart(project_id, tasks):
     return fig
 
 # Create burndown chart
-def create_burndown_chart(project_id, tasks):
-    if not tasks:
-        return None
-    
-    # Get project information
+# Horizons longer than these many days are drawn with weekly or monthly points
+WEEKLY_POINTS_AFTER_DAYS = 180
+MONTHLY_POINTS_AFTER_DAYS = 1095
+
+def downsample_series(dates, *series):
+    """
+    Thin out daily series over long horizons, keeping the last value of each week or month.
+
+    Args:
+        dates: Array of datetime64[D] dates, one per day
+        *series: Arrays of values aligned with dates
+
+    Returns:
+        Tuple of the kept dates followed by the kept values of each series
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if len(dates) > MONTHLY_POINTS_AFTER_DAYS:
+        periods = dates.astype('datetime64[M]')
+    elif len(dates) > WEEKLY_POINTS_AFTER_DAYS:
+        periods = dates.astype('datetime64[W]')
+    else:
+        return (dates,) + tuple(np.asarray(values) for values in series)
+    
+    # The first day, then the last day of every period
+    keep = np.r_[periods[1:] != periods[:-1], True]
+    keep[0] = True
+    return (dates[keep],) + tuple(np.asarray(values)[keep] for values in series)
+
+def _burn_series(project_id, tasks):
+    """Daily ideal and actual remaining task counts over the project window, or None"""
     project = None
     for p in st.session_state.projects:
         if p['id'] == project_id:
@@ -171,69 +191,202 @@ def create_burndown_chart(project_id, tasks):
     if not project:
         return None
     
-    # Extract start and end dates
-    start_date = datetime.datetime.strptime(project['start_date'], '%Y-%m-%d')
-    end_date = datetime.datetime.strptime(project['end_date'], '%Y-%m-%d')
-    
-    # Calculate total days
-    total_days = (end_date - start_date).days + 1
+    start_date = np.datetime64(project['start_date'], 'D')
+    end_date = np.datetime64(project['end_date'], 'D')
+    total_days = int((end_date - start_date).astype(np.int64)) + 1
     if total_days <= 0:
         return None
     
-    # Calculate total work and work completed
+    dates = start_date + np.arange(total_days)
     total_work = len(tasks)
     
-    # Create DataFrame with date range
-    date_range = pd.date_range(start=start_date, end=end_date)
-    df = pd.DataFrame(date_range, columns=['date'])
-    
-    # Calculate ideal burndown line
-    df['ideal_remaining'] = [total_work - (i * total_work / total_days) for i in range(len(df))]
+    # The ideal line only burns down on the project's working days
+    working = get_project_calendar(project_id).is_working(dates)
+    working_total = int(working.sum())
+    if working_total:
+        elapsed = np.cumsum(working) - working
+        ideal_remaining = total_work - elapsed * total_work / working_total
+    else:
+        ideal_remaining = total_work - np.arange(total_days) * total_work / total_days
+    
+    # A task is remaining on every day up to its end date, except that a
+    # completed task only counts on its end date itself
+    dated = [task for task in tasks if task.get('end_date')]
+    task_end = np.array([task['end_date'] for task in dated], dtype='datetime64[D]')
+    completed = np.array([task['status'] == 'Completed' for task in dated], dtype=bool)
+    
+    open_end = np.sort(task_end[~completed])
+    actual_remaining = len(open_end) - np.searchsorted(open_end, dates, side='left')
+    
+    completed_offsets = (task_end[completed] - start_date).astype(np.int64)
+    completed_offsets = completed_offsets[(completed_offsets >= 0) & (completed_offsets < total_days)]
+    actual_remaining = actual_remaining + np.bincount(completed_offsets, minlength=total_days)
+    
+    return dates, total_work, ideal_remaining, actual_remaining
+
+def _burn_layout(fig, title, yaxis_title):
+    fig.update_layout(
+        title=title,
+        xaxis_title="Date",
+        yaxis_title=yaxis_title,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+    return fig
+
+def create_burndown_chart(project_id, tasks):
+    if not tasks:
+        return None
     
-    # Calculate actual burndown based on task completion
-    actual_remaining = []
-    for date in df['date']:
-        remaining = sum(1 for task in tasks if 
-                        datetime.datetime.strptime(task['end_date'], '%Y-%m-%d') >= date and
-                        (task['status'] != 'Completed' or 
-                         datetime.datetime.strptime(task['end_date'], '%Y-%m-%d').date() == date.date()))
-        actual_remaining.append(remaining)
+    burn = _burn_series(project_id, tasks)
+    if burn is None:
+        return None
     
-    df['actual_remaining'] = actual_remaining
+    dates, _, ideal_remaining, actual_remaining = burn
+    dates, ideal_remaining, actual_remaining = downsample_series(dates, ideal_remaining, actual_remaining)
     
     # Create burndown chart
     fig = go.Figure()
     
     fig.add_trace(go.Scatter(
-        x=df['date'],
-        y=df['ideal_remaining'],
+        x=dates,
+        y=ideal_remaining,
         mode='lines',
         name='Ideal Burndown',
         line=dict(color='green', dash='dash')
     ))
     
     fig.add_trace(go.Scatter(
-        x=df['date'],
-        y=df['actual_remaining'],
+        x=dates,
+        y=actual_remaining,
         mode='lines+markers',
         name='Actual Burndown',
         line=dict(color='blue')
     ))
     
-    # Update layout
+    return _burn_layout(fig, "Project Burndown Chart", "Remaining Tasks")
+
+def create_burnup_chart(project_id, tasks):
+    if not tasks:
+        return None
+    
+    burn = _burn_series(project_id, tasks)
+    if burn is None:
+        return None
+    
+    dates, total_work, ideal_remaining, actual_remaining = burn
+    dates, ideal_done, actual_done = downsample_series(dates, total_work - ideal_remaining, total_work - actual_remaining)
+    
+    # Create burnup chart
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(
+        x=dates,
+        y=np.full(len(dates), total_work),
+        mode='lines',
+        name='Total Scope',
+        line=dict(color='grey')
+    ))
+    
+    fig.add_trace(go.Scatter(
+        x=dates,
+        y=ideal_done,
+        mode='lines',
+        name='Ideal Burnup',
+        line=dict(color='green', dash='dash')
+    ))
+    
+    fig.add_trace(go.Scatter(
+        x=dates,
+        y=actual_done,
+        mode='lines+markers',
+        name='Actual Burnup',
+        line=dict(color='blue')
+    ))
+    
+    return _burn_layout(fig, "Project Burnup Chart", "Completed Tasks")
+
+def create_progress_history_chart(burndown):
+    """Chart the recorded remaining and completed tasks of a history from get_burndown_history"""
+    dates, remaining, completed = downsample_series(burndown['dates'], burndown['remaining'], burndown['completed'])
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(
+        x=dates,
+        y=remaining,
+        mode='lines',
+        name='Remaining Tasks',
+        line=dict(color='blue')
+    ))
+    
+    fig.add_trace(go.Scatter(
+        x=dates,
+        y=completed,
+        mode='lines',
+        name='Completed Tasks',
+        line=dict(color='green')
+    ))
+    
+    return _burn_layout(fig, "Recorded Burndown", "Tasks")
+
+def create_velocity_chart(period_starts, completed):
+    """Bar chart of tasks completed per period, see progress_history.get_velocity"""
+    fig = go.Figure(go.Bar(x=period_starts, y=completed, name='Completed Tasks', marker_color='royalblue'))
+    fig.update_layout(title="Velocity", xaxis_title="Period Starting", yaxis_title="Tasks Completed")
+    return fig
+
+def create_baseline_chart(variance, task_names, max_tasks=40):
+    """
+    Bar chart of baseline against current dates for the tasks that moved most.
+
+    Args:
+        variance: A comparison from baselines.compute_variance
+        task_names: Dictionary mapping task IDs to names
+        max_tasks: Maximum number of tasks to draw
+
+    Returns:
+        A Plotly figure, or None if no task has dates in both plans
+    """
+    dated = ~(np.isnat(variance['baseline_start']) | np.isnat(variance['baseline_finish']) |
+              np.isnat(variance['current_start']) | np.isnat(variance['current_finish']))
+    rows = np.flatnonzero(dated)
+    if not rows.size:
+        return None
+    
+    # Largest finish slips first, then shown in current start order
+    rows = rows[np.argsort(-np.abs(variance['finish_variance'][rows]), kind='stable')[:max_tasks]]
+    rows = rows[np.argsort(variance['current_start'][rows], kind='stable')]
+    labels = [task_names.get(int(task_id), f"Task #{task_id}") for task_id in variance['task_id'][rows]]
+    
+    day = np.timedelta64(1, 'D')
+    fig = go.Figure()
+    for schedule, color in (('baseline', 'lightgrey'), ('current', 'royalblue')):
+        start = variance[f'{schedule}_start'][rows]
+        finish = variance[f'{schedule}_finish'][rows]
+        # Bars span whole days, from the start to the end of the finish date
+        length_ms = ((finish - start + day) / np.timedelta64(1, 'ms')).astype(np.int64)
+        fig.add_trace(go.Bar(
+            y=labels,
+            x=length_ms,
+            base=start.astype(str),
+            orientation='h',
+            name=schedule.capitalize(),
+            marker_color=color
+        ))
+    
     fig.update_layout(
-        title="Project Burndown Chart",
-        xaxis_title="Date",
-        yaxis_title="Remaining Tasks",
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        )
+        title="Baseline vs Current Schedule",
+        barmode='group',
+        xaxis=dict(type='date', title="Date"),
+        yaxis=dict(autorange='reversed'),
+        height=max(300, 40 * len(rows) + 150)
     )
-    
     return fig
 
 # Create team allocation chart
@@ -275,6 +428,48 @@ def create_team_allocation_chart(team_members):
     
     return fig
 
+# Create heatmap of team member workload per day
+def create_workload_heatmap(matrix, members, start_date, end_date, capacity=1.0):
+    if not members:
+        return None
+    
+    # Limit the matrix to the selected window
+    load = matrix.window(start_date, end_date)
+    if not load.size:
+        return None
+    
+    first = max(int((np.datetime64(start_date, 'D') - matrix.start).astype(np.int64)), 0)
+    dates = pd.to_datetime(matrix.dates[first:first + load.shape[1]])
+    names = [member['name'] for member in members]
+    
+    # Green up to capacity, shading to red beyond it
+    zmax = max(float(load.max()) if load.size else 0.0, capacity * 2)
+    fig = go.Figure(data=go.Heatmap(
+        z=load,
+        x=dates,
+        y=names,
+        zmin=0,
+        zmax=zmax,
+        colorscale=[
+            [0.0, 'white'],
+            [capacity / zmax * 0.5, 'lightgreen'],
+            [capacity / zmax, 'gold'],
+            [1.0, 'crimson']
+        ],
+        colorbar=dict(title="Assignments"),
+        hovertemplate="%{y}<br>%{x|%Y-%m-%d}<br>Assignments: %{z}<extra></extra>"
+    ))
+    
+    fig.update_layout(
+        title="Team Workload",
+        xaxis_title="Date",
+        yaxis_title="Team Member",
+        height=250 + len(names) * 25
+    )
+    fig.update_yaxes(autorange="reversed")
+    
+    return fig
+
 # Create project progress chart
 def create_project_progress_chart(project_id, tasks):
     if not tasks:
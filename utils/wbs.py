@@ -0,0 +1,57 @@
+"""
+Module for presenting a project's work breakdown structure (WBS).
+
+The WBS is stored as nodes plus a closure table of every ancestor/descendant
+pair (see utils.database), so subtree queries, rollups and moves each take a
+single statement. Tasks start at the top level with their subtasks below
+them, which keeps the Task and Subtask accessors working unchanged. Summary
+work packages group tasks under higher-level deliverables at any depth, and
+work packages can also be nested to any depth below a task or subtask.
+
+This module turns the flat node list of a project into an outline with WBS
+codes (1, 1.2, 1.2.3) and progress rolled up from the leaves.
+"""
+
+from utils.database import get_project_wbs
+
+def build_wbs_outline(nodes):
+    """
+    Arrange WBS nodes as an outline.
+
+    Args:
+        nodes: List of node dictionaries with id, parent_id and progress
+
+    Returns:
+        List of node dictionaries in depth-first order, each with its 'code',
+        'level', 'kind' ('Task', 'Subtask' or 'Work Package'), 'leaf_count' and
+        'rolled_up_progress' (the average progress of the leaves below it)
+    """
+    children = {}
+    for node in nodes:
+        children.setdefault(node['parent_id'], []).append(node)
+    for siblings in children.values():
+        siblings.sort(key=lambda node: node['id'])
+
+    outline = []
+    stack = [(node, str(i + 1), 0) for i, node in reversed(list(enumerate(children.get(None, []))))]
+    while stack:
+        node, code, level = stack.pop()
+        kind = 'Task' if node.get('task_id') else 'Subtask' if node.get('subtask_id') else 'Work Package'
+        outline.append(dict(node, code=code, level=level, kind=kind))
+        for i, child in reversed(list(enumerate(children.get(node['id'], [])))):
+            stack.append((child, f"{code}.{i + 1}", level + 1))
+
+    # Roll progress up from the leaves, deepest nodes first
+    totals = {}
+    for entry in reversed(outline):
+        leaf_sum, leaf_count = totals.pop(entry['id'], (entry['progress'] or 0, 1))
+        entry['leaf_count'] = leaf_count
+        entry['rolled_up_progress'] = leaf_sum / leaf_count
+        if entry['parent_id'] is not None:
+            parent_sum, parent_count = totals.get(entry['parent_id'], (0, 0))
+            totals[entry['parent_id']] = (parent_sum + leaf_sum, parent_count + leaf_count)
+    return outline
+
+def get_wbs_outline(project_id):
+    """Get the WBS outline of a project, see build_wbs_outline"""
+    return build_wbs_outline(get_project_wbs(project_id))
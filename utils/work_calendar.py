@@ -0,0 +1,89 @@
+"""
+Module for working-day calendars and date arithmetic over them.
+
+A project calendar is a workweek (which weekdays are worked) plus a list of
+holidays. It wraps a NumPy business-day calendar, which precomputes the
+weekmask and sorted holidays once, so counting working days, numbering them
+and shifting dates by working days are array operations over any number of
+dates.
+
+Calendars are cached per project and keyed by Project.schedule_version,
+which update_project bumps when a calendar changes.
+"""
+
+import threading
+
+import numpy as np
+
+from utils.database import get_project, get_project_schedule_version
+
+# Monday to Friday, as a NumPy weekmask starting on Monday
+DEFAULT_WORK_DAYS = '1111100'
+
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# Working days are numbered from this date
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+class WorkCalendar:
+    """Workweek and holidays of a project"""
+
+    def __init__(self, work_days=None, holidays=None):
+        if not work_days or len(work_days) != 7 or '1' not in work_days:
+            work_days = DEFAULT_WORK_DAYS
+        self.work_days = work_days
+        self.holidays = sorted(set(holidays or []))
+        self.busdaycal = np.busdaycalendar(weekmask=work_days, holidays=self.holidays)
+
+    def is_working(self, dates):
+        """Whether each date is a working day"""
+        return np.is_busday(np.asarray(dates, dtype='datetime64[D]'), busdaycal=self.busdaycal)
+
+    def day_numbers(self, dates):
+        """Number of working days before each date; a working day's number is its index"""
+        return np.busday_count(_EPOCH, np.asarray(dates, dtype='datetime64[D]'), busdaycal=self.busdaycal)
+
+    def last_day_numbers(self, dates):
+        """Number of the last working day on or before each date"""
+        return self.day_numbers(np.asarray(dates, dtype='datetime64[D]') + 1) - 1
+
+    def working_days(self, start_dates, end_dates):
+        """Number of working days from each start date to each end date, both inclusive"""
+        start_dates = np.asarray(start_dates, dtype='datetime64[D]')
+        end_dates = np.asarray(end_dates, dtype='datetime64[D]')
+        return np.maximum(np.busday_count(start_dates, end_dates + 1, busdaycal=self.busdaycal), 0)
+
+    def shift(self, dates, days, roll='forward'):
+        """
+        Move dates by a number of working days.
+
+        Args:
+            dates: Dates to move
+            days: Working days to move each date by
+            roll: How to treat dates that are not working days before moving: 'forward' to the
+                next working day, 'backward' to the previous one
+
+        Returns:
+            Array of datetime64[D] dates
+        """
+        return np.busday_offset(np.asarray(dates, dtype='datetime64[D]'), days, roll=roll, busdaycal=self.busdaycal)
+
+    def work_day_names(self):
+        return [name for name, flag in zip(WEEKDAY_NAMES, self.work_days) if flag == '1']
+
+def get_project_calendar(project_id):
+    """Get the working-day calendar of a project, or the default calendar if it has none"""
+    version = get_project_schedule_version(project_id)
+    with _cache_lock:
+        cached = _cache.get(project_id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    project = get_project(project_id) or {}
+    calendar = WorkCalendar(project.get('work_days'), project.get('holidays'))
+    with _cache_lock:
+        _cache[project_id] = (version, calendar)
+    return calendar
@@ -0,0 +1,266 @@
+"""
+Module for computing team member workload over time.
+
+The workload is a member x day matrix of concurrent assignments. Every task or
+subtask adds one to the load of each assigned member on each day from its
+start to its end date. The matrix is built with difference arrays: an
+assignment adds at its start day and subtracts after its end day, and a
+cumulative sum along the days gives the load, so the cost does not depend on
+how long assignments last. A member assigned to subtasks of a task is counted
+through those subtasks only, so the same work is not counted twice.
+
+Matrices are cached per project and for the whole portfolio, keyed by the
+schedule versions of the projects. Changes made through data_management are
+applied to cached matrices in place.
+"""
+
+import threading
+
+import numpy as np
+
+from utils.database import (
+    get_workload_assignments, get_schedule_versions, get_project_schedule_version,
+    get_project_team, get_all_team_members, get_task, get_subtasks_by_parent
+)
+
+# Members with more concurrent assignments than this are over-allocated
+DEFAULT_CAPACITY = 1.0
+
+# Cache key of the portfolio matrix; project matrices are keyed by project ID
+PORTFOLIO = 'portfolio'
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _assignment_entries(tasks, subtasks):
+    """Flatten tasks and subtasks into (start_date, end_date, member_ids) entries"""
+    subtask_members = {}
+    for subtask in subtasks:
+        subtask_members.setdefault(subtask['parent_task_id'], set()).update(subtask.get('assigned_members') or [])
+
+    entries = []
+    for task in tasks:
+        covered = subtask_members.get(task['id'], set())
+        members = [m for m in (task.get('assigned_members') or []) if m not in covered]
+        if members and task.get('start_date') and task.get('end_date'):
+            entries.append((task['start_date'], task['end_date'], members))
+    for subtask in subtasks:
+        members = subtask.get('assigned_members') or []
+        if members and subtask.get('start_date') and subtask.get('end_date'):
+            entries.append((subtask['start_date'], subtask['end_date'], members))
+    return entries
+
+class WorkloadMatrix:
+    """Daily load of a set of team members over a date window"""
+
+    def __init__(self, member_ids, start, load):
+        self.member_ids = list(member_ids)
+        self.positions = {member_id: i for i, member_id in enumerate(self.member_ids)}
+        self.start = np.datetime64(start, 'D')
+        self.load = load
+
+    @property
+    def dates(self):
+        return self.start + np.arange(self.load.shape[1])
+
+    def _offsets(self, start_date, end_date):
+        first = int((np.datetime64(start_date, 'D') - self.start).astype(np.int64))
+        last = int((np.datetime64(end_date, 'D') - self.start).astype(np.int64))
+        return first, last
+
+    def covers_range(self, start_date, end_date):
+        """Whether the days from start_date to end_date fall within the window of this matrix"""
+        first, last = self._offsets(start_date, end_date)
+        return first >= 0 and last < self.load.shape[1]
+
+    def covers(self, entries):
+        """Whether the assignment entries fall within the window of this matrix"""
+        return all(self.covers_range(start_date, end_date) for start_date, end_date, _ in entries)
+
+    def apply(self, entries, sign):
+        """Add (sign=1) or remove (sign=-1) assignment entries"""
+        for start_date, end_date, members in entries:
+            rows = [self.positions[m] for m in members if m in self.positions]
+            first, last = self._offsets(start_date, end_date)
+            if rows and last >= first:
+                self.load[rows, first:last + 1] += sign
+
+    def window(self, start_date=None, end_date=None):
+        """The load columns from start_date to end_date, clipped to the matrix window"""
+        days = self.load.shape[1]
+        first = max(self._offsets(start_date, start_date)[0], 0) if start_date else 0
+        last = min(self._offsets(end_date, end_date)[0], days - 1) if end_date else days - 1
+        return self.load[:, first:max(last + 1, first)]
+
+    def overallocation(self, capacity=DEFAULT_CAPACITY, start_date=None, end_date=None):
+        """
+        Summarize over-allocation per member.
+
+        Args:
+            capacity: The number of concurrent assignments a member can handle
+            start_date: Optional first day to consider
+            end_date: Optional last day to consider
+
+        Returns:
+            List of dictionaries with member_id, days_over and peak_load, for members over capacity on any day
+        """
+        load = self.window(start_date, end_date)
+        days_over = (load > capacity).sum(axis=1)
+        peak = load.max(axis=1) if load.size else np.zeros(len(self.member_ids))
+        return [
+            {
+                'member_id': self.member_ids[i],
+                'days_over': int(days_over[i]),
+                'peak_load': float(peak[i])
+            }
+            for i in np.flatnonzero(days_over)
+        ]
+
+def build_workload(entries, member_ids, start_date=None, end_date=None):
+    """
+    Build the workload matrix of a set of members.
+
+    Args:
+        entries: List of (start_date, end_date, member_ids) assignment entries
+        member_ids: IDs of the members to include, in row order
+        start_date: Optional first day of the window (default: earliest assignment start)
+        end_date: Optional last day of the window (default: latest assignment end)
+
+    Returns:
+        A WorkloadMatrix covering the window
+    """
+    positions = {member_id: i for i, member_id in enumerate(member_ids)}
+
+    # One row per (assignment, member) pair
+    rows, starts, ends = [], [], []
+    for entry_start, entry_end, members in entries:
+        for member_id in members:
+            position = positions.get(member_id)
+            if position is not None:
+                rows.append(position)
+                starts.append(entry_start)
+                ends.append(entry_end)
+
+    starts = np.array(starts, dtype='datetime64[D]')
+    ends = np.array(ends, dtype='datetime64[D]')
+    window_start = np.datetime64(start_date, 'D') if start_date else (starts.min() if starts.size else np.datetime64('today', 'D'))
+    window_end = np.datetime64(end_date, 'D') if end_date else (ends.max() if ends.size else window_start)
+    if starts.size:
+        window_start = min(window_start, starts.min())
+        window_end = max(window_end, ends.max())
+    days = int((window_end - window_start).astype(np.int64)) + 1
+
+    first = (starts - window_start).astype(np.int64)
+    last = (ends - window_start).astype(np.int64)
+    rows = np.array(rows, dtype=np.int64)
+    valid = last >= first
+
+    # Difference array: +1 on the first day, -1 on the day after the last
+    diff = np.zeros((len(member_ids), days + 1), dtype=np.float32)
+    np.add.at(diff, (rows[valid], first[valid]), 1)
+    np.add.at(diff, (rows[valid], last[valid] + 1), -1)
+    load = np.cumsum(diff[:, :-1], axis=1)
+
+    return WorkloadMatrix(member_ids, window_start, load)
+
+def _scope_version(project_id):
+    if project_id is None:
+        return get_schedule_versions()
+    return get_project_schedule_version(project_id)
+
+def get_workload(project_id=None, start_date=None, end_date=None):
+    """
+    Get the workload of a project's team, or of all team members when project_id is None.
+
+    Args:
+        project_id: Optional ID of the project
+        start_date: Optional first day the matrix must cover
+        end_date: Optional last day the matrix must cover
+
+    Returns:
+        Tuple of (WorkloadMatrix, list of team member dictionaries in row order)
+    """
+    members = get_all_team_members() if project_id is None else get_project_team(project_id)
+    member_ids = [member['id'] for member in members]
+    key = PORTFOLIO if project_id is None else project_id
+    version = _scope_version(project_id)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached and cached[0] == version and cached[1].member_ids == member_ids:
+        matrix = cached[1]
+        if (not start_date or matrix.covers_range(start_date, start_date)) and \
+                (not end_date or matrix.covers_range(end_date, end_date)):
+            return matrix, members
+
+    tasks, subtasks = get_workload_assignments(project_id)
+    matrix = build_workload(_assignment_entries(tasks, subtasks), member_ids, start_date, end_date)
+    with _cache_lock:
+        _cache[key] = (version, matrix)
+    return matrix, members
+
+def get_task_assignments(task_id):
+    """Snapshot a task and its subtasks for apply_workload_change"""
+    task = get_task(task_id)
+    if not task:
+        return None
+    return {'project_id': task['project_id'], 'task': task, 'subtasks': get_subtasks_by_parent(task_id)}
+
+def _snapshot_entries(snapshot):
+    if not snapshot:
+        return []
+    return _assignment_entries([snapshot['task']], snapshot['subtasks'])
+
+def apply_workload_change(before, after, versions):
+    """
+    Update cached workload matrices after a task or its subtasks changed.
+
+    A cached matrix is updated in place only if it was built at the schedule
+    version the change started from; otherwise it is dropped and rebuilt on
+    next use. When the task moved to another project, its old assignments are
+    removed from the old project's matrix and its new ones added to the new
+    project's.
+
+    Args:
+        before: Snapshot from get_task_assignments taken before the change, or None for a new task
+        after: Snapshot from get_task_assignments taken after the change
+        versions: The versions dictionary filled by the database write, see utils.database.report_versions
+    """
+    if not after:
+        return
+    project_id = after['project_id']
+    old_project_id = before['project_id'] if before else project_id
+    # Schedule versions this change moved each project through; none if it left the schedule alone
+    spans = {p: versions[('schedule', p)] for p in (old_project_id, project_id) if ('schedule', p) in versions}
+    if not spans:
+        return
+
+    old_entries = _snapshot_entries(before)
+    new_entries = _snapshot_entries(after)
+    changes = {PORTFOLIO: (old_entries, new_entries)}
+    if old_project_id == project_id:
+        changes[project_id] = (old_entries, new_entries)
+    else:
+        changes[old_project_id] = (old_entries, [])
+        changes[project_id] = ([], new_entries)
+
+    with _cache_lock:
+        for key, (removed, added) in changes.items():
+            cached = _cache.get(key)
+            if not cached:
+                continue
+            version, matrix = cached
+
+            if key == PORTFOLIO:
+                in_step = all(version.get(p) == first for p, (first, _) in spans.items())
+                current = {**version, **{p: last for p, (_, last) in spans.items()}}
+            else:
+                in_step = key in spans and version == spans[key][0]
+                current = spans[key][1] if in_step else None
+
+            if in_step and matrix.covers(added):
+                matrix.apply(removed, -1)
+                matrix.apply(added, 1)
+                _cache[key] = (current, matrix)
+            else:
+                del _cache[key]